@@ -0,0 +1,141 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Read payloads ahead, and write them behind, on background threads, so extraction and
+disk writes overlap with redaction.
+"""
+
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+
+from constants import PREFETCH_PAYLOADS, WRITE_BEHIND_PAYLOADS
+from sinks import FileSink, NdjsonSink
+
+# Seconds a thread waits on a full or empty queue before checking whether to stop
+QUEUE_POLL_INTERVAL = 0.1
+
+# Put on a queue after the last item
+_END = object()
+
+
+def prefetch(items: Iterable, size: int = PREFETCH_PAYLOADS) -> Iterator:
+    """
+    Yield the items, reading up to size of them ahead on a background thread.
+
+    An exception raised while reading the items is raised here once the items before it
+    have been yielded. If the consumer stops early, the thread stops reading too.
+    """
+    ready = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read() -> None:
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+            else:
+                put(_END)
+        except Exception as e:
+            # Raised again in the consumer's thread
+            put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+
+    reader = threading.Thread(target=read, name="prefetch", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+
+class BackgroundWriter:
+    """
+    Write the payloads to a sink on a background thread.
+
+    write() only queues the payload, waiting while max_pending of them are queued. The
+    thread takes everything queued at once, then serializes and writes it. Closing
+    the writer, including when the run fails, writes every payload queued so far before
+    closing the sink. An error from the sink is raised by the next write(), or by close().
+    """
+
+    def __init__(self, sink: FileSink | NdjsonSink, max_pending: int = WRITE_BEHIND_PAYLOADS):
+        self.sink = sink
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._write, name="writer", daemon=True)
+        self._thread.start()
+
+    def _batches(self) -> Iterator[list]:
+        """
+        Yield the queued payloads in batches, until the end is queued.
+        """
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < self._pending.maxsize:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _END:
+                yield batch[:-1]
+                return
+            yield batch
+
+    def _write(self) -> None:
+        for batch in self._batches():
+            # After an error, keep emptying the queue so write() never waits forever
+            if self._error is not None:
+                continue
+            try:
+                for payload in batch:
+                    self.sink.write(payload)
+            except Exception as e:
+                self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def write(self, payload: dict) -> None:
+        self._raise_error()
+        self._pending.put(payload)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._pending.put(_END)
+            self._thread.join()
+        try:
+            self._raise_error()
+        finally:
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
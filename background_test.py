@@ -0,0 +1,106 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test reading and writing payloads on background threads
+"""
+
+import threading
+
+import pytest
+
+from background import BackgroundWriter, prefetch
+from sinks import OUTPUT_NDJSON, make_sink
+from sinks_test import PAYLOADS, read_ndjson
+
+
+def test_prefetch_keeps_order():
+    assert list(prefetch(range(100), size=3)) == list(range(100))
+    assert list(prefetch([])) == []
+
+
+def test_prefetch_raises_read_errors():
+    def items():
+        yield 1
+        yield 2
+        raise OSError("mailbox unreadable")
+
+    read = []
+    with pytest.raises(OSError, match="mailbox unreadable"):
+        read.extend(prefetch(items(), size=1))
+    assert read == [1, 2]
+
+
+def test_prefetch_stops_reading_when_closed():
+    closed = threading.Event()
+
+    def items():
+        try:
+            yield from range(1000)
+        finally:
+            closed.set()
+
+    payloads = prefetch(items(), size=2)
+    assert next(payloads) == 0
+    payloads.close()
+    assert closed.is_set()
+
+
+class FailingSink:
+    """
+    A sink that fails on the given payload.
+    """
+
+    def __init__(self, fail_on: int):
+        self.fail_on = fail_on
+        self.written = []
+        self.closed = False
+
+    def write(self, payload: dict) -> None:
+        if payload["index"] == self.fail_on:
+            raise OSError("disk full")
+        self.written.append(payload)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_background_writer(tmp_path):
+    sink = make_sink(OUTPUT_NDJSON, str(tmp_path))
+    with BackgroundWriter(sink, max_pending=2) as writer:
+        for payload in PAYLOADS:
+            writer.write(payload)
+    assert read_ndjson(sink.paths) == PAYLOADS
+
+
+def test_background_writer_flushes_on_error(tmp_path):
+    sink = make_sink(OUTPUT_NDJSON, str(tmp_path))
+
+    def run():
+        with BackgroundWriter(sink) as writer:
+            for payload in PAYLOADS[:5]:
+                writer.write(payload)
+            raise RuntimeError("redaction failed")
+
+    with pytest.raises(RuntimeError, match="redaction failed"):
+        run()
+    assert read_ndjson(sink.paths) == PAYLOADS[:5]
+
+
+def test_background_writer_raises_sink_errors():
+    sink = FailingSink(fail_on=3)
+    writer = BackgroundWriter(sink, max_pending=1)
+
+    def write_all():
+        for index in range(100):
+            writer.write({"index": index})
+
+    with pytest.raises(OSError, match="disk full"):
+        write_all()
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
+    assert [payload["index"] for payload in sink.written] == [0, 1, 2]
+    assert sink.closed
@@ -0,0 +1,9 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Benchmarks for the redaction tool.
+"""
@@ -0,0 +1,75 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Time the patterns on text they backtrack heavily on, with and without a time budget.
+
+Without a budget, each scrub is still stopped after --cap seconds so the run finishes,
+and shown as ">cap". With the budget, every scrub is bounded, though the regex module
+only checks its timeout now and then, so a scrub can take two or three times the budget.
+
+Run from the repository root:
+    uv run python -m benchmarks.adversarial --budget 0.1
+"""
+
+import argparse
+import time
+
+from pattern_engine import TimeBudget
+from redact import PIIScrub
+
+# Text that makes some pattern backtrack for a time that grows with its size n. The
+# hostname at the end of some of them gets them past the prefilters of their patterns.
+ADVERSARIAL_TEXTS = {
+    "digit then spaces (street)": lambda n: "1" + " " * n + "x",
+    "digit then words (street)": lambda n: "1 " + "word " * (n // 5),
+    "iban then digits (street)": lambda n: "AB12" + " 1" * (n // 2) + "x",
+    "dotted run (url/hostname)": lambda n: "http://" + "a." * (n // 2) + " x.nz",
+    "digit dots (url)": lambda n: "1." * (n // 2) + " x.nz",
+    "hyphens (hostname)": lambda n: "a-" * (n // 2) + " x.nz",
+    "long word": lambda n: "a" * n,
+}
+
+
+def time_scrub(scrubber: PIIScrub, text: str, seconds: float) -> tuple[float, bool]:
+    """
+    Scrub the text with a budget, returning the time it took and whether it ran out.
+    """
+    budget = TimeBudget(seconds)
+    budget.start()
+    start = time.perf_counter()
+    scrubber.scrub_patterns(text, budget)
+    return time.perf_counter() - start, budget.timed_out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the patterns on adversarial text")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[250, 500, 1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--budget", type=float, default=0.1, help="Budget per text")
+    parser.add_argument("--cap", type=float, default=10.0, help="Limit without a budget")
+    args = parser.parse_args()
+
+    scrubber = PIIScrub()
+    print(f"{'text':<28} {'size':>8} {'no budget s':>12} {'budget s':>10}  fallback")
+    worst = 0.0
+    for name, make_text in ADVERSARIAL_TEXTS.items():
+        for size in args.sizes:
+            text = make_text(size)
+            unbounded, capped = time_scrub(scrubber, text, args.cap)
+            bounded, fallback = time_scrub(scrubber, text, args.budget)
+            worst = max(worst, bounded)
+            unbounded_text = f">{args.cap:.0f}" if capped else f"{unbounded:.3f}"
+            print(
+                f"{name:<28} {len(text):>8} {unbounded_text:>12} {bounded:>10.3f}  "
+                f"{'yes' if fallback else 'no'}"
+            )
+    print(f"Slowest scrub with a {args.budget}s budget: {worst:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
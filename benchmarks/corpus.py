@@ -0,0 +1,211 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Generate a seeded corpus of synthetic emails full of the PII that the tool redacts.
+
+The same seed always gives the same emails, so benchmark runs can be compared.
+
+Run from the repository root to save a corpus as CSV or JSON Lines:
+    uv run python -m benchmarks.corpus --count 1000 --size 2000 corpus.csv
+"""
+
+import argparse
+import csv
+import json
+import random
+import string
+from collections.abc import Iterator
+
+from redact import STREET_SUFFIXES
+
+FIRST_NAMES = ["John", "Jane", "Aroha", "Wiremu", "Priya", "Liam", "Olivia", "Mei", "Tama"]
+LAST_NAMES = ["Smith", "Ngata", "Patel", "Wilson", "Chen", "Brown", "Taylor", "Walker"]
+STREET_NAMES = ["Walls", "Queen", "Victoria", "Karangahape", "George", "High", "Cuba"]
+CITIES = ["Auckland", "Wellington", "Christchurch", "Sydney", "Melbourne", "Brisbane"]
+COMPANIES = ["Acme Ltd", "Kiwi Insurance", "Southern Cross Bank", "Harbour Motors"]
+
+SENTENCES = [
+    "Hi {first}, please call me on {phone} when you get a chance.",
+    "You can also reach {first} {last} on {phone} after 5pm.",
+    "My account number is {nz_bank}, and the reference is {number}.",
+    "Please transfer the refund to {iban} by {date}.",
+    "The car with rego {rego} was damaged outside {address} on {date}.",
+    "I have moved to {address}, {city}, so please update my details.",
+    "See {url} for the policy, or email {email} with any questions.",
+    "{first} {last} from {company} will be in touch about claim {number}.",
+    "Thanks for getting back to us, we will be in touch shortly.",
+    "Kind regards, the customer service team.",
+    "Let us know if there is anything else we can help you with.",
+]
+
+
+def nz_phone(rng: random.Random) -> str:
+    return rng.choice(
+        [
+            f"021 {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+            f"(09) {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+            f"+64 27 {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+        ]
+    )
+
+
+def au_phone(rng: random.Random) -> str:
+    return rng.choice(
+        [
+            f"04{rng.randint(10, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}",
+            f"+61 2 {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}",
+        ]
+    )
+
+
+def iban(rng: random.Random) -> str:
+    letters = "".join(rng.choices(string.ascii_uppercase, k=4))
+    digits = " ".join(str(rng.randint(1000, 9999)) for _ in range(3))
+    return f"GB{rng.randint(10, 99)} {letters} {digits} {rng.randint(10, 99)}"
+
+
+def nz_bank(rng: random.Random) -> str:
+    return (
+        f"{rng.randint(10, 38)}-{rng.randint(1000, 9999)}-"
+        f"{rng.randint(1000000, 9999999)}-{rng.randint(0, 99):02}"
+    )
+
+
+def rego(rng: random.Random) -> str:
+    letters = "".join(rng.choices(string.ascii_uppercase, k=3))
+    return rng.choice(
+        [f"{letters}{rng.randint(100, 999)}", f"{rng.randint(1, 9)}{letters}123"]
+    )
+
+
+def fill_sentence(rng: random.Random, sentence: str) -> str:
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    return sentence.format(
+        first=first,
+        last=last,
+        phone=nz_phone(rng) if rng.random() < 0.7 else au_phone(rng),
+        nz_bank=nz_bank(rng),
+        iban=iban(rng),
+        rego=rego(rng),
+        number=rng.randint(10000, 999999),
+        date=f"{rng.randint(1, 28)}/{rng.randint(1, 12):02}/2025",
+        address=f"{rng.randint(1, 300)} {rng.choice(STREET_NAMES)} {rng.choice(STREET_SUFFIXES)}",
+        city=rng.choice(CITIES),
+        url=f"https://www.example.co.nz/claims?id={rng.randint(1000, 9999)}",
+        email=f"{first.lower()}.{last.lower()}@example.com",
+        company=rng.choice(COMPANIES),
+    )
+
+
+def make_body(rng: random.Random, size: int) -> str:
+    """
+    Build a body of roughly the given size, in paragraphs of a few sentences.
+    """
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = " ".join(
+            fill_sentence(rng, rng.choice(SENTENCES)) for _ in range(rng.randint(1, 4))
+        )
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def make_email(rng: random.Random, index: int, size: int, html: bool) -> dict:
+    """
+    Build an email payload in the cloudmailin format, like the importers produce.
+    """
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    sender = f"{first.lower()}.{last.lower()}@example.com"
+    body = make_body(rng, size)
+    if html:
+        paragraphs = "".join(f"<p style='margin:0'>{p}</p>" for p in body.split("\n\n"))
+        body = f'<html xmlns:o="urn:schemas-microsoft-com:office:office"><body>{paragraphs}</body></html>'
+    return {
+        "headers": {
+            "from": sender,
+            "sender": sender,
+            "date": f"2025-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}T10:00:00",
+            "to": "support@example.com",
+            "cc": "",
+            "message_id": f"<{index}@example.com>",
+            "subject": f"Re: Claim {rng.randint(10000, 999999)} for {first} {last}",
+            "content_type": f'text/{"html" if html else "plain"}; charset="utf-8"',
+        },
+        "envelope": {},
+        "plain": "" if html else body,
+        "html": body if html else "",
+        "attachments": [],
+    }
+
+
+def generate_corpus(
+    count: int, size: int = 2_000, seed: int = 0, html_ratio: float = 0.2
+) -> Iterator[dict]:
+    """
+    Yield count synthetic emails with bodies of roughly the given size.
+    """
+    rng = random.Random(seed)  # noqa: S311 - not used for security
+    for index in range(count):
+        yield make_email(rng, index, size, html=rng.random() < html_ratio)
+
+
+def write_csv(payloads: Iterator[dict], path: str) -> None:
+    """
+    Save the payloads as a spreadsheet that import_spreadsheet reads.
+    """
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["unique_id", "subject", "body", "date", "to", "from", "cc"])
+        for payload in payloads:
+            headers = payload["headers"]
+            writer.writerow(
+                [
+                    headers["message_id"],
+                    headers["subject"],
+                    payload["html"] or payload["plain"],
+                    headers["date"],
+                    headers["to"],
+                    headers["from"],
+                    headers["cc"],
+                ]
+            )
+
+
+def write_jsonl(payloads: Iterator[dict], path: str) -> None:
+    """
+    Save the payloads as JSON Lines that import_jsonl reads.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for payload in payloads:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic email corpus")
+    parser.add_argument("file", help="File to write, .csv or .jsonl")
+    parser.add_argument("--count", type=int, default=1_000, help="Number of emails")
+    parser.add_argument("--size", type=int, default=2_000, help="Size of each body")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--html-ratio", type=float, default=0.2, help="Fraction of emails with HTML bodies"
+    )
+    args = parser.parse_args()
+
+    payloads = generate_corpus(args.count, args.size, args.seed, args.html_ratio)
+    if args.file.endswith(".csv"):
+        write_csv(payloads, args.file)
+    else:
+        write_jsonl(payloads, args.file)
+    print(f"Saved {args.count} emails to {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Compare the sequential and span pattern engines of PIIScrub.
+
+Run from the repository root:
+    uv run python -m benchmarks.engines
+"""
+
+import argparse
+import random
+import timeit
+
+from redact import ENGINES, PIIScrub
+
+SAMPLE_LINES = [
+    "Hi John, please call me on (09) 123 4567 or +64 21 555 1234 when you can.",
+    "My bank account is 12-1234-1234567-12 and my IBAN is GB82 WEST 1234 5698 7654 32.",
+    "The car (ABC123) was parked at 24 Walls St on 9/01/2025.",
+    "See http://www.example.com/account?id=1234 or email support@example.com for help.",
+    'Our server 192.168.0.1 logged <p xmlns="http://www.w3.org/1999/xhtml">request</p>.',
+    "Thanks for getting back to us, we will be in touch shortly.",
+    "Kind regards, the customer service team.",
+]
+
+
+def build_text(size: int, seed: int = 0) -> str:
+    """
+    Build a text of roughly the given size from the sample lines.
+    """
+    rng = random.Random(seed)  # noqa: S311 - not used for security
+    lines = []
+    length = 0
+    while length < size:
+        line = rng.choice(SAMPLE_LINES)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the PIIScrub pattern engines")
+    parser.add_argument("--size", type=int, default=100_000, help="Size of the body text")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs")
+    args = parser.parse_args()
+
+    texts = {
+        "subject": "Re: Invoice 1234",
+        "body": build_text(args.size),
+    }
+    scrubbers = {engine: PIIScrub(engine=engine) for engine in ENGINES}
+
+    for name, text in texts.items():
+        outputs = {engine: scrubbers[engine].scrub_patterns(text) for engine in ENGINES}
+        if len(set(outputs.values())) != 1:
+            raise Exception(f"Engines disagree on the {name} text")
+
+        number = max(1, 100_000 // len(text))
+        print(f"{name} ({len(text)} chars, {number} scrubs per run)")
+        for engine, scrubber in scrubbers.items():
+            timings = timeit.repeat(
+                lambda scrubber=scrubber, text=text: scrubber.scrub_patterns(text),
+                number=number,
+                repeat=args.repeat,
+            )
+            print(f"  {engine:<12} {min(timings) / number * 1000:.3f} ms per scrub")
+
+
+if __name__ == "__main__":
+    main()
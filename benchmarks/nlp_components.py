@@ -0,0 +1,80 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Report the time spent in each Spacy pipeline component, for each NLP loading mode.
+
+Each mode is loaded in its own process, so the peak memory of each can be compared.
+
+Run from the repository root:
+    uv run python -m benchmarks.nlp_components --model lg
+"""
+
+import argparse
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.engines import build_text
+from vendor.scrub import NLP_MODES, SPACY_LANGUAGE_MODELS
+
+
+def time_components(model: str, mode: str, texts: list[str]) -> dict:
+    """
+    Load the model in the given mode and time each component over the texts.
+    """
+    from vendor.scrub import load_nlp
+
+    start = time.perf_counter()
+    nlp = load_nlp(model, mode)
+    load_time = time.perf_counter() - start
+
+    timings = {"tokenizer": 0.0} | {name: 0.0 for name, _ in nlp.pipeline}
+    entities = 0
+    for text in texts:
+        start = time.perf_counter()
+        doc = nlp.make_doc(text)
+        timings["tokenizer"] += time.perf_counter() - start
+        for name, component in nlp.pipeline:
+            start = time.perf_counter()
+            doc = component(doc)
+            timings[name] += time.perf_counter() - start
+        entities += len(doc.ents)
+
+    return {
+        "load_time": load_time,
+        "timings": timings,
+        "entities": entities,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Spacy pipeline components")
+    parser.add_argument("--model", choices=SPACY_LANGUAGE_MODELS, default="lg")
+    parser.add_argument("--texts", type=int, default=200, help="Number of texts to process")
+    parser.add_argument("--size", type=int, default=2_000, help="Size of each text")
+    args = parser.parse_args()
+
+    model = SPACY_LANGUAGE_MODELS[args.model]
+    texts = [build_text(args.size, seed=seed) for seed in range(args.texts)]
+    for mode in NLP_MODES:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            report = executor.submit(time_components, model, mode, texts).result()
+
+        total = sum(report["timings"].values())
+        print(f"{model} ({mode} mode)")
+        print(f"  load time   {report['load_time']:8.2f} s")
+        print(f"  peak RSS    {report['peak_rss_mb']:8.1f} MB")
+        print(f"  entities    {report['entities']:8}")
+        for name, seconds in report["timings"].items():
+            print(f"  {name:<20} {seconds * 1000 / len(texts):8.2f} ms per text")
+        print(f"  {'total':<20} {total * 1000 / len(texts):8.2f} ms per text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Compare the time and memory each PST backend takes to read every email in a PST file.
+
+Each backend runs in its own process, so the peak memory of each can be compared.
+
+Run from the repository root:
+    uv run python -m benchmarks.pst_backends mailbox.pst
+"""
+
+import argparse
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from import_handlers.pst import PST_BACKEND_PFFEXPORT, PST_BACKEND_PYPFF
+
+
+def read_emails(pst_file: str, backend: str) -> dict:
+    """
+    Read every email in the PST file with the given backend.
+    """
+    from import_handlers.pst import import_pst
+
+    start = time.perf_counter()
+    emails = 0
+    body_bytes = 0
+    for payload in import_pst(pst_file, backend=backend):
+        emails += 1
+        body_bytes += len(payload["plain"]) + len(payload["html"])
+    return {
+        "seconds": time.perf_counter() - start,
+        "emails": emails,
+        "body_mb": body_bytes / 1024 / 1024,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the PST backends")
+    parser.add_argument("file", help="PST file to read")
+    parser.add_argument(
+        "--backend",
+        choices=(PST_BACKEND_PYPFF, PST_BACKEND_PFFEXPORT),
+        action="append",
+        help="Backend to run, can be repeated (default: both)",
+    )
+    args = parser.parse_args()
+
+    for backend in args.backend or (PST_BACKEND_PYPFF, PST_BACKEND_PFFEXPORT):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            report = executor.submit(read_emails, args.file, backend).result()
+
+        print(backend)
+        print(f"  emails      {report['emails']:8}")
+        print(f"  time        {report['seconds']:8.2f} s")
+        print(f"  rate        {report['emails'] / report['seconds']:8.1f} emails/s")
+        print(f"  bodies      {report['body_mb']:8.1f} MB")
+        print(f"  peak RSS    {report['peak_rss_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+# ruff: noqa: S603
+"""
+Measure how long the tool takes to start, and how long the lazy loads take.
+
+Run from the repository root:
+    uv run python -m benchmarks.startup
+"""
+
+import argparse
+import statistics
+import subprocess  # nosec
+import sys
+import time
+
+COMMANDS = {
+    "main.py --help": ["main.py", "--help"],
+    "import main": ["-c", "import main"],
+    "import pandas": ["-c", "import pandas"],
+    "load NLP model": ["-c", "from vendor.scrub import get_nlp; get_nlp()"],
+}
+
+
+def time_command(args: list[str], repeat: int) -> list[float]:
+    """
+    Run python with the given arguments and return the wall time of each run.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], capture_output=True, check=True)  # nosec
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup time of the tool")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per command")
+    args = parser.parse_args()
+
+    for name, command in COMMANDS.items():
+        timings = time_command(command, args.repeat)
+        print(
+            f"{name:<16} median {statistics.median(timings):6.2f} s, best {min(timings):6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
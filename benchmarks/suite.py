@@ -0,0 +1,287 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+# ruff: noqa: S603
+"""
+Measure the throughput of each stage of the tool over a synthetic corpus.
+
+Each case runs in its own process, over the same seeded corpus from benchmarks.corpus,
+and reports emails/s, MB/s, p50/p99 latency per email and peak RSS. Results can be saved
+as JSON and compared with an earlier run.
+
+Run from the repository root:
+    uv run python -m benchmarks.suite --count 200 --output results.json
+    uv run python -m benchmarks.suite --cases scrub_patterns redact_payloads --compare results.json
+"""
+
+import argparse
+import copy
+import json
+import platform
+import resource
+import statistics
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.corpus import generate_corpus, write_csv, write_jsonl
+from version import VERSION
+
+REPO_DIR = Path(__file__).parent.parent
+
+
+def payload_bytes(payload: dict) -> int:
+    """
+    Size of the text in a payload that is redacted.
+    """
+    texts = [payload["plain"], payload["html"], *payload["headers"].values()]
+    return sum(len(text.encode("utf-8")) for text in texts)
+
+
+def body(payload: dict) -> str:
+    return payload["html"] or payload["plain"]
+
+
+def time_calls(payloads: list[dict], work: Callable[[dict], object]) -> list[float]:
+    """
+    Time work() on each payload, after one untimed call to warm up.
+
+    The warm-up call gets a copy of the first payload, since work() may change it.
+    """
+    work(copy.deepcopy(payloads[0]))
+    latencies = []
+    for payload in payloads:
+        start = time.perf_counter()
+        work(payload)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def time_stream(make_items: Callable[[], Iterable]) -> list[float]:
+    """
+    Time the wait for each item of the stream that make_items() returns, after taking the
+    first item of another one to warm up.
+    """
+    warm_up = iter(make_items())
+    next(warm_up, None)
+    if hasattr(warm_up, "close"):
+        warm_up.close()
+
+    items = make_items()
+    latencies = []
+    start = time.perf_counter()
+    for _ in items:
+        now = time.perf_counter()
+        latencies.append(now - start)
+        start = now
+    return latencies
+
+
+def case_scrub_patterns(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from redact import PIIScrub
+
+    scrubber = PIIScrub()
+    return time_calls(payloads, lambda payload: scrubber.scrub_patterns(body(payload)))
+
+
+def case_scrub_pii_with_nlp(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from redact import PIIScrub
+
+    scrubber = PIIScrub()
+    return time_calls(payloads, lambda payload: scrubber.scrub_pii_with_nlp(body(payload)))
+
+
+def case_scrub_text(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from redact import PIIScrub
+
+    scrubber = PIIScrub()
+    return time_calls(payloads, lambda payload: scrubber.scrub_text(body(payload)))
+
+
+def case_redact_payload(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from redact import redact_payload
+
+    copies = copy.deepcopy(payloads)
+    return time_calls(copies, redact_payload)
+
+
+def case_redact_payloads(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from redact import redact_payloads
+
+    return time_stream(lambda: redact_payloads(copy.deepcopy(payloads)))
+
+
+def case_import_spreadsheet(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from import_handlers import import_spreadsheet
+
+    path = f"{work_dir}/corpus.csv"
+    write_csv(payloads, path)
+    return time_stream(lambda: import_spreadsheet(path))
+
+
+def case_import_jsonl(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from import_handlers import import_jsonl
+
+    path = f"{work_dir}/corpus.jsonl"
+    write_jsonl(payloads, path)
+    return time_stream(lambda: import_jsonl(path))
+
+
+def case_import_pst(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    from import_handlers import import_pst
+
+    # The PST's own emails replace the synthetic ones
+    payloads.clear()
+    latencies = []
+    start = time.perf_counter()
+    for payload in import_pst(options["pst"]):
+        now = time.perf_counter()
+        latencies.append(now - start)
+        payloads.append(payload)
+        start = now
+    return latencies
+
+
+def case_main(payloads: list[dict], work_dir: str, options: dict) -> list[float]:
+    """
+    Run the whole tool over the corpus as a CSV file. Only the total time is measured.
+    """
+    path = f"{work_dir}/corpus.csv"
+    write_csv(payloads, path)
+    start = time.perf_counter()
+    subprocess.run(  # nosec
+        [sys.executable, "main.py", path, "-o", f"{work_dir}/out", *options["main_args"]],
+        cwd=REPO_DIR,
+        check=True,
+        capture_output=True,
+    )
+    return [time.perf_counter() - start]
+
+
+CASES = {
+    "scrub_patterns": case_scrub_patterns,
+    "scrub_pii_with_nlp": case_scrub_pii_with_nlp,
+    "scrub_text": case_scrub_text,
+    "redact_payload": case_redact_payload,
+    "redact_payloads": case_redact_payloads,
+    "import_spreadsheet": case_import_spreadsheet,
+    "import_jsonl": case_import_jsonl,
+    "import_pst": case_import_pst,
+    "main": case_main,
+}
+
+# Cases that need more than the synthetic corpus, and only run when asked for
+OPTIONAL_CASES = ("import_pst",)
+
+
+def run_case(case: str, corpus_args: dict, options: dict) -> dict:
+    """
+    Run a case over the corpus and summarise its timings.
+    """
+    payloads = list(generate_corpus(**corpus_args))
+    with tempfile.TemporaryDirectory() as work_dir:
+        latencies = CASES[case](payloads, work_dir, options)
+
+    seconds = sum(latencies)
+    megabytes = sum(payload_bytes(payload) for payload in payloads) / 1_000_000
+    result = {
+        "emails": len(payloads),
+        "seconds": seconds,
+        "emails_per_second": len(payloads) / seconds if seconds else 0.0,
+        "mb_per_second": megabytes / seconds if seconds else 0.0,
+        "p50_ms": None,
+        "p99_ms": None,
+        # ru_maxrss is in kilobytes on Linux. The main case runs the tool in a child.
+        "peak_rss_mb": max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        )
+        / 1024,
+    }
+    if len(latencies) > 1:
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        result["p50_ms"] = percentiles[49] * 1000
+        result["p99_ms"] = percentiles[98] * 1000
+    return result
+
+
+def format_ms(value: float | None) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the tool")
+    parser.add_argument(
+        "--cases", nargs="+", choices=CASES, help="Cases to run (default: all)"
+    )
+    parser.add_argument("--count", type=int, default=200, help="Number of emails")
+    parser.add_argument("--size", type=int, default=2_000, help="Size of each body")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the corpus")
+    parser.add_argument(
+        "--html-ratio", type=float, default=0.2, help="Fraction of emails with HTML bodies"
+    )
+    parser.add_argument("--pst", help="PST file for the import_pst case")
+    parser.add_argument(
+        "--main-args",
+        default="--output-format ndjson",
+        help="Extra arguments for main.py in the main case",
+    )
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--compare", help="Compare with results saved by an earlier run")
+    args = parser.parse_args()
+
+    cases = args.cases or [case for case in CASES if case not in OPTIONAL_CASES]
+    if "import_pst" in cases and not args.pst:
+        parser.error("the import_pst case needs --pst")
+    corpus_args = {
+        "count": args.count,
+        "size": args.size,
+        "seed": args.seed,
+        "html_ratio": args.html_ratio,
+    }
+    options = {"pst": args.pst, "main_args": args.main_args.split()}
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)["results"]
+
+    results = {}
+    print(
+        f"{'case':<20} {'emails/s':>10} {'MB/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8}"
+    )
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_case, case, corpus_args, options).result()
+        results[case] = result
+        line = (
+            f"{case:<20} {result['emails_per_second']:>10.1f} {result['mb_per_second']:>8.2f} "
+            f"{format_ms(result['p50_ms']):>8} {format_ms(result['p99_ms']):>8} "
+            f"{result['peak_rss_mb']:>8.1f}"
+        )
+        if case in previous and previous[case]["emails_per_second"]:
+            speedup = result["emails_per_second"] / previous[case]["emails_per_second"]
+            line += f"  {speedup:.2f}x"
+        print(line)
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "version": VERSION,
+            "python": platform.python_version(),
+            "corpus": corpus_args,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Open plain, gzip or zstd compressed text files.
+"""
+
+import gzip
+from typing import IO
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD)
+
+# File suffix added by each compression
+COMPRESSION_SUFFIXES = {
+    COMPRESSION_NONE: "",
+    COMPRESSION_GZIP: ".gz",
+    COMPRESSION_ZSTD: ".zst",
+}
+
+
+def compression_from_path(path: str) -> str:
+    """
+    Work out the compression of a file from its suffix.
+    """
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if suffix and path.lower().endswith(suffix):
+            return compression
+    return COMPRESSION_NONE
+
+
+def open_text(path: str, mode: str = "rt", compression: str | None = None) -> IO[str]:
+    """
+    Open a text file, compressed with gzip or zstd if its suffix (or compression) says so.
+
+    zstd needs the optional "zstandard" package.
+    """
+    if compression is None:
+        compression = compression_from_path(path)
+    if compression == COMPRESSION_GZIP:
+        return gzip.open(path, mode, encoding="utf-8")
+    if compression == COMPRESSION_ZSTD:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(
+                "zstd compression needs the zstandard package: uv pip install zstandard"
+            ) from e
+        return zstandard.open(path, mode, encoding="utf-8")
+    if compression != COMPRESSION_NONE:
+        raise ValueError(
+            f"Unknown compression '{compression}', expected one of: {', '.join(COMPRESSIONS)}"
+        )
+    return open(path, mode.replace("t", ""), encoding="utf-8")
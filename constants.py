@@ -9,3 +9,40 @@ Constants
 """
 
 EXPORT_DIR = "data/export"
+
+# Number of texts the NLP model processes together in each batch
+NLP_BATCH_SIZE = 64
+
+# Number of processes the NLP model uses for batches of texts
+NLP_PROCESSES = 1
+
+# Number of payloads sent to a worker process at a time
+WORKER_CHUNK_SIZE = 20
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5.0
+
+# Approximate memory used by the in-memory redaction cache, in bytes
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Number of new entries written to the redaction cache database between commits
+CACHE_COMMIT_INTERVAL = 500
+
+# Number of documents with the slowest regular expressions listed by --profile
+PROFILE_SLOWEST_DOCUMENTS = 10
+
+# Most events saved in a --trace file
+TRACE_MAX_EVENTS = 1_000_000
+
+# Seconds the patterns may take on each email before the rest of it is redacted
+# conservatively, or None for no limit
+PATTERN_TIME_BUDGET = None
+
+# Number of recent redacted emails kept for --dedup copy to copy to their duplicates
+DEDUP_RECENT_COPIES = 1_000
+
+# Number of payloads read ahead of redaction on a background thread
+PREFETCH_PAYLOADS = 64
+
+# Number of redacted payloads queued for the background writer before redaction waits
+WRITE_BEHIND_PAYLOADS = 64
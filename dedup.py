@@ -0,0 +1,183 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Collapse the duplicate emails in a run (copies of a message across folders, repeated
+message ids, forwards with the same body), so each one is only redacted once.
+"""
+
+import copy
+import hashlib
+import json
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator
+
+from constants import DEDUP_RECENT_COPIES
+from manifest import EMAIL_ID_KEY, email_id
+
+DUPLICATES_REFERENCE = "reference"
+DUPLICATES_COPY = "copy"
+DUPLICATE_MODES = (DUPLICATES_REFERENCE, DUPLICATES_COPY)
+
+# Key set on the output of a duplicate to the EMAIL_ID_KEY of the email it duplicates
+DUPLICATE_OF_KEY = "duplicate_of"
+
+
+def body_hash(payload: dict) -> str | None:
+    """
+    Return a hash of the email's plain and html bodies with their whitespace collapsed, or
+    None if both are empty.
+    """
+    bodies = [" ".join((payload.get(key) or "").split()) for key in ("plain", "html")]
+    if not any(bodies):
+        return None
+    source = f"body:{json.dumps(bodies, ensure_ascii=False)}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+class Deduplicator:
+    """
+    Pass only the first of each group of duplicate emails on to redaction, and write
+    either a reference to its redacted output, or a copy of it, for the others.
+
+    Emails are duplicates if they have the same message id (or, without one, the same
+    headers and bodies), or the same bodies once their whitespace is collapsed. Every
+    payload gets its EMAIL_ID_KEY, which a duplicate's DUPLICATE_OF_KEY refers to.
+
+    unique() filters the extracted payloads and expand() puts the duplicates back into
+    the redacted stream, in their original place:
+
+        redacted = dedup.expand(redact_payloads(dedup.unique(payloads)))
+
+    A copy needs the redacted original, so only the last DEDUP_RECENT_COPIES originals
+    are kept. A duplicate of an older one is redacted in full.
+    """
+
+    def __init__(self, mode: str = DUPLICATES_REFERENCE, recent: int = DEDUP_RECENT_COPIES):
+        if mode not in DUPLICATE_MODES:
+            raise ValueError(
+                f"Unknown duplicates mode '{mode}', expected one of: "
+                f"{', '.join(DUPLICATE_MODES)}"
+            )
+        self.mode = mode
+        self.recent = recent
+        # Duplicates collapsed, by the key they matched on
+        self.by_message_id = 0
+        self.by_body = 0
+        # Duplicates redacted in full, as their original was no longer kept
+        self.redacted = 0
+        # The EMAIL_ID_KEY of the first email with each message id and body hash
+        self._originals = {}
+        # For each payload passed on to redaction, the duplicates found just before it,
+        # as (EMAIL_ID_KEY, original's EMAIL_ID_KEY, redacted original or None). The last
+        # entry collects the duplicates after the latest payload.
+        self._duplicates = deque([[]])
+        # With copies: the originals not redacted yet, those of them that duplicates are
+        # waiting for, the redacted ones kept for those duplicates, and the recent ones
+        self._unredacted = set()
+        self._waiting = {}
+        self._held = {}
+        self._recent = OrderedDict()
+
+    @property
+    def collapsed(self) -> int:
+        return self.by_message_id + self.by_body
+
+    def _original(self, payload_id: str, payload_body: str | None) -> tuple[str | None, bool]:
+        """
+        Return the ID of the email the payload duplicates, and whether it matched on the
+        body, recording the payload as an original if it duplicates none.
+        """
+        if payload_id in self._originals:
+            return self._originals[payload_id], False
+        if payload_body is not None and payload_body in self._originals:
+            return self._originals[payload_body], True
+        self._originals[payload_id] = payload_id
+        if payload_body is not None:
+            self._originals[payload_body] = payload_id
+        return None, False
+
+    def _collapse(self, payload_id: str, original_id: str) -> bool:
+        """
+        Queue the duplicate to be written before the next payload, unless it needs a
+        copy of an original that is no longer kept.
+        """
+        redacted_original = None
+        if self.mode == DUPLICATES_COPY:
+            if original_id in self._unredacted:
+                self._waiting[original_id] = self._waiting.get(original_id, 0) + 1
+            elif original_id in self._recent:
+                redacted_original = self._recent[original_id]
+            else:
+                return False
+        self._duplicates[-1].append((payload_id, original_id, redacted_original))
+        return True
+
+    def unique(self, payloads: Iterable[dict]) -> Iterator[dict]:
+        """
+        Yield the payloads that duplicate none before them, each with its EMAIL_ID_KEY.
+        """
+        for payload in payloads:
+            payload_id = payload.get(EMAIL_ID_KEY) or email_id(payload)
+            payload[EMAIL_ID_KEY] = payload_id
+            original_id, on_body = self._original(payload_id, body_hash(payload))
+            if original_id is not None and self._collapse(payload_id, original_id):
+                if on_body:
+                    self.by_body += 1
+                else:
+                    self.by_message_id += 1
+                continue
+            if original_id is not None:
+                self.redacted += 1
+            if self.mode == DUPLICATES_COPY:
+                self._unredacted.add(payload_id)
+            self._duplicates.append([])
+            yield payload
+
+    def _duplicate(
+        self, payload_id: str, original_id: str, redacted_original: dict | None
+    ) -> dict:
+        """
+        Return the output for a duplicate: a reference to its original, or a copy of it.
+        """
+        if self.mode == DUPLICATES_REFERENCE:
+            return {EMAIL_ID_KEY: payload_id, DUPLICATE_OF_KEY: original_id}
+        if redacted_original is None:
+            redacted_original, count = self._held[original_id]
+            if count == 1:
+                del self._held[original_id]
+            else:
+                self._held[original_id] = (redacted_original, count - 1)
+        duplicate = copy.deepcopy(redacted_original)
+        duplicate[EMAIL_ID_KEY] = payload_id
+        duplicate[DUPLICATE_OF_KEY] = original_id
+        return duplicate
+
+    def _keep(self, redacted: dict) -> None:
+        """
+        Keep a redacted original for the duplicates of it that are, or may be, found.
+        """
+        payload_id = redacted[EMAIL_ID_KEY]
+        self._unredacted.discard(payload_id)
+        if payload_id in self._waiting:
+            self._held[payload_id] = (redacted, self._waiting.pop(payload_id))
+        self._recent[payload_id] = redacted
+        if len(self._recent) > self.recent:
+            self._recent.popitem(last=False)
+
+    def expand(self, redacted_payloads: Iterable[dict]) -> Iterator[dict]:
+        """
+        Yield the redacted payloads from unique(), with the duplicates of earlier ones
+        put back before each of them, and after the last one.
+        """
+        for redacted in redacted_payloads:
+            for duplicate in self._duplicates.popleft():
+                yield self._duplicate(*duplicate)
+            if self.mode == DUPLICATES_COPY:
+                self._keep(redacted)
+            yield redacted
+        for duplicate in self._duplicates.popleft():
+            yield self._duplicate(*duplicate)
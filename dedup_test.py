@@ -0,0 +1,124 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test collapsing duplicate emails before redaction
+"""
+
+import copy
+
+import pytest
+
+from dedup import (
+    DUPLICATE_OF_KEY,
+    DUPLICATES_COPY,
+    DUPLICATES_REFERENCE,
+    Deduplicator,
+    body_hash,
+)
+from manifest import EMAIL_ID_KEY, email_id
+from redact import redact_payload, redact_payloads
+from redact_test import make_payload
+
+
+def make_payloads() -> list[dict]:
+    """
+    Return emails where the second is a copy of the first from another folder, and the
+    fourth a forward of the first with the same body.
+    """
+    bodies = ["Call John on 021 555 1234", "", "Meet at 10 Main Street", "", "Bye"]
+    bodies[1] = bodies[0]
+    bodies[3] = "Call John on\n021 555 1234\n"
+    payloads = []
+    for index, body in enumerate(bodies):
+        payload = make_payload(f"Email {index}", body)
+        payload["headers"]["message_id"] = f"<{index}@example.com>"
+        payloads.append(payload)
+    payloads[1]["headers"]["message_id"] = " <0@example.com>"
+    payloads[3]["headers"]["subject"] = "Fwd: Email 0"
+    return payloads
+
+
+def read_ahead(payloads):
+    """
+    Redact the payloads only once they have all been read, like a pool of workers with
+    many payloads in flight.
+    """
+    return redact_payloads(list(payloads))
+
+
+def test_body_hash():
+    first, second, third = (make_payload("Hello", plain) for plain in ("a  b\n", "a b", "ab"))
+    assert body_hash(first) == body_hash(second)
+    assert body_hash(first) != body_hash(third)
+    assert body_hash(make_payload("Hello", " \n")) is None
+
+
+@pytest.mark.parametrize("redact", [redact_payloads, read_ahead])
+def test_reference_duplicates(redact):
+    payloads = make_payloads()
+    redacted_count = 0
+
+    def counted(payloads):
+        nonlocal redacted_count
+        for payload in payloads:
+            redacted_count += 1
+            yield payload
+
+    dedup = Deduplicator(DUPLICATES_REFERENCE)
+    redacted = list(dedup.expand(redact(counted(dedup.unique(copy.deepcopy(payloads))))))
+
+    assert redacted_count == 3
+    assert (dedup.collapsed, dedup.by_message_id, dedup.by_body) == (2, 1, 1)
+    ids = [email_id(payload) for payload in payloads]
+    assert [payload[EMAIL_ID_KEY] for payload in redacted] == ids
+    assert redacted[1] == {EMAIL_ID_KEY: ids[0], DUPLICATE_OF_KEY: ids[0]}
+    assert redacted[3] == {EMAIL_ID_KEY: ids[3], DUPLICATE_OF_KEY: ids[0]}
+    assert "021 555 1234" not in redacted[0]["plain"]
+    assert redacted[4]["plain"] == "Bye"
+
+
+@pytest.mark.parametrize("redact", [redact_payloads, read_ahead])
+def test_copy_duplicates(redact):
+    payloads = make_payloads()
+    dedup = Deduplicator(DUPLICATES_COPY)
+    redacted = list(dedup.expand(redact(dedup.unique(copy.deepcopy(payloads)))))
+
+    assert dedup.collapsed == 2
+    assert [payload[EMAIL_ID_KEY] for payload in redacted] == [
+        email_id(payload) for payload in payloads
+    ]
+    for index in (1, 3):
+        duplicate = dict(redacted[index])
+        assert duplicate.pop(DUPLICATE_OF_KEY) == redacted[0][EMAIL_ID_KEY]
+        duplicate[EMAIL_ID_KEY] = redacted[0][EMAIL_ID_KEY]
+        assert duplicate == redacted[0]
+    # Only the holds for the duplicates' originals were kept, and they are released
+    assert not dedup._held
+    assert not dedup._waiting
+
+
+def test_copy_of_original_no_longer_kept():
+    payloads = make_payloads()
+    payloads.append(copy.deepcopy(payloads[0]))
+    dedup = Deduplicator(DUPLICATES_COPY, recent=2)
+    # Redact each payload as soon as it is read
+    redacted = list(
+        dedup.expand(
+            redact_payload(payload) for payload in dedup.unique(copy.deepcopy(payloads))
+        )
+    )
+
+    # The last repeat of the first email came once two others were redacted after it, so
+    # it was redacted again rather than copied
+    assert (dedup.collapsed, dedup.redacted) == (2, 1)
+    assert DUPLICATE_OF_KEY not in redacted[5]
+    assert redacted[5] == redacted[0]
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown duplicates mode"):
+        Deduplicator("link")
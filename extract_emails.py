@@ -10,42 +10,65 @@ Tool to pre-process bulk import files into JSON
 
 import json
 import uuid
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
 
 from constants import EXPORT_DIR
 from import_handlers import (
+    PST_BACKEND_AUTO,
+    import_jsonl,
     import_pst,
     import_spreadsheet,
+    is_jsonl_file,
 )
 
 
-def extract_emails(file_name: str) -> str:
+def iter_emails(file_name: str, pst_backend: str = PST_BACKEND_AUTO) -> Iterator[dict]:
     """
-    Extract the emails from the PST/CSV and return the export file location.
+    Yield the email payloads from the PST/CSV/JSONL as they are read.
     """
-    # Decide whether to use PST or CSV/Excel to import the file
-    payloads = []
+    # Decide whether to use PST, JSON Lines or CSV/Excel to import the file
     if file_name.lower().endswith(".pst"):
         print(f"PST processing for {file_name}")
-        payloads = import_pst(file_name)
-    else:
-        print(f"CSV processing for {file_name}")
-        payloads = import_spreadsheet(file_name)
+        return import_pst(file_name, backend=pst_backend)
+    if is_jsonl_file(file_name):
+        print(f"JSON Lines processing for {file_name}")
+        return import_jsonl(file_name)
+    print(f"CSV processing for {file_name}")
+    return import_spreadsheet(file_name)
 
+
+def make_export_dir() -> str:
+    """
+    Create a new timestamped directory for exported payloads and return its location.
+    """
     dir_path = Path(EXPORT_DIR, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
     dir_path.mkdir(parents=True, exist_ok=True)
-    export_dir = str(dir_path)
+    return str(dir_path)
+
+
+def save_payload(payload: dict, path: str) -> None:
+    """
+    Write a payload to a JSON file.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=4)
+
+
+def extract_emails(file_name: str) -> str:
+    """
+    Extract the emails from the PST/CSV and return the export file location.
+    """
+    export_dir = make_export_dir()
     item_count = 0
-    for item_count, payload in enumerate(payloads):
+    for item_count, payload in enumerate(iter_emails(file_name)):
         if item_count % 50 == 0:
             print(f"\nSaving payload {item_count + 1}")
         print(".", end="", flush=True)
 
         filename = str(uuid.uuid4())
-        path = f"{export_dir}/{filename}.json"
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=4)
+        save_payload(payload, f"{export_dir}/{filename}.json")
 
     print(f"\nTotal payloads: {item_count + 1}")
     return export_dir
@@ -0,0 +1,183 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test extracting emails from import files
+"""
+
+import csv
+import gzip
+import inspect
+import io
+import json
+
+import openpyxl
+import pytest
+
+from extract_emails import iter_emails
+from import_handlers.pst import (
+    iter_extracted_messages,
+    iter_pypff_messages,
+    load_message,
+    process_messages,
+)
+from import_handlers.spreadsheet import import_spreadsheet
+
+CSV_DATA = """unique_id,Subject,Body,Date,To,From,Cc
+1,Hello,Plain text body,2025-01-09,support@example.com,john@example.com,
+2,Invoice,<html><body>HTML body</body></html>,2025-01-10,a@b.com;c@d.com,x@y.com,e@f.com;g@h.com
+"""
+
+
+def test_iter_emails_spreadsheet(tmp_path):
+    csv_file = tmp_path / "emails.csv"
+    csv_file.write_text(CSV_DATA)
+
+    payloads = iter_emails(str(csv_file))
+    assert inspect.isgenerator(payloads)
+    payloads = list(payloads)
+
+    assert len(payloads) == 2
+    assert payloads[0]["headers"]["message_id"] == "<1>"
+    assert payloads[0]["plain"] == "Plain text body"
+    assert payloads[1]["html"] == "<html><body>HTML body</body></html>"
+    assert payloads[1]["headers"]["to"] == "a@b.com"
+    assert payloads[1]["headers"]["cc"] == "c@d.com,e@f.com,g@h.com"
+
+    # Each import starts from scratch
+    assert len(list(iter_emails(str(csv_file)))) == 2
+
+
+def test_iter_emails_jsonl(tmp_path):
+    payloads = [
+        {"headers": {"message_id": f"<{index}>"}, "plain": "Kia ora"} for index in range(3)
+    ]
+    lines = "\n".join(json.dumps(payload) for payload in payloads) + "\n\n"
+    jsonl_file = tmp_path / "emails.jsonl"
+    jsonl_file.write_text(lines)
+    gzip_file = tmp_path / "emails.ndjson.gz"
+    gzip_file.write_bytes(gzip.compress(lines.encode()))
+
+    assert list(iter_emails(str(jsonl_file))) == payloads
+    assert list(iter_emails(str(gzip_file))) == payloads
+
+
+def write_extracted_message(
+    message_dir, message_file: str, body: str, message_id: str
+) -> None:
+    message_dir.mkdir(parents=True)
+    headers = f"Message-ID: {message_id}\nFrom: john@example.com\nSubject: Hello\n"
+    (message_dir / "InternetHeaders.txt").write_text(headers)
+    (message_dir / message_file).write_text(body)
+
+
+def test_process_extracted_pst(tmp_path):
+    inbox = tmp_path / "pst.export" / "Top of Personal Folders" / "Inbox"
+    for index in range(10):
+        write_extracted_message(
+            inbox / f"Message{index:05}", "Message.txt", f"Body {index}", f"<{index}>"
+        )
+    write_extracted_message(
+        inbox / "Message00010", "Message.html", "<html><body>Hi</body></html>", "<10>"
+    )
+    write_extracted_message(
+        tmp_path / "pst.export" / "Sent Items" / "Message00000", "Message.txt", "Sent", "<s>"
+    )
+
+    messages = list(iter_extracted_messages(str(tmp_path / "pst.export")))
+    payloads = list(process_messages(iter(messages), threads=2))
+
+    # The payloads come out in the order the messages were found
+    assert [payload["headers"]["message_id"] for payload in payloads] == [
+        load_message(message)["headers"]["message_id"] for message in messages
+    ]
+
+    message_ids = sorted(payload["headers"]["message_id"] for payload in payloads)
+    assert message_ids == sorted(f"<{index}>" for index in range(11))
+    payloads_by_id = {payload["headers"]["message_id"]: payload for payload in payloads}
+    assert payloads_by_id["<3>"]["plain"] == "Body 3"
+    assert payloads_by_id["<10>"]["html"] == "<html><body>Hi</body></html>"
+
+
+class FakeMessage:
+    def __init__(self, message_id: str, html_body: bytes | None = None, plain_text_body=None):
+        self.transport_headers = f"Message-ID: {message_id}\nSubject: Hello\n"
+        self.html_body = html_body
+        self.plain_text_body = plain_text_body
+
+
+class FakeFolder:
+    """
+    The parts of a pypff folder that the pypff backend uses.
+    """
+
+    def __init__(self, name: str, messages=(), sub_folders=()):
+        self.name = name
+        self.messages = list(messages)
+        self.sub_folders = list(sub_folders)
+        self.number_of_sub_messages = len(self.messages)
+        self.number_of_sub_folders = len(self.sub_folders)
+
+    def get_sub_message(self, index: int) -> FakeMessage:
+        return self.messages[index]
+
+    def get_sub_folder(self, index: int) -> "FakeFolder":
+        return self.sub_folders[index]
+
+
+def test_iter_pypff_messages():
+    inbox = FakeFolder(
+        "Inbox",
+        messages=[
+            FakeMessage(
+                "<1>", html_body=b"<html><body>Hi</body></html>", plain_text_body=b"Hi"
+            ),
+            FakeMessage("<2>", plain_text_body=b"Plain"),
+        ],
+        sub_folders=[
+            FakeFolder("Sent Items", messages=[FakeMessage("<3>", plain_text_body=b"")])
+        ],
+    )
+    root = FakeFolder(
+        "", sub_folders=[FakeFolder("Top of Personal Folders", sub_folders=[inbox])]
+    )
+
+    payloads = list(iter_pypff_messages(root))
+
+    assert [payload["headers"]["message_id"] for payload in payloads] == ["<1>", "<2>"]
+    assert payloads[0]["html"] == "<html><body>Hi</body></html>"
+    assert payloads[1]["plain"] == "Plain"
+
+
+def test_import_spreadsheet_chunks(tmp_path):
+    csv_file = tmp_path / "emails.csv"
+    csv_file.write_text(CSV_DATA.replace("Subject", "SUBJECT"))
+    xlsx_file = tmp_path / "emails.xlsx"
+    workbook = openpyxl.Workbook()
+    for row in csv.reader(io.StringIO(CSV_DATA)):
+        workbook.active.append([cell or None for cell in row])
+    workbook.save(xlsx_file)
+
+    expected = list(iter_emails(str(csv_file)))
+    assert list(import_spreadsheet(str(csv_file), chunk_size=1)) == expected
+    assert list(import_spreadsheet(str(xlsx_file), chunk_size=1)) == expected
+
+
+def test_import_spreadsheet_without_rows(tmp_path):
+    for headings in (["unique_id", "Subject", "body", "date"], ["unique_id", "subject"]):
+        csv_file = tmp_path / "emails.csv"
+        csv_file.write_text(",".join(headings) + "\n")
+        xlsx_file = tmp_path / "emails.xlsx"
+        workbook = openpyxl.Workbook()
+        workbook.active.append(headings)
+        workbook.save(xlsx_file)
+
+        for file_name in (str(csv_file), str(xlsx_file)):
+            if "body" in headings:
+                assert list(import_spreadsheet(file_name)) == []
+            else:
+                with pytest.raises(Exception, match="required field"):
+                    list(import_spreadsheet(file_name))
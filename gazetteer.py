@@ -0,0 +1,217 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Redact names, places and streets that are already known from word lists, in one pass over
+the words of a text, instead of waiting for the NLP model to find them.
+"""
+
+import hashlib
+import re
+from collections.abc import Iterable
+
+# Cities and large towns of NZ and AU, always in the gazetteer. Places that are also
+# common words (e.g. Orange) are left to the NLP model.
+DEFAULT_PLACES = (
+    "Auckland",
+    "Wellington",
+    "Christchurch",
+    "Hamilton",
+    "Tauranga",
+    "Dunedin",
+    "Palmerston North",
+    "Napier",
+    "Hastings",
+    "Nelson",
+    "Rotorua",
+    "New Plymouth",
+    "Whangarei",
+    "Whangārei",
+    "Invercargill",
+    "Whanganui",
+    "Gisborne",
+    "Queenstown",
+    "Porirua",
+    "Lower Hutt",
+    "Upper Hutt",
+    "Timaru",
+    "Blenheim",
+    "Masterton",
+    "Sydney",
+    "Melbourne",
+    "Brisbane",
+    "Perth",
+    "Adelaide",
+    "Canberra",
+    "Hobart",
+    "Darwin",
+    "Gold Coast",
+    "Sunshine Coast",
+    "Newcastle",
+    "Wollongong",
+    "Geelong",
+    "Townsville",
+    "Cairns",
+    "Toowoomba",
+    "Ballarat",
+    "Bendigo",
+    "Launceston",
+    "Parramatta",
+    "Fremantle",
+)
+
+# The words of a text. Terms are split the same way, so "O'Brien" matches "O'Brien" and
+# "Auckland" matches "Auckland's".
+WORD_PATTERN = re.compile(r"\w+")
+
+# What may separate the words of a term in the text
+WORD_SEPARATOR_PATTERN = re.compile(r"\s+|[-'’]")
+
+# Categories of the terms, as their typed placeholders show them. Places use the label
+# of the NLP model, and streets the category of the street pattern.
+TERM_CATEGORY = "PERSON"
+PLACE_CATEGORY = "GPE"
+STREET_CATEGORY = "street"
+
+# A line of a word list that sets the category of the terms after it, e.g. "[ORG]"
+CATEGORY_LINE_PATTERN = re.compile(r"\[(\w+)\]")
+
+# Key of a trie node that marks the end of a term, holding its category
+_TERM_END = ""
+
+
+def read_terms(path: str, category: str = TERM_CATEGORY) -> list[tuple[str, str]]:
+    """
+    Read a word list as (term, category) pairs: one term per line, skipping blank lines
+    and # comments. A "[CATEGORY]" line sets the category of the terms after it.
+    """
+    terms = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            term = line.strip()
+            if not term or term.startswith("#"):
+                continue
+            category_line = CATEGORY_LINE_PATTERN.fullmatch(term)
+            if category_line:
+                category = category_line.group(1)
+                continue
+            terms.append((term, category))
+    return terms
+
+
+class Gazetteer:
+    """
+    Find the terms of word lists in a text, as whole words and with the same case.
+
+    The terms are held in a trie of their words, so each word of the text is looked up
+    once however many terms there are, and the longest term starting at it wins. Each
+    street name is matched followed by any of the street suffixes, e.g. "Queen Street".
+
+    Terms are given as text, in TERM_CATEGORY, or as (term, category) pairs.
+    """
+
+    def __init__(
+        self,
+        terms: Iterable[str | tuple[str, str]] = (),
+        streets: Iterable[str] = (),
+        street_suffixes: Iterable[str] = (),
+        places: Iterable[str] = DEFAULT_PLACES,
+    ):
+        categories = dict.fromkeys(places, PLACE_CATEGORY)
+        street_suffixes = list(street_suffixes)
+        for street in streets:
+            for suffix in street_suffixes:
+                categories[f"{street} {suffix}"] = STREET_CATEGORY
+        for term in terms:
+            term, category = (term, TERM_CATEGORY) if isinstance(term, str) else term
+            categories[term] = category
+        self.terms = sorted(categories.items())
+        self._trie = {}
+        for term, category in self.terms:
+            words = WORD_PATTERN.findall(term)
+            if not words:
+                continue
+            node = self._trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_TERM_END] = category
+
+    @classmethod
+    def from_files(
+        cls,
+        term_paths: Iterable[str] = (),
+        street_paths: Iterable[str] = (),
+        street_suffixes: Iterable[str] = (),
+    ) -> "Gazetteer":
+        """
+        Build a gazetteer from word list files (see read_terms()), along with DEFAULT_PLACES.
+        """
+        terms = [term for path in term_paths for term in read_terms(path)]
+        streets = [street for path in street_paths for street, _ in read_terms(path)]
+        return cls(terms, streets, street_suffixes)
+
+    def digest(self) -> str:
+        """
+        Identify the terms and their categories, for keying a RedactionCache.
+        """
+        lines = (f"{term}\t{category}" for term, category in self.terms)
+        return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+    def _longest_term(
+        self, text: str, words: list[re.Match], index: int
+    ) -> tuple[int, str] | None:
+        """
+        Return the index of the last word of the longest term starting at words[index],
+        with the term's category.
+        """
+        node = self._trie[words[index].group()]
+        last = (index, node[_TERM_END]) if _TERM_END in node else None
+        while index + 1 < len(words):
+            gap = text[words[index].end() : words[index + 1].start()]
+            if not WORD_SEPARATOR_PATTERN.fullmatch(gap):
+                break
+            index += 1
+            node = node.get(words[index].group())
+            if node is None:
+                break
+            if _TERM_END in node:
+                last = (index, node[_TERM_END])
+        return last
+
+    def spans(self, text: str) -> list[tuple[int, int, str]]:
+        """
+        Return the (start, end, category) of each term in the text, in order and not
+        overlapping.
+        """
+        words = list(WORD_PATTERN.finditer(text))
+        spans = []
+        index = 0
+        while index < len(words):
+            if words[index].group() in self._trie:
+                term = self._longest_term(text, words, index)
+                if term is not None:
+                    last, category = term
+                    spans.append((words[index].start(), words[last].end(), category))
+                    index = last + 1
+                    continue
+            index += 1
+        return spans
+
+    def redact(self, text: str, redaction_text: str) -> str:
+        """
+        Replace every term in the text with the redaction text.
+        """
+        spans = self.spans(text)
+        if not spans:
+            return text
+        parts = []
+        position = 0
+        for start, end, _ in spans:
+            parts.append(text[position:start])
+            parts.append(redaction_text)
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
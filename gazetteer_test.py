@@ -0,0 +1,65 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test redacting known names, places and streets with the gazetteer
+"""
+
+from gazetteer import Gazetteer, read_terms
+
+
+def test_gazetteer_spans():
+    gazetteer = Gazetteer(["John", "John Smith", "Mary O'Brien"], places=["New Plymouth"])
+    text = "John Smith and Mary O'Brien moved from New  Plymouth, then John Wilson too."
+    matched = [text[start:end] for start, end, _ in gazetteer.spans(text)]
+    # The longest term wins, and the words of a term may be split by any whitespace
+    assert matched == ["John Smith", "Mary O'Brien", "New  Plymouth", "John"]
+
+
+def test_gazetteer_whole_words_and_case():
+    gazetteer = Gazetteer(["Mark"], places=["Perth"])
+    assert gazetteer.spans("Marks, marked, mark and Perthshire") == []
+    text = "Mark's trip to Perth."
+    assert [text[start:end] for start, end, _ in gazetteer.spans(text)] == ["Mark", "Perth"]
+    # A term's words must be next to each other
+    assert Gazetteer(["New Plymouth"], places=[]).spans("New, Plymouth") == []
+
+
+def test_gazetteer_streets():
+    gazetteer = Gazetteer(streets=["Queen"], street_suffixes=["Street", "St"], places=[])
+    assert (
+        gazetteer.redact("Meet on Queen St or Queen Street, not Queen Mary.", "[REDACTED]")
+        == "Meet on [REDACTED] or [REDACTED], not Queen Mary."
+    )
+
+
+def test_gazetteer_default_places():
+    gazetteer = Gazetteer()
+    assert gazetteer.redact("From Auckland to Gold Coast", "[X]") == "From [X] to [X]"
+
+
+def test_gazetteer_from_files(tmp_path):
+    names = tmp_path / "names.txt"
+    names.write_text(
+        "# Customers\nAroha Ngata\n\n  Tama  \n[ORG]\nKiwi Insurance\n", encoding="utf-8"
+    )
+    streets = tmp_path / "streets.txt"
+    streets.write_text("Cuba\n", encoding="utf-8")
+    assert read_terms(str(names)) == [
+        ("Aroha Ngata", "PERSON"),
+        ("Tama", "PERSON"),
+        ("Kiwi Insurance", "ORG"),
+    ]
+
+    gazetteer = Gazetteer.from_files([str(names)], [str(streets)], ["Street"])
+    text = "Tama of Kiwi Insurance, 12 Cuba Street, Wellington"
+    assert [(text[start:end], category) for start, end, category in gazetteer.spans(text)] == [
+        ("Tama", "PERSON"),
+        ("Kiwi Insurance", "ORG"),
+        ("Cuba Street", "street"),
+        ("Wellington", "GPE"),
+    ]
+    assert gazetteer.digest() != Gazetteer().digest()
@@ -0,0 +1,158 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Find the text in an HTML document that needs redacting, leaving the markup alone.
+"""
+
+import html
+import re
+from collections.abc import Callable
+from urllib.parse import unquote
+
+# Markup that is copied as it is: comments, scripts and styles with their content,
+# doctypes and other declarations, processing instructions, and tags
+MARKUP_PATTERN = re.compile(
+    r"<!--.*?(?:-->|$)"
+    r"|<(script|style)\b(?:[^>\"']|\"[^\"]*\"|'[^']*')*>.*?(?:</\1\s*>|$)"
+    r"|<![^>]*>"
+    r"|<\?.*?>"
+    r"|</?[a-zA-Z](?:[^>\"']|\"[^\"]*\"|'[^']*')*>",
+    re.DOTALL | re.IGNORECASE,
+)
+
+# An attribute in a tag, with its value quoted or not
+ATTRIBUTE_PATTERN = re.compile(
+    r"""([^\s"'<>/=]+)(\s*=\s*)(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""",
+)
+
+# Attributes whose whole value is text that may hold PII
+TEXT_ATTRIBUTES = ("alt", "title")
+
+# Links whose target (after the scheme) may hold PII, e.g. "mailto:john@example.com"
+LINK_ATTRIBUTES = ("href",)
+PII_LINK_SCHEMES = ("mailto:", "tel:", "sms:", "callto:")
+
+# Attributes whose value is a URL (or a list of them), which may hold PII in its path or
+# query string, e.g. "https://example.com/?email=john@example.com"
+URL_ATTRIBUTES = (
+    "action",
+    "background",
+    "cite",
+    "codebase",
+    "data",
+    "formaction",
+    "href",
+    "longdesc",
+    "ping",
+    "poster",
+    "src",
+    "srcset",
+    "usemap",
+)
+
+
+class HtmlDocument:
+    """
+    An HTML document split into the pieces that are copied as they are, and the text
+    nodes and attribute values that need redacting.
+    """
+
+    def __init__(self, document: str):
+        # The document, as pieces that join back into it
+        self.parts = []
+        # (index in parts, unescaped text, is an attribute value) of each redactable piece
+        self.redactable = []
+        # (index in parts, unescaped and percent-decoded URL) of each URL attribute value
+        self.urls = []
+
+        position = 0
+        for match in MARKUP_PATTERN.finditer(document):
+            self._add_text(document[position : match.start()])
+            if match.group(1) or not match.group(0)[1:2].isalpha():
+                self.parts.append(match.group(0))
+            else:
+                self._add_tag(match.group(0))
+            position = match.end()
+        self._add_text(document[position:])
+
+    def _add_text(self, text: str) -> None:
+        if not text.strip():
+            if text:
+                self.parts.append(text)
+            return
+        self.redactable.append((len(self.parts), html.unescape(text), False))
+        self.parts.append(text)
+
+    def _add_tag(self, tag: str) -> None:
+        position = 0
+        for match in ATTRIBUTE_PATTERN.finditer(tag):
+            name = match.group(1).lower()
+            value_group = next(group for group in (3, 4, 5) if match.group(group) is not None)
+            value = match.group(value_group)
+            start = match.start(value_group)
+            scheme = None
+            if name in LINK_ATTRIBUTES:
+                scheme = next(
+                    (s for s in PII_LINK_SCHEMES if value.lower().startswith(s)), None
+                )
+            if scheme:
+                # The target is text, e.g. a name and email address, so it is redacted
+                # like a text node
+                start += len(scheme)
+                value = value[len(scheme) :]
+            elif name in URL_ATTRIBUTES:
+                position = self._add_url(tag, position, start, value)
+                continue
+            elif name not in TEXT_ATTRIBUTES:
+                continue
+            if not value.strip():
+                continue
+            self.parts.append(tag[position:start])
+            self.redactable.append((len(self.parts), html.unescape(value), True))
+            self.parts.append(value)
+            position = match.end(value_group)
+        self.parts.append(tag[position:])
+
+    def _add_url(self, tag: str, position: int, start: int, value: str) -> int:
+        """
+        Add a URL attribute value that starts at start in the tag, returning the position
+        in the tag after it.
+        """
+        if not value.strip():
+            return position
+        self.parts.append(tag[position:start])
+        self.urls.append((len(self.parts), unquote(html.unescape(value))))
+        self.parts.append(value)
+        return start + len(value)
+
+    def texts(self) -> list[str]:
+        """
+        Return the unescaped text of each redactable piece.
+        """
+        return [text for _, text, _ in self.redactable]
+
+    def join(
+        self, redacted_texts: list[str], redact_url: Callable[[str], str] | None = None
+    ) -> str:
+        """
+        Put the document back together with the redacted texts, and the URL attribute
+        values redacted with redact_url, if it is given.
+
+        Pieces that redaction didn't change keep their original markup and escaping.
+        """
+        parts = list(self.parts)
+        if redact_url is not None:
+            for index, url in self.urls:
+                redacted = redact_url(url)
+                if redacted != url:
+                    parts[index] = html.escape(redacted)
+        for (index, text, is_attribute), redacted in zip(
+            self.redactable, redacted_texts, strict=True
+        ):
+            if redacted != text:
+                parts[index] = html.escape(redacted, quote=is_attribute)
+        return "".join(parts)
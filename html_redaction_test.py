@@ -0,0 +1,64 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test finding the redactable text in HTML documents
+"""
+
+from html_redaction import HtmlDocument
+
+DOCUMENT = """<html xmlns:o="urn:schemas-microsoft-com:office:office">
+<head><style>p { font-family: "Calibri"; }</style><title>Hi John</title></head>
+<body>
+<!-- Sent from 021 555 1234 -->
+<p title="John's phone">Call me on 021&nbsp;555&nbsp;1234 &amp; ask for John.</p>
+<a href="mailto:john@example.com?subject=Hi">Email</a> <a href="https://example.com">Web</a>
+<img src="cid:logo.png" alt='John "JS" Smith'>
+<script>var phone = "021 555 1234";</script>
+</body>
+</html>"""
+
+
+def test_html_document_texts():
+    document = HtmlDocument(DOCUMENT)
+    assert document.texts() == [
+        "Hi John",
+        "John's phone",
+        "Call me on 021\xa0555\xa01234 & ask for John.",
+        "john@example.com?subject=Hi",
+        "Email",
+        "Web",
+        'John "JS" Smith',
+    ]
+
+
+def test_html_document_join():
+    document = HtmlDocument(DOCUMENT)
+    # Text that redaction doesn't change keeps its original escaping
+    assert document.join(document.texts()) == DOCUMENT
+
+    redacted = document.join([text.replace("John", "[REDACTED]") for text in document.texts()])
+    assert "<title>Hi [REDACTED]</title>" in redacted
+    assert '<p title="[REDACTED]&#x27;s phone">' in redacted
+    assert "Call me on 021\xa0555\xa01234 &amp; ask for [REDACTED].</p>" in redacted
+    assert "alt='[REDACTED] &quot;JS&quot; Smith'" in redacted
+    assert 'xmlns:o="urn:schemas-microsoft-com:office:office"' in redacted
+
+
+def test_html_document_urls():
+    document = HtmlDocument(DOCUMENT)
+    assert [url for _, url in document.urls] == ["https://example.com", "cid:logo.png"]
+
+    document = HtmlDocument('<a href="https://x/?email=jane%40corp.co.nz&amp;a=1">Hi</a>')
+    assert [url for _, url in document.urls] == ["https://x/?email=jane@corp.co.nz&a=1"]
+    redacted = document.join(["Hi"], lambda url: url.replace("jane@corp.co.nz", "[REDACTED]"))
+    assert redacted == '<a href="https://x/?email=[REDACTED]&amp;a=1">Hi</a>'
+
+
+def test_html_document_without_text():
+    document = HtmlDocument("<html><body><br/></body></html>")
+    assert document.texts() == []
+    assert document.join([]) == "<html><body><br/></body></html>"
@@ -9,11 +9,16 @@ Expose the handler functions for the file formats.
 """
 
 from .constants import VALID_FIELDS
-from .pst import import_pst
+from .jsonl import import_jsonl, is_jsonl_file
+from .pst import PST_BACKEND_AUTO, PST_BACKENDS, import_pst
 from .spreadsheet import import_spreadsheet
 
 __all__ = (
+    "PST_BACKENDS",
+    "PST_BACKEND_AUTO",
     "VALID_FIELDS",
+    "import_jsonl",
     "import_pst",
     "import_spreadsheet",
+    "is_jsonl_file",
 )
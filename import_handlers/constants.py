@@ -17,3 +17,9 @@ VALID_FIELDS = [
     "body_plain",
     "body_html",
 ]
+
+# Number of threads reading the messages of an extracted PST file
+PST_READ_THREADS = 8
+
+# Number of spreadsheet rows read into memory at a time
+SPREADSHEET_CHUNK_SIZE = 10_000
@@ -0,0 +1,49 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Handle import from JSON Lines (NDJSON) files of already extracted payloads.
+"""
+
+import json
+from collections.abc import Iterator
+
+from compressed_files import COMPRESSION_SUFFIXES, open_text
+
+# Suffixes of JSON Lines files, which may be followed by a compression suffix (e.g. ".gz")
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def is_jsonl_file(file_name: str) -> bool:
+    """
+    Check whether a file is a JSON Lines file, compressed or not.
+    """
+    name = file_name.lower()
+    return any(
+        name.endswith(suffix + compression_suffix)
+        for suffix in JSONL_SUFFIXES
+        for compression_suffix in COMPRESSION_SUFFIXES.values()
+    )
+
+
+def import_jsonl(file_name: str) -> Iterator[dict]:
+    """
+    Yield the payloads in a JSON Lines file, one line at a time.
+
+    Each line must be a payload in the cloudmailin format that get_json_from_email_data
+    produces. Blank lines are skipped.
+    """
+    with open_text(file_name) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{file_name}:{line_number}: invalid JSON ({e})") from e
+            if not isinstance(payload, dict):
+                raise TypeError(f"{file_name}:{line_number}: expected a JSON object per line")
+            yield payload
@@ -13,16 +13,29 @@ import email
 import os
 import subprocess  # nosec
 import tempfile
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 
+from .constants import PST_READ_THREADS
 from .utils import is_html, lowercase_keys
 
+# Folders that are skipped, along with everything inside them, to only process the Inbox
 IGNORE_DIR_LIST = [
-    "/Sent Items/",
-    "/Recoverable Items/",
-    "/Junk Email/",
-    "/Attachments/",
+    "Sent Items",
+    "Recoverable Items",
+    "Junk Email",
+    "Attachments",
 ]
 
+# How the PST file is read: with the pypff bindings of libpff if they are installed,
+# otherwise by exporting it to a temporary directory with the pffexport tool
+PST_BACKEND_AUTO = "auto"
+PST_BACKEND_PYPFF = "pypff"
+PST_BACKEND_PFFEXPORT = "pffexport"
+PST_BACKENDS = (PST_BACKEND_AUTO, PST_BACKEND_PYPFF, PST_BACKEND_PFFEXPORT)
+
 
 def run_pffexport(*, pst_file_path: str, extraction_path: str) -> None:
     """
@@ -43,40 +56,31 @@ def run_pffexport(*, pst_file_path: str, extraction_path: str) -> None:
         )
 
 
-def get_required_data_from_extracted_pst(processed_pst_path: str) -> tuple[dict, dict]:
+def iter_extracted_messages(processed_pst_path: str) -> Iterator[dict]:
     """
-    Function to extract the paths for messages and headers.
+    Yield the paths of the message and headers files of each message as it is found.
+
+    HTML bodies (Message.html) are preferred over plain text bodies (Message.txt).
     """
     print(f"Converting emails from '{processed_pst_path}'.")
-    html_messages = {}
-    text_messages = {}
-    for current_dir_path, _, current_files in os.walk(processed_pst_path):
+    for current_dir_path, sub_dirs, current_files in os.walk(processed_pst_path):
         # Ignore some folders, and try to only process the Inbox
-        if any(ignore_dir in current_dir_path for ignore_dir in IGNORE_DIR_LIST):
-            continue
+        sub_dirs[:] = [sub_dir for sub_dir in sub_dirs if sub_dir not in IGNORE_DIR_LIST]
 
-        # Search for all folders that start with MessageXXX
-        current_dir = current_dir_path.split("/")[-1]
-        if current_dir.startswith("Message"):
-            message_number = current_dir.split("Message")[-1]
-            now = datetime.datetime.now().timestamp()
-            unique_message_id = f"{message_number}__{now}"
-            # Extract the to/from addresses and the subject from
-            # the InternetHeaders.txt file, and get the email body from Message.txt or
-            # Message.html
-            if "InternetHeaders.txt" in current_files:
-                if "Message.html" in current_files:
-                    html_messages[unique_message_id] = {
-                        "message": f"{current_dir_path}/Message.html",
-                        "headers": f"{current_dir_path}/InternetHeaders.txt",
-                    }
-                elif "Message.txt" in current_files:
-                    text_messages[unique_message_id] = {
-                        "message": f"{current_dir_path}/Message.txt",
-                        "headers": f"{current_dir_path}/InternetHeaders.txt",
-                    }
+        # Search for all folders that start with MessageXXX, and extract the to/from
+        # addresses and the subject from the InternetHeaders.txt file, and get the email
+        # body from Message.txt or Message.html
+        current_dir = os.path.basename(current_dir_path)
+        if not current_dir.startswith("Message") or "InternetHeaders.txt" not in current_files:
+            continue
+        for message_file in ("Message.html", "Message.txt"):
+            if message_file in current_files:
+                yield {
+                    "message": f"{current_dir_path}/{message_file}",
+                    "headers": f"{current_dir_path}/InternetHeaders.txt",
+                }
+                break
     print(f"Completed converting emails from '{processed_pst_path}'.")
-    return (html_messages, text_messages)
 
 
 def read_file(file_path: str) -> str:
@@ -167,37 +171,106 @@ def get_json_from_email_data(*, headers: dict, message: str) -> dict:
     return json_body
 
 
-def process_messages(message_dict: dict) -> list[dict]:
+def load_message(message_paths: dict) -> dict:
+    """
+    Read the message and headers files of a message, and return its payload.
     """
-    Get data from all the messages in the dict, then create the json payload.
+    message = read_file(file_path=message_paths["message"])
+    headers = extract_headers_file(headers_file=message_paths["headers"])
+    return get_json_from_email_data(headers=headers, message=message)
+
+
+def process_messages(
+    messages: Iterable[dict], threads: int = PST_READ_THREADS
+) -> Iterator[dict]:
+    """
+    Load the messages over a pool of threads, then yield each json payload in order.
+
+    Reading the files overlaps with the walk of the extracted PST, and at most a few
+    messages per thread are loaded ahead of the consumer.
     """
     print("Transforming emails into payloads.")
-    messages_payloads = []
-    for message_paths in message_dict.values():
-        message = read_file(file_path=message_paths["message"])
-        headers = extract_headers_file(headers_file=message_paths["headers"])
-        message_json = get_json_from_email_data(headers=headers, message=message)
-        messages_payloads.append(message_json)
-    print(f"Completed transforming emails into payloads. Total {len(messages_payloads)}")
-    return messages_payloads
-
-
-def import_pst(pst_file_location: str) -> list:
-    """
-    Import emails from a PST file.
-    """
-    with tempfile.TemporaryDirectory() as extraction_path:
-        # Now extract the PST file
-        try:
-            run_pffexport(pst_file_path=pst_file_location, extraction_path=extraction_path)
-            extraction_path += ".export/"
-            html_data, text_data = get_required_data_from_extracted_pst(
-                processed_pst_path=extraction_path
-            )
-            email_list = []
-            email_list.extend(process_messages(message_dict=html_data))
-            email_list.extend(process_messages(message_dict=text_data))
-        except Exception as e:
-            raise e
-
-    return email_list
+    payload_count = 0
+    max_pending = threads * 4
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = deque()
+        for message_paths in messages:
+            pending.append(executor.submit(load_message, message_paths))
+            if len(pending) >= max_pending:
+                payload_count += 1
+                yield pending.popleft().result()
+        while pending:
+            payload_count += 1
+            yield pending.popleft().result()
+    print(f"Completed transforming emails into payloads. Total {payload_count}")
+
+
+def iter_pypff_messages(folder) -> Iterator[dict]:
+    """
+    Yield the payload of each message in a pypff folder and its sub folders.
+
+    Like the pffexport backend, only messages with internet headers are imported, and an
+    HTML body is preferred over a plain text one.
+    """
+    for index in range(folder.number_of_sub_messages):
+        message = folder.get_sub_message(index)
+        transport_headers = message.transport_headers
+        if not transport_headers:
+            continue
+        body = message.html_body or message.plain_text_body
+        if body is None:
+            continue
+        headers = dict(email.message_from_string(transport_headers))
+        yield get_json_from_email_data(headers=headers, message=body)
+
+    for index in range(folder.number_of_sub_folders):
+        sub_folder = folder.get_sub_folder(index)
+        # Ignore some folders, and try to only process the Inbox
+        if sub_folder.name in IGNORE_DIR_LIST:
+            continue
+        yield from iter_pypff_messages(sub_folder)
+
+
+def import_pst_with_pypff(pst_file_location: str) -> Iterator[dict]:
+    """
+    Import emails from a PST file by reading it directly with pypff.
+    """
+    import pypff
+
+    print(f"Reading emails from '{pst_file_location}'.")
+    pst_file = pypff.file()
+    pst_file.open(pst_file_location)
+    try:
+        yield from iter_pypff_messages(pst_file.get_root_folder())
+    finally:
+        pst_file.close()
+    print(f"Completed reading emails from '{pst_file_location}'.")
+
+
+def import_pst_with_pffexport(pst_file_location: str) -> Iterator[dict]:
+    """
+    Import emails from a PST file exported to a temporary directory by pffexport.
+
+    The extracted PST is kept in a temporary directory until the payloads are exhausted.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # pffexport writes to "<target>.export", so keep the target inside the temporary
+        # directory for the export to be removed with it
+        extraction_path = os.path.join(temp_dir, "pst")
+        run_pffexport(pst_file_path=pst_file_location, extraction_path=extraction_path)
+        yield from process_messages(iter_extracted_messages(f"{extraction_path}.export/"))
+
+
+def import_pst(pst_file_location: str, backend: str = PST_BACKEND_AUTO) -> Iterator[dict]:
+    """
+    Import emails from a PST file, yielding each payload as it is read.
+    """
+    if backend == PST_BACKEND_AUTO:
+        backend = PST_BACKEND_PYPFF if find_spec("pypff") else PST_BACKEND_PFFEXPORT
+    if backend == PST_BACKEND_PYPFF:
+        return import_pst_with_pypff(pst_file_location)
+    if backend == PST_BACKEND_PFFEXPORT:
+        return import_pst_with_pffexport(pst_file_location)
+    raise ValueError(
+        f"Unknown PST backend '{backend}', expected one of: {', '.join(PST_BACKENDS)}"
+    )
@@ -8,39 +8,98 @@
 Handle import from spreadsheet files.
 """
 
-import pandas as pd
+from collections.abc import Iterator
+from itertools import batched
 
-from .utils import is_html, validate_email
+from .constants import SPREADSHEET_CHUNK_SIZE
+from .utils import validate_email
 
 # Fields that we absolutely must have in a given spreadsheet file.
 REQUIRED_FIELDS = ["unique_id", "subject", "body", "date"]
 IMPORT_FIELDS = [*REQUIRED_FIELDS, "to", "from"]
 
-# Filetypes that we support reading from.
-SUPPORTED_FILETYPE_READERS = {"csv": pd.read_csv, "xlsx": pd.read_excel}
 
-# The email list is global, so convert_to_json can access it inside the pandas loop
-email_list = []
+def read_csv_chunks(filename: str, chunk_size: int):
+    """
+    Read a CSV file a chunk of rows at a time.
+
+    Every cell is read as text, so a column is read the same way in every chunk.
+    """
+    import pandas as pd
 
+    yield from pd.read_csv(filename, chunksize=chunk_size, dtype=str)
 
-def read_spreadsheet_emails(filename):
+
+def read_csv_headings(filename: str):
+    """
+    Read just the column headings of a CSV file, as an empty DataFrame.
     """
-    Read data from the given spreadsheet file.
+    import pandas as pd
 
-    Note that a "spreadsheet file" can refer to any spreadsheet-like file, e.g.
-    a CSV file or an Excel file.
+    return pd.read_csv(filename, nrows=0, dtype=str)
 
-    Support for various spreadsheet files is outlined in the
-    SUPPORTED_FILETYPE_READERS global dict.
 
-    Note that this function assumes the filename has a file extension at the
-    end, e.g. ".csv" or ".xlsx".
+def excel_columns(header_row: tuple) -> list[str]:
+    """
+    Name the columns of an Excel sheet from its first row, like read_excel does.
+    """
+    return [
+        f"Unnamed: {index}" if heading is None else str(heading)
+        for index, heading in enumerate(header_row)
+    ]
 
-    Parameters
-    ----------
-    filename : str
-        The name of the file to read from.
 
+def read_excel_headings(filename: str):
+    """
+    Read just the column headings of the first sheet of an Excel file, as an empty
+    DataFrame.
+    """
+    import openpyxl
+    import pandas as pd
+
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        return pd.DataFrame(columns=excel_columns(next(rows, ())))
+    finally:
+        workbook.close()
+
+
+def read_excel_chunks(filename: str, chunk_size: int):
+    """
+    Read the first sheet of an Excel file a chunk of rows at a time.
+
+    The workbook is opened in read-only mode, which streams the rows instead of loading
+    the whole sheet into memory. The first row holds the column headings.
+    """
+    import numpy as np
+    import openpyxl
+    import pandas as pd
+
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = excel_columns(next(rows, ()))
+        # Skip blank rows, which read-only mode also reports after the end of the data
+        rows = (row for row in rows if any(cell is not None for cell in row))
+        for chunk_rows in batched(rows, chunk_size):
+            # Keep the cell values as they are, with blank cells as NaN like read_csv
+            chunk = pd.DataFrame(chunk_rows, columns=columns, dtype=object)
+            yield chunk.fillna(np.nan)
+    finally:
+        workbook.close()
+
+
+# Filetypes that we support reading from, and the function that reads them in chunks.
+# pandas is only imported once a spreadsheet is read, since it is slow to import.
+SUPPORTED_FILETYPE_READERS = {"csv": read_csv_chunks, "xlsx": read_excel_chunks}
+# The function that reads just the column headings of each filetype
+SUPPORTED_FILETYPE_HEADING_READERS = {"csv": read_csv_headings, "xlsx": read_excel_headings}
+
+
+def spreadsheet_file_ext(filename: str) -> str:
+    """
+    Return the extension of a spreadsheet file, checking that we support reading it.
     """
     # Split the filename on the dot, so we get the name and extension.
     # e.g. "my_file.csv" -> ["my_file", "csv"]
@@ -51,13 +110,44 @@ def read_spreadsheet_emails(filename):
             "extension, e.g. '.csv' or '.xlsx'"
         )
     file_ext = filename_parts[-1]
-    reader_func = SUPPORTED_FILETYPE_READERS.get(file_ext, None)
-    # If reader_func is None, we don't yet support using the given file type.
-    if not reader_func:
+    # If there's no reader, we don't yet support using the given file type.
+    if file_ext not in SUPPORTED_FILETYPE_READERS:
         supported_types_list = [filetype for filetype in SUPPORTED_FILETYPE_READERS.keys()]
         supported_types = "\n".join(supported_types_list)
         raise Exception(f"Unsupported file extension type. Try one of: \n{supported_types}")
-    return reader_func(filename)
+    return file_ext
+
+
+def read_spreadsheet_headings(filename: str):
+    """
+    Read just the column headings of the given spreadsheet file, as an empty DataFrame.
+    """
+    return SUPPORTED_FILETYPE_HEADING_READERS[spreadsheet_file_ext(filename)](filename)
+
+
+def read_spreadsheet_emails(filename, chunk_size: int = SPREADSHEET_CHUNK_SIZE):
+    """
+    Read data from the given spreadsheet file, yielding a DataFrame per chunk of rows.
+
+    Note that a "spreadsheet file" can refer to any spreadsheet-like file, e.g.
+    a CSV file or an Excel file.
+
+    Support for various spreadsheet files is outlined in the
+    SUPPORTED_FILETYPE_READERS global dict.
+
+    Note that this function assumes the filename has a file extension at the
+    end, e.g. ".csv" or ".xlsx".
+
+    Parameters
+    ----------
+    filename : str
+        The name of the file to read from.
+    chunk_size : int
+        The number of rows in each DataFrame.
+
+    """
+    reader_func = SUPPORTED_FILETYPE_READERS[spreadsheet_file_ext(filename)]
+    return reader_func(filename, chunk_size)
 
 
 def check_required_headings_exist(dataframe):
@@ -84,24 +174,54 @@ def check_required_headings_exist(dataframe):
 
 def lowercase_column_headings(dataframe):
     """
-    Create a lowercase column for every column in the DataFrame.
+    Return the DataFrame with every column heading in lowercase.
 
-    We do this so we can keep our column accessing consistent. Note that this
-    will create a copy of every column that isn't already lowercased.
+    We do this so we can keep our column accessing consistent. If two headings only
+    differ by case, the column furthest to the right is kept.
 
     Parameters
     ----------
     dataframe : pandas.core.frame.DataFrame
-        A DataFrame that we need to generate lowercased-heading columns for.
+        A DataFrame that we need lowercased headings for.
+
+    """
+    dataframe = dataframe.rename(columns=str.lower)
+    if dataframe.columns.has_duplicates:
+        dataframe = dataframe.loc[:, ~dataframe.columns.duplicated(keep="last")]
+    return dataframe
+
+
+def column_strings(dataframe, column: str, default: str | None = None):
+    """
+    Return a column as strings, with missing cells as "nan", or the default if the
+    column doesn't exist.
+    """
+    import pandas as pd
+
+    if column not in dataframe.columns:
+        return pd.Series(default, index=dataframe.index, dtype=object)
+    return dataframe[column].map(str)
+
+
+def split_addresses(addresses):
+    """
+    Split each cell of addresses on the first separator it contains, "," before ";".
+    """
+    by_comma = addresses.str.split(",", regex=False)
+    by_semicolon = addresses.str.split(";", regex=False)
+    return by_semicolon.where(~addresses.str.contains(",", regex=False), by_comma)
+
 
+def format_date(date) -> str:
     """
-    for column_name in dataframe.columns:
-        dataframe[column_name.lower()] = dataframe[column_name]
+    Return the date as text, converting dates read from Excel to isoformat.
+    """
+    return date if type(date) is str else str(date.isoformat())
 
 
-def convert_to_json(row):
+def convert_to_json(chunk) -> Iterator[dict]:
     """
-    Convert a row from a DataFrame into a json payload.
+    Convert each row of a DataFrame into a json payload.
 
     We need to fit the data into the cloudmailin format:
     {
@@ -119,113 +239,111 @@ def convert_to_json(row):
         "attachments" : []
     }
 
+    The columns are converted a whole column at a time, and only the payloads are built
+    row by row.
+
     Parameters
     ----------
-    row : pandas.core.series.Series
-        A Series created from a row of data from the overall DataFrame.
-        This can just be thought of as a row from the DataFrame, and is
-        automatically passed into this function with the DataFrame.apply()
-        function.
+    chunk : pandas.core.frame.DataFrame
+        A chunk of rows from the spreadsheet, with lowercase headings.
 
     """
+    import pandas as pd
+
     # Get the required fields.
     # These fields must exist, and have been checked before coming to this function.
-    subject = str(row["subject"])
-    email_body = str(row["body"])
-    body_html = ""
-    body_plain = ""
-    content_type = ""
-    if is_html(email_body):
-        body_html = email_body
-        content_type = 'text/html; charset="utf-8"'
-    else:
-        body_plain = email_body
-        content_type = 'text/plain; charset="utf-8"'
+    subjects = column_strings(chunk, "subject")
+    email_bodies = column_strings(chunk, "body")
+    html_bodies = (
+        email_bodies.str.contains("<html", regex=False)
+        & email_bodies.str.contains("</html", regex=False)
+    ) | email_bodies.str.contains("text/html", regex=False)
 
     # Inboxagent current forces us to have angle brackets on the id
     # Strip them away if they are there, so it is safe to add them back.
-    unique_id = str(row["unique_id"]).lstrip("<").rstrip(">")
-    unique_id = f"<{unique_id}>"
-
-    sent_date = str(row["date"].isoformat()) if type(row["date"]) is not str else row["date"]
+    unique_ids = column_strings(chunk, "unique_id").str.lstrip("<").str.rstrip(">")
+    sent_dates = chunk["date"].map(format_date)
 
     # Not required fields. These can be defaulted to something else if they don't exist.
-    try:
-        to_addr = str(row["to"])
-    except KeyError:
-        to_addr = "analysis@aportio-insights.com"
-
-    try:
-        from_addr = str(row["from"])
-    except KeyError:
-        from_addr = "client@aportio-insights.com"
-
-    try:
-        cc = str(row["cc"])
-    except KeyError:
-        cc = ""
+    to_addrs = column_strings(chunk, "to", "analysis@aportio-insights.com")
+    from_addrs = column_strings(chunk, "from", "client@aportio-insights.com")
+    ccs = column_strings(chunk, "cc", "")
 
     # look for multiple addresses in the columns
-    cc_list = []
-    for sep in [",", ";"]:
-        if sep in to_addr:
-            cc_list = to_addr.split(sep)
-            to_addr = cc_list.pop(0)
-            break
-    to_addr = validate_email(to_addr)
-
-    for sep in [",", ";"]:
-        if sep in from_addr:
-            from_addr = from_addr.split(sep).pop(0)
-            break
-    from_addr = validate_email(from_addr)
-
-    for sep in [",", ";"]:
-        if sep in cc:
-            cc_list.extend(cc.split(sep))
-            break
-    cc_list = [validate_email(e) for e in cc_list]
-
-    # Build the json body.
-    json_body = {
-        "headers": {
-            "from": from_addr,
-            "sender": from_addr,
-            "date": sent_date,
-            "to": to_addr,
-            "message_id": unique_id,
-            "subject": subject,
-            "content_type": content_type,
-        },
-        "envelope": {},
-        "plain": body_plain,
-        "html": body_html,
-        "attachments": [],
-    }
-    if cc_list:
-        json_body["headers"]["cc"] = ",".join(cc_list)
-
-    email_list.append(json_body)
-
-
-def import_spreadsheet(file_name: str) -> list:
-    """
-    Import emails from a spreadsheet.
+    to_parts = split_addresses(to_addrs)
+    from_parts = split_addresses(from_addrs)
+    cc_parts = split_addresses(ccs).where(
+        ccs.str.contains(",", regex=False) | ccs.str.contains(";", regex=False),
+        pd.Series([[]] * len(ccs), index=ccs.index, dtype=object),
+    )
+
+    # The same addresses turn up on many rows, so validate each of them once
+    validated = {}
+
+    def validate(address: str) -> str:
+        if address not in validated:
+            validated[address] = validate_email(address)
+        return validated[address]
+
+    for subject, email_body, html, unique_id, sent_date, to_list, from_list, cc_list in zip(
+        subjects,
+        email_bodies,
+        html_bodies,
+        unique_ids,
+        sent_dates,
+        to_parts,
+        from_parts,
+        cc_parts,
+        strict=True,
+    ):
+        to_addr = validate(to_list[0])
+        from_addr = validate(from_list[0])
+        cc_addrs = [validate(e) for e in [*to_list[1:], *cc_list]]
+        if html:
+            body_html, body_plain = email_body, ""
+            content_type = 'text/html; charset="utf-8"'
+        else:
+            body_html, body_plain = "", email_body
+            content_type = 'text/plain; charset="utf-8"'
+
+        # Build the json body.
+        json_body = {
+            "headers": {
+                "from": from_addr,
+                "sender": from_addr,
+                "date": sent_date,
+                "to": to_addr,
+                "message_id": f"<{unique_id}>",
+                "subject": subject,
+                "content_type": content_type,
+            },
+            "envelope": {},
+            "plain": body_plain,
+            "html": body_html,
+            "attachments": [],
+        }
+        if cc_addrs:
+            json_body["headers"]["cc"] = ",".join(cc_addrs)
+
+        yield json_body
+
+
+def import_spreadsheet(
+    file_name: str, chunk_size: int = SPREADSHEET_CHUNK_SIZE
+) -> Iterator[dict]:
     """
+    Import emails from a spreadsheet, yielding a payload for each row.
 
-    # Load the data into a pandas DataFrame
-    input_sheet = read_spreadsheet_emails(file_name)
-
-    # First, we should go through and convert all column headings to lowercase.
-    # Note that this will copy the column with all its data and add it to the
-    # DataFrame again, but with a lowercase version of the column name.
-    lowercase_column_headings(input_sheet)
-
-    # Check that all required fields exist in the DataFrame.
-    check_required_headings_exist(input_sheet)
-
-    # Use the DataFrame.apply() method to do something with each row in the DataFrame.
-    # The passed-in function acts like a callback.
-    input_sheet.apply(convert_to_json, axis=1)
-
-    return email_list
+    The spreadsheet is read a chunk of rows at a time, so only one chunk is in memory.
+    Its headings are checked before any rows are read, so a spreadsheet with the wrong
+    headings is rejected even if it has no rows.
+    """
+    # Check that all required fields exist, ignoring the case of the headings.
+    check_required_headings_exist(
+        lowercase_column_headings(read_spreadsheet_headings(file_name))
+    )
+
+    for chunk in read_spreadsheet_emails(file_name, chunk_size):
+        # Convert all column headings to lowercase, so we can access them consistently.
+        chunk = lowercase_column_headings(chunk)
+        yield from convert_to_json(chunk)
@@ -5,22 +5,41 @@
 # =========================================================
 
 import argparse
-import json
-import os
+from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
 
-from extract_emails import extract_emails
-from redact import redact_text
+from background import BackgroundWriter, prefetch
+from compressed_files import COMPRESSION_NONE, COMPRESSIONS
+from constants import (
+    CACHE_MAX_BYTES,
+    EXPORT_DIR,
+    NLP_BATCH_SIZE,
+    NLP_PROCESSES,
+    PATTERN_TIME_BUDGET,
+    PROFILE_SLOWEST_DOCUMENTS,
+)
+from dedup import DUPLICATE_MODES, Deduplicator
+from extract_emails import iter_emails, make_export_dir
+from gazetteer import Gazetteer
+from import_handlers import PST_BACKEND_AUTO, PST_BACKENDS
+from manifest import Manifest, skip_redacted
+from profiling import STAGE_EXTRACT, STAGE_LOAD, STAGE_WRITE, Profiler, enable_profiling
+from progress import Progress
+from redact import ENGINE_SPANS, ENGINES, STREET_SUFFIXES, PIIScrub, redact_payloads
+from redaction_cache import RedactionCache
+from redaction_map import RedactionMap, identify
+from redaction_spans import PLACEHOLDER_MODES, PLACEHOLDERS_REDACTED
+from sinks import OUTPUT_FILES, OUTPUT_FORMATS, OUTPUT_NDJSON, FileSink, make_sink
+from vendor.scrub import (
+    NLP_MODE_NER,
+    NLP_MODES,
+    SPACY_LANGUAGE_MODELS,
+    configure_nlp,
+    get_nlp,
+)
 from version import VERSION
-
-HEADERS_WITH_PII = [
-    "from",
-    "sender",
-    "to",
-    "cc",
-    "subject",
-]
+from workers import redact_payloads_in_pool
 
 
 def get_aruments() -> dict:
@@ -28,42 +47,352 @@ def get_aruments() -> dict:
     parser = argparse.ArgumentParser(description=f"PII Email Redactor {VERSION}")
 
     # add arguments to the parser
-    parser.add_argument("file", help="File to process(PST/CSV)")
+    parser.add_argument("file", help="File to process(PST/CSV/XLSX/JSONL)")
     parser.add_argument("-o", "--outdir", help="Output directory", default="redacted-emails")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Write straight into the output directory, skipping the emails that an "
+        "earlier run already redacted there",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default=OUTPUT_FILES,
+        help="Save each redacted email to its own JSON file, or all of them as NDJSON",
+    )
+    parser.add_argument(
+        "--compress",
+        choices=COMPRESSIONS,
+        default=COMPRESSION_NONE,
+        help="Compression of the NDJSON output",
+    )
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        default=0,
+        help="Start a new NDJSON file after this many MB, 0 for a single file",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Save each JSON file on a single line, without indentation",
+    )
+    parser.add_argument(
+        "--pst-backend",
+        choices=PST_BACKENDS,
+        default=PST_BACKEND_AUTO,
+        help="Read PST files with the pypff bindings, or export them with pffexport",
+    )
+    parser.add_argument(
+        "--export",
+        action="store_true",
+        help=f"Also save the extracted emails, before redaction, under {EXPORT_DIR}",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=DUPLICATE_MODES,
+        help="Redact each group of duplicate emails (same message id or body) once, "
+        "writing a reference to it, or a copy of it, for the others",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=ENGINE_SPANS,
+        help="Engine used to match the PII patterns",
+    )
+    parser.add_argument(
+        "--model",
+        choices=SPACY_LANGUAGE_MODELS,
+        default="lg",
+        help="Size of the Spacy language model",
+    )
+    parser.add_argument(
+        "--nlp-mode",
+        choices=NLP_MODES,
+        default=NLP_MODE_NER,
+        help="Load only the components needed for entity recognition, or the full pipeline",
+    )
+    parser.add_argument(
+        "--propagate-entities",
+        action="store_true",
+        help="Redact every occurrence of a name, place or date the NLP model finds",
+    )
+    parser.add_argument(
+        "--gazetteer",
+        action="append",
+        default=[],
+        help="File of known names and places to redact, one per line (can be repeated)",
+    )
+    parser.add_argument(
+        "--gazetteer-streets",
+        action="append",
+        default=[],
+        help="File of known street names, one per line, redacted when followed by a "
+        "street suffix (can be repeated)",
+    )
+    parser.add_argument(
+        "--regex-and-gazetteer-only",
+        action="store_true",
+        help="Only redact the patterns and the gazetteer, without loading the NLP model",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=NLP_BATCH_SIZE,
+        help="Number of texts the NLP model processes together",
+    )
+    parser.add_argument(
+        "--n-process",
+        type=int,
+        default=NLP_PROCESSES,
+        help="Number of processes the NLP model uses",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Redact repeated text (quoted replies, signatures, subjects) only once",
+    )
+    parser.add_argument(
+        "--cache-db",
+        help="SQLite file that keeps the redaction cache between runs (implies --cache)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_MAX_BYTES // (1024 * 1024),
+        help="Memory used by the redaction cache, in MB",
+    )
+    parser.add_argument(
+        "--segment-replies",
+        action="store_true",
+        help="Redact quoted replies and signatures of plain text bodies separately, so "
+        "each is redacted once. The output can differ slightly (implies --cache)",
+    )
+    parser.add_argument(
+        "--html-aware",
+        action="store_true",
+        help="Only redact the text of HTML bodies, leaving the markup alone",
+    )
+    parser.add_argument(
+        "--pattern-budget",
+        type=float,
+        default=PATTERN_TIME_BUDGET,
+        help="Seconds the patterns may take on each email before the rest of it is "
+        "redacted conservatively (default: no limit)",
+    )
+    parser.add_argument(
+        "--placeholders",
+        choices=PLACEHOLDER_MODES,
+        default=PLACEHOLDERS_REDACTED,
+        help="Replace PII with [REDACTED], or with its category, e.g. [PHONE] or [PERSON]",
+    )
+    parser.add_argument(
+        "--record-spans",
+        action="store_true",
+        help="Save the start, end, category and detector of each redaction in each email, "
+        "in the redacted text's offsets",
+    )
+    parser.add_argument(
+        "--redaction-map",
+        help="Append the original text of each redaction to this encrypted file, with the "
+        "key from the PII_REDACT_MAP_KEY environment variable",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes redacting emails in parallel",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Save the time spent in each stage, each pattern and the slowest emails "
+        "to this JSON file",
+    )
+    parser.add_argument(
+        "--trace",
+        help="Save a Chrome trace of the stages to this JSON file (implies profiling)",
+    )
+    parser.add_argument(
+        "--profile-slowest",
+        type=int,
+        default=PROFILE_SLOWEST_DOCUMENTS,
+        help="Number of emails with the slowest patterns listed in the profile",
+    )
     # parse the arguments
     args = parser.parse_args()
+    if args.workers > 1 and (args.profile or args.trace):
+        parser.error("--profile and --trace can't be used with --workers")
+    if args.regex_and_gazetteer_only and args.propagate_entities:
+        parser.error("--propagate-entities needs the NLP model")
+    if args.workers > 1 and args.n_process > 1:
+        parser.error("--n-process can't be used with --workers, each worker is one process")
+    if args.output_format == OUTPUT_NDJSON and args.compact:
+        parser.error("--compact is for --output-format files, NDJSON is always compact")
+    if args.output_format != OUTPUT_NDJSON and (
+        args.compress != COMPRESSION_NONE or args.shard_size
+    ):
+        parser.error("--compress and --shard-size need --output-format ndjson")
+    check_span_arguments(parser, args)
     return args
 
 
-def redact_payload(payload: dict) -> dict:
+def check_span_arguments(parser: argparse.ArgumentParser, args) -> None:
+    """
+    Check that the options that find the spans of the redactions can be used together.
+    """
+    if not (
+        args.placeholders != PLACEHOLDERS_REDACTED or args.record_spans or args.redaction_map
+    ):
+        return
+    if args.engine != ENGINE_SPANS:
+        parser.error("--placeholders, --record-spans and --redaction-map need --engine spans")
+    if args.cache or args.cache_db or args.segment_replies or args.html_aware:
+        parser.error(
+            "--placeholders, --record-spans and --redaction-map can't be used with "
+            "--cache, --cache-db, --segment-replies or --html-aware"
+        )
+
+
+def make_redacted_dir(args) -> str:
     """
-    Redact all PII in the payload.
-
-    payload structure looks like this:
-    json_body = {
-        "headers": {
-            "from": sender,
-            "sender": sender,
-            "date": date,
-            "to": recipient,
-            "cc": cc,
-            "message_id": message_id.strip("\r\n "),
-            "subject": subject,
-            "content_type": content_type,
-        },
-        "envelope": {},
-        "plain": email_plain,
-        "html": email_html,
-        "attachments": [],
-    }
+    Create the directory for the redacted emails: a new timestamped one in the output
+    directory, or the output directory itself when resuming.
     """
-    redacted_payload = payload
-    for key, value in payload.get("headers", {}).items():
-        if key in HEADERS_WITH_PII:
-            redacted_payload["headers"][key] = redact_text(value)
-    redacted_payload["plain"] = redact_text(payload.get("plain", ""))
-    redacted_payload["html"] = redact_text(payload.get("html", ""))
-    return redacted_payload
+    if args.resume:
+        redacted_dir_path = Path(args.outdir)
+    else:
+        redacted_dir_path = Path(args.outdir, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+    redacted_dir_path.mkdir(parents=True, exist_ok=True)
+    return str(redacted_dir_path)
+
+
+def make_scrubber(args) -> PIIScrub:
+    """
+    Create the scrubber, with a gazetteer if any word lists are given or the NLP model
+    is skipped.
+    """
+    gazetteer = None
+    if args.gazetteer or args.gazetteer_streets or args.regex_and_gazetteer_only:
+        gazetteer = Gazetteer.from_files(
+            args.gazetteer, args.gazetteer_streets, STREET_SUFFIXES
+        )
+    return PIIScrub(
+        engine=args.engine,
+        propagate_entities=args.propagate_entities,
+        gazetteer=gazetteer,
+        use_nlp=not args.regex_and_gazetteer_only,
+    )
+
+
+def start_profiling(args) -> Profiler | None:
+    """
+    Start profiling the run if --profile or --trace is given.
+    """
+    if not (args.profile or args.trace):
+        return None
+    profiler = enable_profiling(slowest=args.profile_slowest, trace=bool(args.trace))
+    if args.regex_and_gazetteer_only:
+        return profiler
+    # Load the model up front, so its time isn't counted against the first emails
+    with profiler.stage(STAGE_LOAD):
+        get_nlp()
+    return profiler
+
+
+def write_payload(sink: BackgroundWriter, payload: dict, profiler: Profiler | None) -> None:
+    if profiler is None:
+        sink.write(payload)
+        return
+    with profiler.stage(STAGE_WRITE):
+        sink.write(payload)
+
+
+def finish_run(
+    args,
+    scrubber: PIIScrub,
+    cache: RedactionCache | None,
+    profiler: Profiler | None,
+    manifest: Manifest | None,
+    dedup: Deduplicator | None,
+    redaction_map: RedactionMap | None,
+) -> None:
+    """
+    Close the cache, manifest and redaction map, report the stats of the run and save
+    its profile.
+    """
+    if redaction_map:
+        redaction_map.close()
+        print(
+            f"Saved the redactions of {redaction_map.written} emails to {redaction_map.path}"
+        )
+    if manifest:
+        manifest.close()
+        print(f"Skipped {manifest.skipped} emails that were already redacted")
+    if dedup:
+        print(
+            f"Collapsed {dedup.collapsed} duplicate emails ({dedup.by_message_id} by "
+            f"message id, {dedup.by_body} by body)"
+        )
+        if dedup.redacted:
+            print(f"Redacted {dedup.redacted} duplicates whose original was no longer kept")
+    if cache:
+        cache.close()
+        print(f"Redaction cache: {cache.stats}")
+    if args.engine == ENGINE_SPANS:
+        print(f"Pattern prefilters: {scrubber.prefilter_stats}")
+    if args.profile:
+        profiler.save(args.profile)
+        print(f"Saved profile to {args.profile}")
+    if args.trace:
+        profiler.save_trace(args.trace)
+        print(f"Saved trace to {args.trace}")
+
+
+def start_redaction(
+    args,
+    payloads: Iterator[dict],
+    scrubber: PIIScrub,
+    cache: RedactionCache | None,
+    redaction_map: RedactionMap | None,
+) -> Iterator[dict]:
+    """
+    Redact the payloads, over a pool of workers if --workers is given, saving the original
+    texts to the redaction map as they come out.
+    """
+    if args.workers > 1:
+        redacted_payloads = redact_payloads_in_pool(
+            payloads,
+            workers=args.workers,
+            scrubber=scrubber,
+            nlp_config=(SPACY_LANGUAGE_MODELS[args.model], args.nlp_mode),
+            batch_size=args.batch_size,
+            cache=cache,
+            segment_replies=args.segment_replies,
+            html_aware=args.html_aware,
+            pattern_budget=args.pattern_budget,
+            placeholders=args.placeholders,
+            record_spans=args.record_spans,
+            keep_originals=bool(redaction_map),
+        )
+    else:
+        redacted_payloads = redact_payloads(
+            payloads,
+            scrubber=scrubber,
+            batch_size=args.batch_size,
+            n_process=args.n_process,
+            cache=cache,
+            segment_replies=args.segment_replies,
+            html_aware=args.html_aware,
+            pattern_budget=args.pattern_budget,
+            placeholders=args.placeholders,
+            record_spans=args.record_spans,
+            keep_originals=bool(redaction_map),
+        )
+    if redaction_map:
+        # Before the duplicates are put back, so copies never hold the original texts
+        redacted_payloads = redaction_map.collect(redacted_payloads, args.record_spans)
+    return redacted_payloads
 
 
 def main():
@@ -74,33 +403,77 @@ def main():
     # Get the PST location
     file_name = args.file
 
-    # Redacted email directory
-    redacted_dir = args.outdir
-    redacted_dir_path = Path(redacted_dir, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
-    redacted_dir_path.mkdir(parents=True, exist_ok=True)
-    redacted_dir = str(redacted_dir_path)
+    configure_nlp(SPACY_LANGUAGE_MODELS[args.model], args.nlp_mode)
+    profiler = start_profiling(args)
+
+    redaction_map = RedactionMap(args.redaction_map) if args.redaction_map else None
+    redacted_dir = make_redacted_dir(args)
     print(redacted_dir)
+    manifest = Manifest(redacted_dir) if args.resume else None
+    if manifest and manifest.previous:
+        print(f"Resuming after {manifest.previous} redacted emails")
+
+    # Optionally keep a copy of the extracted emails before they are redacted
+    export_dir = make_export_dir() if args.export else None
+    if export_dir:
+        print(f"Exporting extracted emails to {export_dir}")
+
+    # Stream the emails from the file, through redaction, into the redacted directory.
+    # Payloads keep their order, so each file is named after its position in the input
+    # (or after its stable ID, when resuming).
+    def extracted_payloads() -> Iterator[dict]:
+        payloads = prefetch(iter_emails(file_name, pst_backend=args.pst_backend))
+        if profiler:
+            payloads = profiler.iterate(STAGE_EXTRACT, payloads)
+        if manifest:
+            payloads = skip_redacted(payloads, manifest)
+        if redaction_map:
+            # The map refers to each email by its ID, from before it is redacted
+            payloads = identify(payloads)
+        if not export_dir:
+            yield from payloads
+            return
+        with FileSink(export_dir) as export_sink:
+            for payload in payloads:
+                export_sink.write(payload)
+                yield payload
+
+    # Only the first of each group of duplicates goes through redaction
+    dedup = Deduplicator(args.dedup) if args.dedup else None
+    payloads = dedup.unique(extracted_payloads()) if dedup else extracted_payloads()
 
-    # Extract the email content from the file
-    export_dir = extract_emails(file_name=file_name)
-
-    # Now loop through the files in the exported directory
-    # Redact the email content from them
-    # Save all the redacted data in a separate directory
-    pathlist = Path(export_dir).rglob("*.json")
-    print("Redacting files")
-    for counter, path in enumerate(pathlist):
-        if (counter % 50) == 0:
-            print(f"\n[{counter:04}]", end="", flush=True)
-        print(".", end="", flush=True)
-        with open(str(path), encoding="utf-8") as f:
-            payload = json.load(f)
-            redacted_payload = redact_payload(payload)
-            filename = os.path.basename(f.name)
-            filepath = f"{redacted_dir}/{filename}"
-            with open(str(filepath), "w", encoding="utf-8") as outf:
-                json.dump(redacted_payload, outf, ensure_ascii=False, indent=4)
-    print("\nDone.")
+    scrubber = make_scrubber(args)
+    cache = None
+    if args.cache or args.cache_db or args.segment_replies:
+        cache = RedactionCache(
+            scrubber.cache_version(),
+            max_bytes=args.cache_size * 1024 * 1024,
+            path=args.cache_db,
+        )
+    redacted_payloads = start_redaction(args, payloads, scrubber, cache, redaction_map)
+    if dedup:
+        redacted_payloads = dedup.expand(redacted_payloads)
+    print("Redacting emails")
+    progress = Progress("Redacted emails")
+    # Write on a background thread, so the disk is busy while the next emails are
+    # redacted. Whatever was redacted is still written if the run fails.
+    sink = BackgroundWriter(
+        make_sink(
+            args.output_format,
+            redacted_dir,
+            compression=args.compress,
+            shard_size=args.shard_size * 1024 * 1024 or None,
+            manifest=manifest,
+            compact=args.compact,
+        )
+    )
+    with sink:
+        for redacted_payload in redacted_payloads:
+            write_payload(sink, redacted_payload, profiler)
+            progress.update()
+    progress.finish()
+    finish_run(args, scrubber, cache, profiler, manifest, dedup, redaction_map)
+    print("Done.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Record which emails have been redacted into an output directory, so a run that was
+interrupted, or a later run over an updated mailbox, only redacts the new emails.
+"""
+
+import hashlib
+import json
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+# Name of the manifest in the output directory
+MANIFEST_FILE = "manifest.txt"
+
+# Key of the stable ID set on each payload of a resumable run
+EMAIL_ID_KEY = "email_id"
+
+# Fields of the payload hashed for the ID of an email without a message id
+CONTENT_ID_FIELDS = ("headers", "plain", "html")
+
+
+def email_id(payload: dict) -> str:
+    """
+    Return an ID for the email that stays the same from run to run.
+
+    It is a hash of the email's message id, or of its headers and bodies if it has none.
+    The payload must not have been redacted yet.
+    """
+    message_id = payload.get("headers", {}).get("message_id", "").strip().strip("<>")
+    if message_id:
+        source = f"message_id:{message_id}"
+    else:
+        content = {field: payload.get(field) for field in CONTENT_ID_FIELDS}
+        source = f"content:{json.dumps(content, sort_keys=True, ensure_ascii=False)}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+
+class Manifest:
+    """
+    The IDs of the emails whose redacted copy is complete in an output directory.
+
+    The IDs are appended to MANIFEST_FILE as their output is finished, one per line, and
+    read back when the directory is used again. An ID is only added once its output is
+    written, so an email that was being written when a run died is redacted again.
+    """
+
+    def __init__(self, out_dir: str):
+        self.path = Path(out_dir, MANIFEST_FILE)
+        self.done = set()
+        complete = True
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    # A line cut short by a crash never matches a whole ID
+                    self.done.add(line.strip())
+                    complete = line.endswith("\n")
+            self.done.discard("")
+        self.previous = len(self.done)
+        # Emails skipped because they were already done
+        self.skipped = 0
+        self._file = open(self.path, "a", encoding="utf-8")
+        if not complete:
+            # Start after the cut short line rather than on the end of it
+            self._file.write("\n")
+
+    def __contains__(self, email_id: str) -> bool:
+        return email_id in self.done
+
+    def add(self, email_ids: Iterable[str]) -> None:
+        """
+        Record that the output of these emails is complete.
+        """
+        email_ids = list(email_ids)
+        if not email_ids:
+            return
+        self.done.update(email_ids)
+        self._file.write("".join(f"{email_id}\n" for email_id in email_ids))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def skip_redacted(payloads: Iterable[dict], manifest: Manifest) -> Iterator[dict]:
+    """
+    Yield the payloads that aren't in the manifest yet, each with its EMAIL_ID_KEY set.
+
+    An email that comes up again in the same run (e.g. a copy in another folder of a
+    mailbox) is skipped too, counting it in manifest.skipped.
+    """
+    pending = set()
+    for payload in payloads:
+        payload_id = email_id(payload)
+        if payload_id in manifest or payload_id in pending:
+            manifest.skipped += 1
+            continue
+        pending.add(payload_id)
+        payload[EMAIL_ID_KEY] = payload_id
+        yield payload
@@ -0,0 +1,141 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test resuming a run from the manifest of the emails already redacted
+"""
+
+import copy
+import json
+
+import pytest
+
+from compressed_files import COMPRESSION_GZIP
+from manifest import EMAIL_ID_KEY, MANIFEST_FILE, Manifest, email_id, skip_redacted
+from redact import redact_payloads
+from redact_test import make_payload
+from sinks import OUTPUT_FILES, OUTPUT_NDJSON, PARTIAL_SUFFIX, make_sink
+from sinks_test import read_ndjson
+
+
+def make_payloads(count: int) -> list[dict]:
+    payloads = []
+    for index in range(count):
+        payload = make_payload(f"Email {index}", f"Call John on 021 555 {index:04}")
+        payload["headers"]["message_id"] = f"<{index}@example.com>"
+        payloads.append(payload)
+    return payloads
+
+
+def run(out_dir: str, payloads: list[dict], output_format: str, fail_after: int = -1):
+    """
+    Redact the payloads into out_dir like main.py --resume, failing after fail_after.
+    """
+
+    def extracted():
+        for index, payload in enumerate(copy.deepcopy(payloads)):
+            if index == fail_after:
+                raise OSError("mailbox unreadable")
+            yield payload
+
+    with (
+        Manifest(out_dir) as manifest,
+        make_sink(output_format, out_dir, shard_size=200, manifest=manifest) as sink,
+    ):
+        for payload in redact_payloads(skip_redacted(extracted(), manifest)):
+            sink.write(payload)
+    return manifest
+
+
+def test_email_id():
+    payload = make_payload("Hello", "Hi")
+    payload["headers"]["message_id"] = " <1@example.com>\r\n"
+    same = make_payload("Something else", "Bye")
+    same["headers"]["message_id"] = "1@example.com"
+    assert email_id(payload) == email_id(same)
+    assert len(email_id(payload)) == 32
+
+    # Without a message id, the content decides the ID
+    first, second, third = (make_payload("Hello", plain) for plain in ("Hi", "Hi", "Bye"))
+    for payload in (first, second, third):
+        payload["headers"]["message_id"] = ""
+    assert email_id(first) == email_id(second)
+    assert email_id(first) != email_id(third)
+
+
+def test_manifest_survives_cut_short_line(tmp_path):
+    (tmp_path / MANIFEST_FILE).write_text("a" * 32 + "\n" + "b" * 10)
+    with Manifest(str(tmp_path)) as manifest:
+        assert "a" * 32 in manifest
+        assert manifest.previous == 2
+        manifest.add(["c" * 32])
+    with Manifest(str(tmp_path)) as manifest:
+        assert "c" * 32 in manifest
+
+
+def test_skip_redacted(tmp_path):
+    payloads = make_payloads(3)
+    with Manifest(str(tmp_path)) as manifest:
+        manifest.add([email_id(payloads[0])])
+        # The repeat of the second email is skipped too
+        kept = list(skip_redacted([*payloads, copy.deepcopy(payloads[1])], manifest))
+    assert kept == payloads[1:]
+    assert kept[0][EMAIL_ID_KEY] == email_id(payloads[1])
+    assert manifest.skipped == 2
+
+
+def test_resume_files(tmp_path):
+    payloads = make_payloads(10)
+    with pytest.raises(OSError, match="mailbox unreadable"):
+        run(str(tmp_path), payloads, OUTPUT_FILES, fail_after=4)
+    assert len(list(tmp_path.glob("*.json"))) == 4
+
+    manifest = run(str(tmp_path), payloads, OUTPUT_FILES)
+
+    assert manifest.previous == 4
+    assert manifest.skipped == 4
+    files = list(tmp_path.glob("*.json"))
+    redacted = [json.loads(path.read_text(encoding="utf-8")) for path in files]
+    assert sorted(payload["headers"]["message_id"] for payload in redacted) == sorted(
+        payload["headers"]["message_id"] for payload in payloads
+    )
+    assert {path.stem for path in files} == {email_id(payload) for payload in payloads}
+
+    # An incremental run over a mailbox with new emails only redacts the new ones
+    manifest = run(str(tmp_path), make_payloads(12), OUTPUT_FILES)
+    assert (manifest.previous, manifest.skipped) == (10, 10)
+    assert len(list(tmp_path.glob("*.json"))) == 12
+
+
+def test_resume_ndjson_after_crash(tmp_path):
+    payloads = make_payloads(10)
+    # A run that is killed part way through a shard, without closing it
+    with Manifest(str(tmp_path)) as manifest:
+        sink = make_sink(
+            OUTPUT_NDJSON,
+            str(tmp_path),
+            compression=COMPRESSION_GZIP,
+            shard_size=200,
+            manifest=manifest,
+        )
+        for payload in redact_payloads(skip_redacted(copy.deepcopy(payloads[:5]), manifest)):
+            sink.write(payload)
+    killed_paths = list(sink.paths)
+    sink._file.close()
+    assert list(tmp_path.glob(f"*{PARTIAL_SUFFIX}"))
+
+    manifest = run(str(tmp_path), payloads, OUTPUT_NDJSON)
+
+    # Only the emails in the shards that were finished were skipped
+    assert 0 < manifest.previous < 5
+    assert manifest.skipped == manifest.previous
+    complete = sorted(str(path) for path in tmp_path.glob("redacted-*.ndjson*"))
+    assert not any(path.endswith(PARTIAL_SUFFIX) for path in complete)
+    assert set(killed_paths[:-1]) <= set(complete)
+    redacted = read_ndjson(complete)
+    assert sorted(payload["headers"]["message_id"] for payload in redacted) == sorted(
+        payload["headers"]["message_id"] for payload in payloads
+    )
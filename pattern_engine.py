@@ -0,0 +1,381 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Span-based engine for the scrubber's regular expressions.
+"""
+
+import re
+import time
+from typing import NamedTuple
+
+import regex
+
+from profiling import get_profiler
+
+# Claimed text is masked with this character while the remaining patterns run.
+# No pattern can match it and, like the "[REDACTED]" placeholder that the sequential
+# scrubber inserts, it is not a word character, digit, whitespace or bracket.
+MASK_CHARACTER = "\x00"
+
+# The search options without a deadline, shared rather than built for every pattern
+NO_OPTIONS = {}
+
+
+# Tokens that the conservative fallback redacts: any with a digit, an "@" or a dot between
+# two word characters
+CONSERVATIVE_TOKEN_PATTERN = re.compile(r"[\d@]|\w\.\w")
+TOKEN_PATTERN = re.compile(r"\S+")
+
+# Texts shorter than this are searched with re even when there is a deadline, as even the
+# worst backtracking on them only takes a few milliseconds
+TIMEOUT_MIN_LENGTH = 100
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    category: str
+
+
+class PatternEngine:
+    """
+    Find every span claimed by an ordered list of patterns, then build the output once.
+
+    The result is the same as running the patterns one after the other with re.sub, as
+    Scrub.scrub_text does: a pattern never sees text claimed by an earlier pattern, so the
+    order of the list still decides precedence (e.g. phone numbers before vehicle regos).
+
+    Instead of rebuilding the redacted text after every pattern, claimed text is masked in
+    a copy of the input that keeps the original offsets. The spans are then in terms of
+    the original text, and the redacted output is joined together in a single step.
+    """
+
+    def __init__(
+        self,
+        patterns: list[tuple[str, re.Pattern]],
+        redaction_text: str,
+        replace_all_categories: tuple[str, ...] = (),
+        strip_pattern: re.Pattern | None = None,
+        prefilters: dict[str, str] | None = None,
+        prefilter_stats: "PrefilterStats | None" = None,
+    ):
+        """
+        Parameters
+        ----------
+        patterns : list[tuple[str, re.Pattern]]
+            The compiled (category, pattern) list, in order of precedence.
+        redaction_text : str
+            The text that replaces each span.
+        replace_all_categories : tuple[str, ...]
+            Categories where every occurrence of the matched text is redacted, not just
+            the match itself (Scrub does this for phone numbers).
+        strip_pattern : re.Pattern | None
+            Applied to the matched text of replace_all_categories before it is searched for.
+        prefilters : dict[str, str] | None
+            A pattern for each category that must match somewhere in a text for any
+            pattern of the category to match it. Categories whose prefilter doesn't match
+            are skipped.
+        prefilter_stats : PrefilterStats | None
+            Where the skipped categories are counted, a new PrefilterStats by default.
+
+        """
+        self.patterns = patterns
+        self.redaction_text = redaction_text
+        self.replace_all_categories = replace_all_categories
+        self.strip_pattern = strip_pattern
+        self.prefilter_source = prefilters
+        # Only the prefilters of categories that have patterns
+        categories = {category for category, _ in patterns}
+        self.prefilters = {
+            category: re.compile(prefilter)
+            for category, prefilter in (prefilters or {}).items()
+            if category in categories
+        }
+        self.prefilter_stats = PrefilterStats() if prefilter_stats is None else prefilter_stats
+        # The patterns compiled with the regex module, which can stop a search that takes
+        # too long. Its default version matches like re, so the spans are the same, but
+        # every call with a timeout is slower, so re is used unless there is a deadline.
+        self.timed_patterns = [
+            (category, regex.compile(pattern.pattern)) for category, pattern in patterns
+        ]
+
+    def find_spans(self, text: str, deadline: float | None = None) -> list[Span]:
+        """
+        Return the non-overlapping spans claimed by the patterns, ordered by position.
+
+        With a deadline (a time.perf_counter() value), raise TimeoutError if the patterns
+        are still running when it passes.
+        """
+        profiler = get_profiler()
+        timed = False
+        if deadline is not None:
+            time_left(deadline)
+            timed = len(text) >= TIMEOUT_MIN_LENGTH
+        patterns = self.timed_patterns if timed else self.patterns
+
+        spans = []
+        masked_text = text
+        # Without a deadline, no options are passed: even timeout=None slows regex down
+        options = NO_OPTIONS
+        skipped = self._prefilter(text)
+        for category, pattern in patterns:
+            if category in skipped:
+                continue
+            if profiler:
+                start = time.perf_counter()
+            # Most patterns match nothing, and a search costs less than a finditer
+            if timed:
+                options = {"timeout": time_left(deadline)}
+                match = pattern.search(masked_text, **options)
+            else:
+                match = pattern.search(masked_text)
+            if match is None:
+                new_spans = ()
+            elif category in self.replace_all_categories:
+                new_spans = self._find_all_occurrences(
+                    pattern, masked_text, match.start(), options
+                )
+            elif match.end() > match.start():
+                # Carry on after the first match, rather than finding it again
+                new_spans = [match.span()]
+                new_spans.extend(
+                    found.span()
+                    for found in pattern.finditer(masked_text, match.end(), **options)
+                )
+            else:
+                new_spans = [
+                    found.span()
+                    for found in pattern.finditer(masked_text, match.start(), **options)
+                ]
+            if profiler:
+                profiler.add_pattern(category, time.perf_counter() - start, len(new_spans))
+            if not new_spans:
+                continue
+            masked_text = mask_spans(masked_text, new_spans)
+            spans.extend(Span(start, end, category) for start, end in new_spans)
+
+        spans.sort()
+        return spans
+
+    def _prefilter(self, text: str) -> set[str]:
+        """
+        Return the categories whose prefilter doesn't match the text, counting them.
+
+        The prefilters are checked on the text rather than the masked text, which only has
+        fewer of the characters they look for.
+        """
+        skipped = {
+            category
+            for category, prefilter in self.prefilters.items()
+            if prefilter.search(text) is None
+        }
+        self.prefilter_stats.texts += 1
+        for category in skipped:
+            self.prefilter_stats.skip(category)
+        return skipped
+
+    def _find_all_occurrences(
+        self,
+        pattern: re.Pattern | regex.Pattern,
+        masked_text: str,
+        position: int,
+        options: dict,
+    ) -> list[tuple]:
+        """
+        Claim every occurrence of each string matched from position on, in the same order
+        as str.replace().
+        """
+        claimed = []
+        searched = set()
+        for match in pattern.finditer(masked_text, position, **options):
+            matched_text = match.group(0)
+            if self.strip_pattern:
+                matched_text = self.strip_pattern.sub(r"\1", matched_text)
+            # Every occurrence was claimed the first time this text was searched for
+            if not matched_text or matched_text in searched:
+                continue
+            searched.add(matched_text)
+            occurrences = []
+            position = masked_text.find(matched_text)
+            while position != -1:
+                end = position + len(matched_text)
+                occurrences.append((position, end))
+                position = masked_text.find(matched_text, end)
+            if occurrences:
+                masked_text = mask_spans(masked_text, occurrences)
+                claimed.extend(occurrences)
+        return claimed
+
+    def redact(
+        self, text: str, spans: list[Span] | None = None, deadline: float | None = None
+    ) -> str:
+        """
+        Replace each span in the text with the redaction text.
+        """
+        if spans is None:
+            spans = self.find_spans(text, deadline)
+        if not spans:
+            return text
+        parts = []
+        position = 0
+        for span in spans:
+            parts.append(text[position : span.start])
+            parts.append(self.redaction_text)
+            position = span.end
+        parts.append(text[position:])
+        return "".join(parts)
+
+
+def mask_spans(text: str, spans: list[tuple]) -> str:
+    """
+    Overwrite the spans with MASK_CHARACTER, keeping the length of the text unchanged.
+    """
+    parts = []
+    position = 0
+    for start, end in sorted(spans):
+        parts.append(text[position:start])
+        parts.append(MASK_CHARACTER * (end - start))
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def time_left(deadline: float) -> float:
+    """
+    Return the seconds left until the deadline, raising TimeoutError if it has passed.
+    """
+    seconds = deadline - time.perf_counter()
+    if seconds <= 0:
+        raise TimeoutError("pattern time budget exceeded")
+    return seconds
+
+
+def conservative_spans(text: str) -> list[tuple[int, int]]:
+    """
+    Return the (start, end) of every token that could be part of a pattern's match, in
+    linear time.
+
+    Used instead of the patterns on text that they take too long on. It claims far more
+    than the patterns would, though it misses the words of street names and regos without
+    a digit.
+    """
+    return [
+        match.span()
+        for match in TOKEN_PATTERN.finditer(text)
+        if CONSERVATIVE_TOKEN_PATTERN.search(match.group(0))
+    ]
+
+
+def redact_conservatively(text: str, redaction_text: str) -> str:
+    """
+    Redact the conservative_spans() of the text.
+    """
+    parts = []
+    position = 0
+    for start, end in conservative_spans(text):
+        parts.append(text[position:start])
+        parts.append(redaction_text)
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+class PrefilterStats:
+    """
+    Count the texts searched, and the texts each category of patterns was skipped on
+    because its prefilter didn't match.
+    """
+
+    def __init__(self, texts: int = 0, skipped: dict[str, int] | None = None):
+        self.texts = texts
+        self.skipped = dict(skipped or {})
+
+    def skip(self, category: str) -> None:
+        self.skipped[category] = self.skipped.get(category, 0) + 1
+
+    def add(self, other: "PrefilterStats") -> None:
+        self.texts += other.texts
+        for category, count in other.skipped.items():
+            self.skipped[category] = self.skipped.get(category, 0) + count
+
+    def copy(self) -> "PrefilterStats":
+        return PrefilterStats(self.texts, self.skipped)
+
+    def since(self, earlier: "PrefilterStats") -> "PrefilterStats":
+        """
+        Return the texts searched since an earlier copy of these stats.
+        """
+        return PrefilterStats(
+            self.texts - earlier.texts,
+            {
+                category: count - earlier.skipped.get(category, 0)
+                for category, count in self.skipped.items()
+            },
+        )
+
+    def __str__(self) -> str:
+        skipped = ", ".join(
+            f"{category} {count} ({count / self.texts:.1%})"
+            for category, count in sorted(
+                self.skipped.items(), key=lambda item: (-item[1], item[0])
+            )
+        )
+        return f"{self.texts} texts, skipped {skipped or 'none'}"
+
+
+class TimeBudget:
+    """
+    The time the patterns may take on each document, shared by all of its texts.
+
+    Only the time spent in the patterns counts, not the time between the texts of a
+    document (e.g. while the NLP model runs on a batch).
+
+    Documents are numbered in the order they are started. Those that ran out of time are
+    kept in exceeded until they are checked with pop_exceeded().
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.used = 0.0
+        self.document = -1
+        self.exceeded = set()
+
+    def start(self) -> int:
+        """
+        Start the budget of the next document, returning its number.
+        """
+        self.document += 1
+        self.used = 0.0
+        return self.document
+
+    def deadline(self) -> float:
+        """
+        Return the time.perf_counter() value when the current document runs out of time.
+        """
+        return time.perf_counter() + self.seconds - self.used
+
+    @property
+    def timed_out(self) -> bool:
+        """
+        Whether the current document has run out of time.
+        """
+        return self.document in self.exceeded
+
+    def mark_exceeded(self) -> None:
+        """
+        Record that the current document ran out of time.
+        """
+        self.exceeded.add(self.document)
+
+    def pop_exceeded(self, document: int) -> bool:
+        """
+        Return whether the document ran out of time, forgetting it.
+        """
+        if document in self.exceeded:
+            self.exceeded.discard(document)
+            return True
+        return False
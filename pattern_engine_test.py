@@ -0,0 +1,130 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test the span-based pattern engine
+"""
+
+import re
+import time
+
+import pytest
+
+from pattern_engine import (
+    PatternEngine,
+    PrefilterStats,
+    Span,
+    TimeBudget,
+    conservative_spans,
+    redact_conservatively,
+)
+
+
+def test_find_spans_keeps_pattern_precedence():
+    engine = PatternEngine(
+        [
+            ("number", re.compile(r"\b\d{3,7}\b")),
+            ("url", re.compile(r"\bhttp://[\w./]+\.org[\w./]*")),
+        ],
+        "[REDACTED]",
+    )
+    text = 'xmlns="http://www.w3.org/1999/xhtml"'
+
+    # The url can't extend over the number that an earlier pattern already claimed
+    assert engine.find_spans(text) == [Span(7, 25, "url"), Span(25, 29, "number")]
+    assert engine.redact(text) == 'xmlns="[REDACTED][REDACTED]/xhtml"'
+
+
+def test_replace_all_categories():
+    engine = PatternEngine(
+        [("phone", re.compile(r"\b\d{3} \d{4}\b"))],
+        "[REDACTED]",
+        replace_all_categories=("phone",),
+    )
+    # Like str.replace(), every occurrence of the matched number is redacted
+    assert engine.redact("call 555 1234 or x555 1234") == "call [REDACTED] or x[REDACTED]"
+
+
+def test_no_match():
+    engine = PatternEngine([("number", re.compile(r"\d+"))], "[REDACTED]")
+    assert engine.find_spans("nothing to see") == []
+    assert engine.redact("nothing to see") == "nothing to see"
+
+
+def test_prefilters():
+    engine = PatternEngine(
+        [
+            ("email", re.compile(r"\b\w+@\w+\.com\b")),
+            ("number", re.compile(r"\d+")),
+            ("number", re.compile(r"one|two")),
+        ],
+        "[REDACTED]",
+        prefilters={"email": "@", "number": r"\d|one|two", "unused": "x"},
+    )
+
+    assert engine.redact("Subject: hello") == "Subject: hello"
+    assert engine.redact("one or 2 at jo@example.com") == (
+        "[REDACTED] or [REDACTED] at [REDACTED]"
+    )
+    assert engine.redact("jo@example.com") == "[REDACTED]"
+    assert engine.prefilter_stats.texts == 3
+    # Categories without patterns aren't counted
+    assert engine.prefilter_stats.skipped == {"email": 1, "number": 2}
+    assert str(engine.prefilter_stats) == (
+        "3 texts, skipped number 2 (66.7%), email 1 (33.3%)"
+    )
+
+
+def test_prefilter_stats():
+    stats = PrefilterStats(3, {"email": 2})
+    earlier = stats.copy()
+    stats.skip("email")
+    stats.skip("url")
+    stats.texts += 1
+    since = stats.since(earlier)
+    assert (since.texts, since.skipped) == (1, {"email": 1, "url": 1})
+
+    earlier.add(since)
+    assert (earlier.texts, earlier.skipped) == (4, {"email": 3, "url": 1})
+    assert str(PrefilterStats()) == "0 texts, skipped none"
+
+
+def test_find_spans_deadline():
+    # Backtracks exponentially on a run of "a"s without a "c"
+    engine = PatternEngine([("slow", re.compile(r"(a|aa)+c"))], "[REDACTED]")
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        engine.find_spans("a" * 200, deadline=start + 0.05)
+    assert time.perf_counter() - start < 1
+
+    # A deadline that has already passed stops the patterns before they start
+    with pytest.raises(TimeoutError):
+        engine.find_spans("ac", deadline=start)
+    assert engine.find_spans("ac", deadline=time.perf_counter() + 10) == [Span(0, 2, "slow")]
+
+
+def test_redact_conservatively():
+    text = "Call John on 021-555-1234 or john@example.com, see www.example.com."
+    assert redact_conservatively(text, "[REDACTED]") == (
+        "Call John on [REDACTED] or [REDACTED] see [REDACTED]"
+    )
+    assert [text[start:end] for start, end in conservative_spans(text)] == [
+        "021-555-1234",
+        "john@example.com,",
+        "www.example.com.",
+    ]
+
+
+def test_time_budget():
+    budget = TimeBudget(1.0)
+    first = budget.start()
+    budget.mark_exceeded()
+    assert budget.timed_out
+    second = budget.start()
+    assert not budget.timed_out
+    assert budget.pop_exceeded(first)
+    assert not budget.pop_exceeded(first)
+    assert not budget.pop_exceeded(second)
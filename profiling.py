@@ -0,0 +1,193 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Opt-in profiling of where the time of a run goes.
+"""
+
+import heapq
+import json
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+from constants import PROFILE_SLOWEST_DOCUMENTS, TRACE_MAX_EVENTS
+
+# Pipeline stages
+STAGE_EXTRACT = "extract"
+STAGE_LOAD = "load"
+STAGE_REGEX = "regex"
+STAGE_NLP = "nlp"
+STAGE_WRITE = "write"
+
+
+class Profiler:
+    """
+    Record the time spent in each stage of the pipeline, in each pattern, and on the
+    regular expressions of each document.
+
+    Stages nest, since the stages of the pipeline are chained generators (e.g. the NLP
+    model pulls texts through the patterns, which pull emails from the importer). The time
+    of a stage doesn't include the time of the stages nested in it.
+    """
+
+    def __init__(
+        self,
+        slowest: int = PROFILE_SLOWEST_DOCUMENTS,
+        trace: bool = False,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.slowest = slowest
+        self.trace = trace
+        self.clock = clock
+        self.start_time = clock()
+        # name -> [seconds, calls]
+        self.stages = {}
+        # category -> [seconds, calls, matches]
+        self.patterns = {}
+        # (start, name, time of nested stages) of the stages that are running
+        self._stack = []
+        self.trace_events = []
+        # Min-heap of the (regex seconds, message id) of the slowest documents
+        self._slowest_documents = []
+        self._document = None
+        self._document_seconds = 0.0
+        self.documents = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the code run in the with block as the given stage.
+        """
+        start = self.clock()
+        self._stack.append([start, name, 0.0])
+        try:
+            yield
+        finally:
+            end = self.clock()
+            _, _, nested = self._stack.pop()
+            elapsed = end - start
+            totals = self.stages.setdefault(name, [0.0, 0])
+            totals[0] += elapsed - nested
+            totals[1] += 1
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            if name == STAGE_REGEX:
+                self._document_seconds += elapsed - nested
+            if self.trace and len(self.trace_events) < TRACE_MAX_EVENTS:
+                self.trace_events.append(
+                    {
+                        "name": name,
+                        "cat": "stage",
+                        "ph": "X",
+                        "ts": (start - self.start_time) * 1_000_000,
+                        "dur": elapsed * 1_000_000,
+                        "pid": 0,
+                        "tid": 0,
+                    }
+                )
+
+    def iterate(self, name: str, items: Iterable) -> Iterator:
+        """
+        Yield the items, timing the wait for each one as the given stage.
+        """
+        iterator = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add_pattern(self, category: str, seconds: float, matches: int) -> None:
+        """
+        Record one search for a pattern.
+        """
+        totals = self.patterns.setdefault(category, [0.0, 0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+        totals[2] += matches
+
+    def start_document(self, message_id: str) -> None:
+        """
+        Count the time of the regex stage from now on against the given document.
+        """
+        self._end_document()
+        self._document = message_id
+        self.documents += 1
+
+    def _end_document(self) -> None:
+        if self._document is not None:
+            entry = (self._document_seconds, self._document)
+            if len(self._slowest_documents) < self.slowest:
+                heapq.heappush(self._slowest_documents, entry)
+            else:
+                heapq.heappushpop(self._slowest_documents, entry)
+        self._document = None
+        self._document_seconds = 0.0
+
+    def summary(self) -> dict:
+        """
+        Summarise the timings as a dict that can be saved as JSON.
+        """
+        self._end_document()
+        return {
+            "total_seconds": self.clock() - self.start_time,
+            "stages": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in sorted(
+                    self.stages.items(), key=lambda item: item[1][0], reverse=True
+                )
+            },
+            "patterns": {
+                category: {"seconds": seconds, "calls": calls, "matches": matches}
+                for category, (seconds, calls, matches) in sorted(
+                    self.patterns.items(), key=lambda item: item[1][0], reverse=True
+                )
+            },
+            "documents": self.documents,
+            "slowest_documents": [
+                {"message_id": message_id, "regex_seconds": seconds}
+                for seconds, message_id in sorted(self._slowest_documents, reverse=True)
+            ],
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Save the summary as JSON.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def save_trace(self, path: str) -> None:
+        """
+        Save the stages as a Chrome trace, for chrome://tracing or https://ui.perfetto.dev
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, f)
+
+
+# The profiler of the current run, set by enable_profiling()
+_profiler = None
+
+
+def enable_profiling(
+    slowest: int = PROFILE_SLOWEST_DOCUMENTS, trace: bool = False
+) -> Profiler:
+    """
+    Start profiling the run.
+    """
+    global _profiler  # noqa: PLW0603
+    _profiler = Profiler(slowest=slowest, trace=trace)
+    return _profiler
+
+
+def get_profiler() -> Profiler | None:
+    """
+    Return the profiler of the current run, or None when it isn't being profiled.
+    """
+    return _profiler
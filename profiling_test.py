@@ -0,0 +1,82 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test the profiling of the stages, patterns and documents of a run
+"""
+
+import json
+
+from profiling import STAGE_EXTRACT, STAGE_NLP, STAGE_REGEX, Profiler
+
+
+class FakeClock:
+    """
+    A clock that only moves when it is told to.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_nested_stages_exclude_inner_time():
+    clock = FakeClock()
+    profiler = Profiler(clock=clock)
+    with profiler.stage(STAGE_NLP):
+        clock.now += 1.0
+        with profiler.stage(STAGE_REGEX):
+            clock.now += 2.0
+    summary = profiler.summary()
+    assert summary["stages"][STAGE_REGEX] == {"seconds": 2.0, "calls": 1}
+    assert summary["stages"][STAGE_NLP] == {"seconds": 1.0, "calls": 1}
+    assert list(summary["stages"]) == [STAGE_REGEX, STAGE_NLP]
+
+
+def test_iterate():
+    profiler = Profiler()
+    assert list(profiler.iterate(STAGE_EXTRACT, [1, 2, 3])) == [1, 2, 3]
+    # One wait for each item, and one for the end of the items
+    assert profiler.summary()["stages"][STAGE_EXTRACT]["calls"] == 4
+
+
+def test_patterns():
+    profiler = Profiler()
+    profiler.add_pattern("EMAIL", 0.5, 2)
+    profiler.add_pattern("EMAIL", 0.25, 1)
+    profiler.add_pattern("PHONE", 1.0, 0)
+    patterns = profiler.summary()["patterns"]
+    assert list(patterns) == ["PHONE", "EMAIL"]
+    assert patterns["EMAIL"] == {"seconds": 0.75, "calls": 2, "matches": 3}
+
+
+def test_slowest_documents():
+    clock = FakeClock()
+    profiler = Profiler(slowest=2, clock=clock)
+    for message_id, seconds in [("a", 0.0), ("b", 3.0), ("c", 1.0)]:
+        profiler.start_document(message_id)
+        with profiler.stage(STAGE_REGEX):
+            clock.now += seconds
+    summary = profiler.summary()
+    assert summary["documents"] == 3
+    assert summary["slowest_documents"] == [
+        {"message_id": "b", "regex_seconds": 3.0},
+        {"message_id": "c", "regex_seconds": 1.0},
+    ]
+
+
+def test_save_trace(tmp_path):
+    profiler = Profiler(trace=True)
+    with profiler.stage(STAGE_NLP):
+        with profiler.stage(STAGE_REGEX):
+            pass
+    path = tmp_path / "trace.json"
+    profiler.save_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == [STAGE_REGEX, STAGE_NLP]
+    assert all(event["ph"] == "X" for event in events)
@@ -0,0 +1,41 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Report the progress of a long running loop.
+"""
+
+import time
+
+from constants import PROGRESS_INTERVAL
+
+
+class Progress:
+    """
+    Print how many items have been processed, and how fast, at regular intervals.
+    """
+
+    def __init__(self, label: str, interval: float = PROGRESS_INTERVAL):
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.start_time = time.monotonic()
+        self.last_report = self.start_time
+
+    def update(self, count: int = 1) -> None:
+        self.count += count
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.monotonic() - self.start_time
+        rate = self.count / elapsed if elapsed else 0.0
+        print(f"{self.label}: {self.count} in {elapsed:.0f}s ({rate:.1f}/s)", flush=True)
+
+    def finish(self) -> None:
+        self.report()
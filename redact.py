@@ -8,7 +8,67 @@
 Tool to redact emails in JSON format and output to directory
 """
 
-from vendor.scrub import Scrub
+import hashlib
+import importlib.metadata
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+
+import vendor.scrub
+from constants import NLP_BATCH_SIZE, NLP_PROCESSES
+from gazetteer import Gazetteer
+from html_redaction import HtmlDocument
+from pattern_engine import (
+    PatternEngine,
+    PrefilterStats,
+    TimeBudget,
+    conservative_spans,
+    mask_spans,
+    redact_conservatively,
+)
+from profiling import STAGE_NLP, STAGE_REGEX, get_profiler
+from redaction_cache import RedactionCache
+from redaction_spans import (
+    DETECTOR_FALLBACK,
+    DETECTOR_GAZETTEER,
+    DETECTOR_PATTERN,
+    FALLBACK_CATEGORY,
+    PLACEHOLDERS_REDACTED,
+    RedactedSpan,
+    apply_spans,
+    map_entities,
+    merge_spans,
+)
+from reply_segments import split_segments
+from vendor.scrub import PHONE_PARENTHESES_PATTERN, Scrub
+from version import VERSION
+
+# Engines for matching PIIScrub.patterns: "sequential" rewrites the text with re.sub
+# after every pattern, "spans" collects the matched spans and builds the text once.
+ENGINE_SEQUENTIAL = "sequential"
+ENGINE_SPANS = "spans"
+ENGINES = (ENGINE_SEQUENTIAL, ENGINE_SPANS)
+
+# Set to True on a payload when the patterns ran out of time on it, and some of its text
+# was redacted conservatively instead
+REDACTION_FALLBACK_KEY = "redaction_fallback"
+
+# Set on a payload when its spans are recorded, to the [start, end, category, detector]
+# of each span redacted from each of its fields, in the redacted text's coordinates, by
+# field name (e.g. "headers.subject" or "plain"). Fields with nothing redacted are left out.
+REDACTIONS_KEY = "redactions"
+# Set alongside REDACTIONS_KEY when the original texts are kept: the text each span
+# replaced, by field name. Only for writing to a RedactionMap, never to the output.
+REDACTED_TEXTS_KEY = "redacted_texts"
+
+HEADERS_WITH_PII = [
+    "from",
+    "sender",
+    "to",
+    "cc",
+    "subject",
+]
 
 STREET_SUFFIXES = [
     "Street",
@@ -57,16 +117,63 @@ STREET_SUFFIXES = [
 ]
 
 
+# A cheap check for each family (category) of patterns, of text that every pattern in the
+# family needs in order to match. Text without it skips the whole family. Each check only
+# uses characters that the patterns themselves need, never one the spans engine masks with.
+PATTERN_PREFILTERS = {
+    "bank_iban": r"[A-Z]{2}\d\d",
+    "nz_bank": r"\d-\d{4}-\d",
+    "date": r"\d/\d",
+    "street": r"\d",
+    "phone": r"\d{3}",
+    "vehicle_rego": r"\d|[A-Z]{2}",
+    "url": r"\.[a-zA-Z]{2}",
+    "email": r"@",
+    "ssn": r"\d{3}",
+    "ip_address_v4": r"\d\.\d",
+    "ip_address_v6": r"[0-9A-Fa-f]:[0-9A-Fa-f]",
+    "hostname": r"[A-Za-z0-9]\.[A-Za-z]{2}|xn--",
+    "uuid": r"[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-",
+}
+
+
 class PIIScrub(Scrub):
-    def __init__(self):
-        super().__init__()
+    def __init__(
+        self,
+        engine: str = ENGINE_SPANS,
+        propagate_entities: bool = False,
+        gazetteer: Gazetteer | None = None,
+        use_nlp: bool = True,
+    ):
+        super().__init__(propagate_entities=propagate_entities)
+        if engine not in ENGINES:
+            raise ValueError(
+                f"Unknown engine '{engine}', expected one of: {', '.join(ENGINES)}"
+            )
+        self.engine = engine
+        # Known names, places and streets, redacted along with the patterns
+        self.gazetteer = gazetteer
+        # Without the NLP model, only the patterns and the gazetteer are redacted, and
+        # the model is never loaded
+        self.use_nlp = use_nlp
+        self._pattern_engine = None
         self.patterns = [
-            ("bank_iban", r"\b([A-Z]{2}\d{2}[-\s]{0,1}[A-Z0-9-\s]{1,33}\d)\b"),
+            # The separator after the check digits and the rest of the number are
+            # alternatives that can't both match, so only one is ever backtracked over
+            (
+                "bank_iban",
+                r"\b([A-Z]{2}\d{2}(?:[-\s][A-Z0-9-\s]{0,33}|(?![-\s])[A-Z0-9-\s]{1,33})\d)\b",
+            ),
             ("nz_bank", r"\b\d{2}-\d{4}-\d{7}-\d{2,3}\b"),
             ("date", r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"),
             (
+                # The same matches as \d+\s*[\w\s]+?\s+(suffix), which backtracks over
+                # every split of a run of spaces between its three quantifiers. Here
+                # the words and spaces are stepped over one whole run at a time: the
+                # first suffix after the number's first word, else one straight after it.
                 "street",
-                rf"(?i)\b\d{{1,}}\s{{0,}}[\w\s]+?\s{{1,}}({'|'.join(STREET_SUFFIXES)})\b",
+                r"(?i)\b(?:\d++\s*+(?:\w++\s++)+?|\d\d++\s++|\d++\s\s++)"
+                rf"({'|'.join(STREET_SUFFIXES)})\b",
             ),
             (
                 "phone",
@@ -89,18 +196,703 @@ class PIIScrub(Scrub):
             ),
             *self.patterns,
         ]
+        # Checks that let the spans engine skip a family of patterns (see
+        # PATTERN_PREFILTERS). Anyone changing the patterns must keep these true for them.
+        self.prefilters = dict(PATTERN_PREFILTERS)
+        # The texts that each family was skipped on, across every pattern engine built
+        self.prefilter_stats = PrefilterStats()
+
+    @property
+    def pattern_engine(self) -> PatternEngine:
+        """
+        The span engine for the compiled patterns, built on first use.
+        """
+        compiled_patterns = self.compiled_patterns
+        if (
+            self._pattern_engine is None
+            or self._pattern_engine.patterns is not compiled_patterns
+            or self._pattern_engine.prefilter_source is not self.prefilters
+        ):
+            self._pattern_engine = PatternEngine(
+                compiled_patterns,
+                self.REDACTION_TEXT,
+                replace_all_categories=("phone",),
+                strip_pattern=PHONE_PARENTHESES_PATTERN,
+                prefilters=self.prefilters,
+                prefilter_stats=self.prefilter_stats,
+            )
+        return self._pattern_engine
+
+    def scrub_patterns(self, text: str, budget: TimeBudget | None = None) -> str:
+        """
+        Redact the patterns, then the terms of the gazetteer, from a text.
+
+        With a budget, text that the patterns are still running on when the current
+        document's time is up is redacted conservatively instead, and the document is
+        marked as exceeded. Only the spans engine can be stopped.
+        """
+        scrubbed_text = self._scrub_patterns_only(text, budget)
+        if self.gazetteer is None:
+            return scrubbed_text
+        return self.gazetteer.redact(scrubbed_text, self.REDACTION_TEXT)
+
+    def _scrub_patterns_only(self, text: str, budget: TimeBudget | None) -> str:
+        if self.engine == ENGINE_SEQUENTIAL:
+            return super().scrub_patterns(text)
+        if budget is None:
+            return self.pattern_engine.redact(text)
+        start = time.perf_counter()
+        try:
+            return self.pattern_engine.redact(text, deadline=budget.deadline())
+        except TimeoutError:
+            budget.mark_exceeded()
+            return redact_conservatively(text, self.REDACTION_TEXT)
+        finally:
+            budget.used += time.perf_counter() - start
+
+    def find_spans(self, text: str, budget: TimeBudget | None = None) -> list[RedactedSpan]:
+        """
+        Return what scrub_patterns() redacts from a text, as spans of the text ordered by
+        position. Only the spans engine can find them.
+        """
+        if self.engine != ENGINE_SPANS:
+            raise ValueError(f"Only the '{ENGINE_SPANS}' engine can find spans")
+        spans = self._find_pattern_spans(text, budget)
+        if self.gazetteer is None:
+            return spans
+        masked_text = mask_spans(text, [(span.start, span.end) for span in spans])
+        spans.extend(
+            RedactedSpan(start, end, category, DETECTOR_GAZETTEER)
+            for start, end, category in self.gazetteer.spans(masked_text)
+        )
+        spans.sort()
+        return spans
+
+    def _find_pattern_spans(self, text: str, budget: TimeBudget | None) -> list[RedactedSpan]:
+        if budget is None:
+            return [
+                RedactedSpan(*span, DETECTOR_PATTERN)
+                for span in self.pattern_engine.find_spans(text)
+            ]
+        started = time.perf_counter()
+        try:
+            return [
+                RedactedSpan(*span, DETECTOR_PATTERN)
+                for span in self.pattern_engine.find_spans(text, budget.deadline())
+            ]
+        except TimeoutError:
+            budget.mark_exceeded()
+            return [
+                RedactedSpan(start, end, FALLBACK_CATEGORY, DETECTOR_FALLBACK)
+                for start, end in conservative_spans(text)
+            ]
+        finally:
+            budget.used += time.perf_counter() - started
 
+    def scrub_pii_with_nlp(self, text: str) -> str:
+        if not self.use_nlp:
+            return text
+        return super().scrub_pii_with_nlp(text)
 
-def redact_text(text: str) -> str:
+    def scrub_pii_with_nlp_pipe(
+        self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1
+    ) -> Iterator[str]:
+        if not self.use_nlp:
+            return iter(texts)
+        return super().scrub_pii_with_nlp_pipe(texts, batch_size, n_process)
+
+    def find_entities(self, text: str) -> list[tuple[int, int, str]]:
+        if not self.use_nlp:
+            return []
+        return super().find_entities(text)
+
+    def find_entities_pipe(
+        self, texts: Iterable[str], batch_size: int = 64, n_process: int = 1
+    ) -> Iterator[list[tuple[int, int, str]]]:
+        if not self.use_nlp:
+            return ([] for _ in texts)
+        return super().find_entities_pipe(texts, batch_size, n_process)
+
+    def replace_all_matches(self, text: str) -> set[str]:
+        """
+        Return the phone numbers matched in the text, which scrub_patterns() redacts
+        every occurrence of.
+        """
+        matches = set()
+        for category, pattern in self.compiled_patterns:
+            if category == "phone":
+                for match in pattern.finditer(text):
+                    matches.add(PHONE_PARENTHESES_PATTERN.sub(r"\1", match.group(0)))
+        matches.discard("")
+        return matches
+
+    def cache_version(self) -> str:
+        """
+        Identify everything that changes the redacted text, for keying a RedactionCache.
+
+        This is the app version, the patterns, the gazetteer, the entity settings and the
+        NLP model with its installed version. The engine isn't included, since every
+        engine gives the same output.
+        """
+        model, mode = vendor.scrub.nlp_config
+        try:
+            model_version = importlib.metadata.version(model)
+        except importlib.metadata.PackageNotFoundError:
+            model_version = "unknown"
+        patterns = hashlib.sha256(
+            "\n".join(f"{category}\t{pattern}" for category, pattern in self.patterns).encode()
+        ).hexdigest()
+        gazetteer = self.gazetteer.digest() if self.gazetteer else None
+        if not self.use_nlp:
+            model, model_version, mode = None, None, None
+        return (
+            f"{VERSION}|{patterns}|{gazetteer}|{self.REDACTION_TEXT}|"
+            f"{sorted(self.REDACT_ENTIES)}|{self.propagate_entities}|"
+            f"{model}=={model_version}|{mode}"
+        )
+
+
+# The shared scrubber, created on first use by get_scrubber()
+_scrubber = None
+_scrubber_lock = threading.Lock()
+
+
+def get_scrubber() -> PIIScrub:
+    """
+    Return the long-lived scrubber shared by every redact_text() call.
+
+    The scrubber only holds its compiled patterns, so it is safe to share across threads.
+    """
+    global _scrubber  # noqa: PLW0603
+    if _scrubber is None:
+        with _scrubber_lock:
+            if _scrubber is None:
+                scrubber = PIIScrub()
+                # Compile the patterns before the scrubber is shared
+                scrubber.pattern_engine  # noqa: B018
+                _scrubber = scrubber
+    return _scrubber
+
+
+def redact_text(text: str, scrubber: PIIScrub | None = None) -> str:
     """
     Redact the personal identifiable information from a given text.
 
+    Uses the shared scrubber from get_scrubber() unless one is passed in.
+
     In case of any error, return empty text
     """
     try:
-        scrubber = PIIScrub()
+        if scrubber is None:
+            scrubber = get_scrubber()
         scrubbed_text = scrubber.scrub(text)
         return scrubbed_text
     except BaseException as e:
         print(f"Exception occured : {e}")
         return ""
+
+
+def _scrub_patterns(
+    scrubber: PIIScrub, text: str, budget: TimeBudget | None = None
+) -> str | None:
+    """
+    Redact the patterns from a text, returning None on any error.
+
+    redact_texts() redacts a text that fails to empty text, like redact_text(), but
+    doesn't cache it.
+    """
+    profiler = get_profiler()
+    try:
+        if profiler is None:
+            return scrubber.scrub_patterns(text, budget)
+        with profiler.stage(STAGE_REGEX):
+            return scrubber.scrub_patterns(text, budget)
+    except BaseException as e:
+        print(f"Exception occured : {e}")
+        return None
+
+
+def _find_spans(
+    scrubber: PIIScrub, text: str, budget: TimeBudget | None = None
+) -> list[RedactedSpan] | None:
+    """
+    Find the spans the patterns and gazetteer redact from a text, returning None on any
+    error like _scrub_patterns().
+    """
+    profiler = get_profiler()
+    try:
+        if profiler is None:
+            return scrubber.find_spans(text, budget)
+        with profiler.stage(STAGE_REGEX):
+            return scrubber.find_spans(text, budget)
+    except BaseException as e:
+        print(f"Exception occured : {e}")
+        return None
+
+
+def _scrub_pii_with_nlp_pipe(
+    scrubber: PIIScrub,
+    texts: Iterable[str],
+    batch_size: int,
+    n_process: int,
+    entities: bool = False,
+) -> Iterator:
+    """
+    Run the NLP model over the texts in batches, yielding the results in order: the
+    redacted texts, or with entities the (start, end, label) of the entities it found.
+
+    If the model fails, the texts it was given but hadn't returned (the failed batch) are
+    redacted one at a time instead, to empty text (or None for entities) if they fail
+    again, like redact_text(). The rest of the texts go through a new pipe. Errors from
+    the texts themselves, e.g. from reading the emails, are raised as they are.
+    """
+    if entities:
+        pipe, one, failed = scrubber.find_entities_pipe, scrubber.find_entities, None
+    else:
+        pipe, one, failed = scrubber.scrub_pii_with_nlp_pipe, scrubber.scrub_pii_with_nlp, ""
+    texts = iter(texts)
+    # The texts sent into the pipe that haven't come out of it yet
+    sent = deque()
+    source_failed = False
+
+    def feed() -> Iterator[str]:
+        nonlocal source_failed
+        while True:
+            try:
+                text = next(texts)
+            except StopIteration:
+                return
+            except BaseException:
+                source_failed = True
+                raise
+            sent.append(text)
+            yield text
+
+    while True:
+        try:
+            for result in pipe(feed(), batch_size=batch_size, n_process=n_process):
+                sent.popleft()
+                yield result
+            return
+        except Exception as e:
+            if source_failed:
+                raise
+            print(f"Exception occured : {e}")
+        while sent:
+            text = sent.popleft()
+            try:
+                yield one(text)
+            except Exception as e:
+                print(f"Exception occured : {e}")
+                yield failed
+
+
+def _nlp_pipe(
+    scrubber: PIIScrub,
+    texts: Iterable[str],
+    batch_size: int,
+    n_process: int,
+    entities: bool = False,
+) -> Iterator:
+    """
+    Run the NLP model over the texts in batches, timing it when the run is profiled.
+    """
+    nlp_texts = _scrub_pii_with_nlp_pipe(scrubber, texts, batch_size, n_process, entities)
+    profiler = get_profiler()
+    if profiler is None:
+        return nlp_texts
+    return profiler.iterate(STAGE_NLP, nlp_texts)
+
+
+def redact_texts(
+    texts: Iterable[str],
+    scrubber: PIIScrub | None = None,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_PROCESSES,
+    cache: RedactionCache | None = None,
+    budget: TimeBudget | None = None,
+) -> Iterator[str]:
+    """
+    Redact the personal identifiable information from a stream of texts.
+
+    Gives the same results as calling redact_text() on each text, but the NLP model
+    processes the texts in batches with nlp.pipe(), optionally over several processes.
+    The texts are consumed lazily and the results are yielded in the same order.
+
+    With a cache, texts that were already redacted skip the patterns and the NLP model.
+
+    With a budget, the patterns are limited to the time of the document it was last
+    started for (see PIIScrub.scrub_patterns()).
+    """
+    if scrubber is None:
+        scrubber = get_scrubber()
+    if cache is None:
+        scrubbed_texts = (_scrub_patterns(scrubber, text, budget) or "" for text in texts)
+        yield from _nlp_pipe(scrubber, scrubbed_texts, batch_size, n_process)
+        return
+    yield from _redact_texts_with_cache(texts, scrubber, batch_size, n_process, cache, budget)
+
+
+def _redact_texts_with_cache(
+    texts: Iterable[str],
+    scrubber: PIIScrub,
+    batch_size: int,
+    n_process: int,
+    cache: RedactionCache,
+    budget: TimeBudget | None,
+) -> Iterator[str]:
+    """
+    redact_texts() with a cache: each distinct text is only redacted once.
+    """
+    # The cache key of each text sent through the NLP model, with its cached result, or
+    # None if it is being redacted. The key is None for results that mustn't be cached.
+    lookups = deque()
+    # The texts being redacted that will be cached, by key: the number of their lookups
+    # still to come out of the NLP model, and their redacted text once it has. A repeat
+    # of one of these texts, e.g. in the same batch, waits for the first one's result.
+    in_flight = {}
+
+    def scrubbed_texts() -> Iterator[str]:
+        for text in texts:
+            key = cache.key(text)
+            if key in in_flight:
+                in_flight[key][0] += 1
+                cache.stats.hits += 1
+                lookups.append((key, None))
+                yield ""
+                continue
+            redacted = cache.get(key)
+            if redacted is not None:
+                # Cached texts still go through the pipe, as empty text that costs next
+                # to nothing, so the results stay in order without holding any texts back
+                lookups.append((key, redacted))
+                yield ""
+                continue
+            scrubbed_text = _scrub_patterns(scrubber, text, budget)
+            if scrubbed_text is None or (budget is not None and budget.timed_out):
+                # Don't cache failures or conservative redactions, the text may be fine
+                # on its own or in a later run
+                lookups.append((None, None))
+                yield scrubbed_text or ""
+                continue
+            in_flight[key] = [1, None]
+            lookups.append((key, None))
+            yield scrubbed_text
+
+    for nlp_text in _nlp_pipe(scrubber, scrubbed_texts(), batch_size, n_process):
+        key, redacted = lookups.popleft()
+        if redacted is None and key is not None:
+            waiting = in_flight[key]
+            if waiting[1] is None:
+                # The first of the texts with this key, which was actually redacted
+                waiting[1] = nlp_text
+                cache.put(key, nlp_text)
+            redacted = waiting[1]
+            waiting[0] -= 1
+            if not waiting[0]:
+                del in_flight[key]
+        elif redacted is None:
+            redacted = nlp_text
+        yield redacted
+
+
+def redact_texts_with_spans(
+    texts: Iterable[str],
+    scrubber: PIIScrub | None = None,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_PROCESSES,
+    budget: TimeBudget | None = None,
+    placeholders: str = PLACEHOLDERS_REDACTED,
+) -> Iterator[tuple[str, list[RedactedSpan], list[str]]]:
+    """
+    Redact a stream of texts like redact_texts(), yielding each redacted text with the
+    spans replaced in it, in its own coordinates, and the original text of each span.
+
+    The NLP model sees the texts with the patterns and gazetteer terms already redacted,
+    as with redact_texts(), and its entities are mapped back onto the original text, so
+    every span is replaced once, by the placeholder of the given mode.
+
+    Only the spans engine can find the spans. A text that fails is redacted to empty text.
+    """
+    if scrubber is None:
+        scrubber = get_scrubber()
+    redaction_text = scrubber.REDACTION_TEXT
+    # Each text sent through the NLP model, with the spans found in it before
+    found = deque()
+
+    def replaced_texts() -> Iterator[str]:
+        for text in texts:
+            spans = _find_spans(scrubber, text, budget)
+            found.append((text, spans))
+            if spans is None:
+                yield ""
+                continue
+            yield apply_spans(text, spans, PLACEHOLDERS_REDACTED, redaction_text)[0]
+
+    for entities in _nlp_pipe(
+        scrubber, replaced_texts(), batch_size, n_process, entities=True
+    ):
+        text, spans = found.popleft()
+        if spans is None or entities is None:
+            yield "", [], []
+            continue
+        spans = merge_spans(spans, map_entities(entities, spans, redaction_text))
+        redacted, moved = apply_spans(text, spans, placeholders, redaction_text)
+        yield redacted, moved, [text[span.start : span.end] for span in spans]
+
+
+def redact_payload(payload: dict, scrubber: PIIScrub | None = None) -> dict:
+    """
+    Redact all PII in the payload.
+
+    The same scrubber is used for every field, defaulting to the shared one from
+    get_scrubber().
+
+    payload structure looks like this:
+    json_body = {
+        "headers": {
+            "from": sender,
+            "sender": sender,
+            "date": date,
+            "to": recipient,
+            "cc": cc,
+            "message_id": message_id.strip("\r\n "),
+            "subject": subject,
+            "content_type": content_type,
+        },
+        "envelope": {},
+        "plain": email_plain,
+        "html": email_html,
+        "attachments": [],
+    }
+    """
+    return next(redact_payloads([payload], scrubber=scrubber))
+
+
+def payload_text_fields(payload: dict) -> list[tuple[str | None, str]]:
+    """
+    List the (section, key) of every field in the payload that needs redacting.
+
+    The section is "headers" for header fields, or None for the top level fields.
+    """
+    fields = [
+        ("headers", key) for key in payload.get("headers", {}) if key in HEADERS_WITH_PII
+    ]
+    fields.extend([(None, "plain"), (None, "html")])
+    return fields
+
+
+def split_field(
+    key: str,
+    text: str,
+    segment_replies: bool = False,
+    html_aware: bool = False,
+    scrubber: PIIScrub | None = None,
+) -> tuple[list[str], Callable[[list[str]], str]]:
+    """
+    Split a payload field into the texts to redact, with the function that joins the
+    redacted texts back together.
+
+    Reply segments are redacted on their own, so once joined, every occurrence of the
+    phone numbers matched anywhere in the text is redacted, and the patterns run once
+    more to catch a match that runs across two segments.
+
+    The URL attribute values of an html document (see HtmlDocument) are redacted with the
+    patterns as it is joined, since the NLP model would only mangle them.
+    """
+    if scrubber is None:
+        scrubber = get_scrubber()
+    if html_aware and key == "html":
+        document = HtmlDocument(text)
+
+        def redact_url(url: str) -> str:
+            scrubbed = _scrub_patterns(scrubber, url)
+            return scrubber.REDACTION_TEXT if scrubbed is None else scrubbed
+
+        def join_document(redacted_texts: list[str]) -> str:
+            return document.join(redacted_texts, redact_url)
+
+        return document.texts(), join_document
+    if segment_replies and key == "plain":
+        segments = split_segments(text)
+        if len(segments) > 1:
+
+            def join_segments(redacted_segments: list[str]) -> str:
+                joined = "".join(redacted_segments)
+                for phone in sorted(scrubber.replace_all_matches(text), key=len, reverse=True):
+                    joined = joined.replace(phone, scrubber.REDACTION_TEXT)
+                rescrubbed = _scrub_patterns(scrubber, joined)
+                return joined if rescrubbed is None else rescrubbed
+
+            return segments, join_segments
+    return [text], "".join
+
+
+def redact_payloads(
+    payloads: Iterable[dict],
+    scrubber: PIIScrub | None = None,
+    batch_size: int = NLP_BATCH_SIZE,
+    n_process: int = NLP_PROCESSES,
+    cache: RedactionCache | None = None,
+    segment_replies: bool = False,
+    html_aware: bool = False,
+    pattern_budget: float | None = None,
+    placeholders: str = PLACEHOLDERS_REDACTED,
+    record_spans: bool = False,
+    keep_originals: bool = False,
+) -> Iterator[dict]:
+    """
+    Redact all PII in a stream of payloads, yielding each one as soon as it is complete.
+
+    The header, plain and html fields of all the payloads are fed through redact_texts()
+    as one stream, so the NLP model sees them in batches across message boundaries.
+
+    With segment_replies, plain text bodies are split into their new text, quoted replies
+    and signatures, which are redacted separately. Along with a cache, each reply that is
+    quoted again and again through a thread is then only redacted once.
+
+    With html_aware, only the text nodes of html bodies, and the attributes that can hold
+    PII (see HtmlDocument), are redacted. The markup is left as it is, apart from URL
+    attribute values, which go through the patterns.
+
+    With a pattern_budget, the patterns get that many seconds for each payload. Once it
+    is used up, the rest of the payload is redacted conservatively (see
+    redact_conservatively()), and REDACTION_FALLBACK_KEY is set on the payload.
+
+    With typed placeholders, each span is replaced by its category, e.g. "[PHONE]". With
+    record_spans, the spans redacted from each field are set under REDACTIONS_KEY, and
+    with keep_originals the text they replaced under REDACTED_TEXTS_KEY as well. These
+    need the spans engine, and can't be combined with a cache, segment_replies or
+    html_aware, which don't keep track of where the text came from.
+    """
+    if scrubber is None:
+        scrubber = get_scrubber()
+    with_spans = record_spans or keep_originals or placeholders != PLACEHOLDERS_REDACTED
+    if with_spans:
+        _check_span_options(scrubber, cache, segment_replies, html_aware)
+    budget = TimeBudget(pattern_budget) if pattern_budget else None
+    # Payloads whose fields have been sent for redaction, with the (section, key) of each
+    # field, the number of texts it was split into and the function that joins them, and
+    # the payload's document number in the budget
+    pending = deque()
+
+    texts = _payload_texts(payloads, pending, scrubber, budget, segment_replies, html_aware)
+    if with_spans:
+        redacted_texts = redact_texts_with_spans(
+            texts, scrubber, batch_size, n_process, budget, placeholders
+        )
+    else:
+        redacted_texts = redact_texts(
+            texts,
+            scrubber=scrubber,
+            batch_size=batch_size,
+            n_process=n_process,
+            cache=cache,
+            budget=budget,
+        )
+    field_index = 0
+    redacted_parts = []
+    for redacted_text in redacted_texts:
+        payload, fields, document = pending[0]
+        section, key, text_count, join = fields[field_index]
+        if with_spans:
+            redacted_text = _record_spans(
+                payload,
+                section,
+                key,
+                redacted_text,
+                record_spans or keep_originals,
+                keep_originals,
+            )
+        redacted_parts.append(redacted_text)
+        if len(redacted_parts) < text_count:
+            continue
+        container = payload[section] if section else payload
+        container[key] = join(redacted_parts)
+        redacted_parts = []
+        field_index += 1
+        if field_index == len(fields):
+            pending.popleft()
+            field_index = 0
+            if budget and budget.pop_exceeded(document):
+                payload[REDACTION_FALLBACK_KEY] = True
+            yield payload
+
+
+def _payload_texts(
+    payloads: Iterable[dict],
+    pending: deque,
+    scrubber: PIIScrub,
+    budget: TimeBudget | None,
+    segment_replies: bool,
+    html_aware: bool,
+) -> Iterator[str]:
+    """
+    Yield the texts to redact from each payload's fields for redact_payloads(), adding the
+    payload to pending once its texts are split out.
+    """
+    profiler = get_profiler()
+    for payload in payloads:
+        if profiler:
+            profiler.start_document(payload.get("headers", {}).get("message_id", ""))
+        document = budget.start() if budget else None
+        fields = []
+        field_texts = []
+        for section, key in payload_text_fields(payload):
+            container = payload[section] if section else payload
+            split_texts, join = split_field(
+                key, container.get(key, ""), segment_replies, html_aware, scrubber
+            )
+            if not split_texts:
+                # Nothing to redact, e.g. an html body that is all markup
+                container[key] = join([])
+                continue
+            fields.append((section, key, len(split_texts), join))
+            field_texts.append(split_texts)
+        pending.append((payload, fields, document))
+        for split_texts in field_texts:
+            yield from split_texts
+
+
+def _check_span_options(
+    scrubber: PIIScrub,
+    cache: RedactionCache | None,
+    segment_replies: bool,
+    html_aware: bool,
+) -> None:
+    """
+    Raise ValueError if spans can't be found with these options of redact_payloads().
+    """
+    if scrubber.engine != ENGINE_SPANS:
+        raise ValueError(f"Placeholders and spans need the '{ENGINE_SPANS}' engine")
+    if cache is not None or segment_replies or html_aware:
+        raise ValueError(
+            "Placeholders and spans can't be combined with a cache, segment_replies or "
+            "html_aware"
+        )
+
+
+def _record_spans(
+    payload: dict,
+    section: str | None,
+    key: str,
+    redacted: tuple[str, list[RedactedSpan], list[str]],
+    record: bool,
+    keep_originals: bool,
+) -> str:
+    """
+    Set the spans of a field redacted by redact_texts_with_spans() on its payload, if
+    they are recorded, and return its redacted text.
+    """
+    redacted_text, spans, originals = redacted
+    if not record:
+        return redacted_text
+    redactions = payload.setdefault(REDACTIONS_KEY, {})
+    if keep_originals:
+        redacted_texts = payload.setdefault(REDACTED_TEXTS_KEY, {})
+    if spans:
+        field = f"{section}.{key}" if section else key
+        redactions[field] = [list(span) for span in spans]
+        if keep_originals:
+            redacted_texts[field] = originals
+    return redacted_text
@@ -8,9 +8,33 @@
 Test redact text
 """
 
+import copy
+import re
 from pathlib import Path
 
-from redact import PIIScrub
+import pytest
+import spacy
+from spacy.tokens import Span
+
+from gazetteer import Gazetteer
+from redact import (
+    ENGINE_SEQUENTIAL,
+    ENGINE_SPANS,
+    PATTERN_PREFILTERS,
+    REDACTED_TEXTS_KEY,
+    REDACTION_FALLBACK_KEY,
+    REDACTIONS_KEY,
+    STREET_SUFFIXES,
+    PIIScrub,
+    get_scrubber,
+    redact_payload,
+    redact_payloads,
+    redact_text,
+    redact_texts,
+)
+from redaction_cache import RedactionCache
+from redaction_spans import PLACEHOLDERS_TYPED
+from vendor.scrub import NLP_MODE_FULL, NLP_MODE_NER, load_nlp
 
 
 def test_redact_urls():
@@ -94,3 +118,384 @@ def test_redact_license_plates():
         assert clean_text.strip() == scrubber.REDACTION_TEXT, (
             f"#{test_num} failed for {plate=}"
         )
+
+
+def test_shared_scrubber():
+    scrubber = get_scrubber()
+    assert get_scrubber() is scrubber
+    assert scrubber.compiled_patterns is scrubber.compiled_patterns
+    assert len(scrubber.compiled_patterns) == len(scrubber.patterns)
+
+
+def test_engines_match():
+    sequential = PIIScrub(engine=ENGINE_SEQUENTIAL)
+    spans = PIIScrub(engine=ENGINE_SPANS)
+    test_file = Path(__file__).parent / "test_data" / "license_plates.txt"
+    test_data = [
+        'xmlns="http://www.w3.org/1999/xhtml"',
+        "John Smith (9/01/2025), lives at 24a Totara Avenue, Tauranga.",
+        "Call (09) 123 4567 or 09 123 4567, my IBAN is GB82 WEST 1234 5698 7654 32",
+        "Send it to john.smith@example.com at 192.168.0.1 on 12-1234-1234567-123",
+        "Re: Meeting at xn--bcher-kva.nz, host fe80:0:0:0:0:0:0:1",
+        "Ref 123e4567-e89b-12d3-a456-426614174000, SSN 123-45-6789",
+        *test_file.read_text().splitlines(),
+    ]
+    for test_num, input_text in enumerate(test_data, start=1):
+        assert spans.scrub_patterns(input_text) == sequential.scrub_patterns(input_text), (
+            f"#{test_num} failed"
+        )
+        # A pattern can only match text that its family's prefilter matches
+        for category, pattern in spans.compiled_patterns:
+            if pattern.search(input_text):
+                assert re.search(PATTERN_PREFILTERS[category], input_text), (
+                    f"#{test_num} {category} prefilter failed"
+                )
+
+
+def test_prefilters_skip_header_fields():
+    scrubber = PIIScrub()
+    assert scrubber.scrub_patterns("Re: Meeting on Monday") == "Re: Meeting on Monday"
+    assert scrubber.scrub_patterns("Re: Claim for John") == "Re: Claim for John"
+    assert scrubber.prefilter_stats.texts == 2
+    # Not one pattern ran on either subject
+    assert scrubber.prefilter_stats.skipped == dict.fromkeys(PATTERN_PREFILTERS, 2)
+
+
+def test_redact_texts():
+    test_data = [
+        "John Smith (9/01/2025), lives at 24 Walls St, London.",
+        "My bank account is 12-1234-1234567-12",
+        "",
+        "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd",
+    ]
+    expected = [redact_text(input_text) for input_text in test_data]
+
+    assert list(redact_texts(test_data, batch_size=2)) == expected
+
+
+def test_load_nlp_modes(tmp_path):
+    # A small pipeline shaped like the trained ones, where the tagger listens to the
+    # shared tok2vec and the entity recognizer has its own embedding layer
+    nlp = spacy.blank("en")
+    nlp.add_pipe("tok2vec")
+    nlp.add_pipe("tagger").add_label("NN")
+    nlp.add_pipe("attribute_ruler")
+    nlp.add_pipe("ner").add_label("PERSON")
+    nlp.initialize()
+    nlp.to_disk(tmp_path)
+
+    assert load_nlp(str(tmp_path), NLP_MODE_FULL).pipe_names == [
+        "tok2vec",
+        "tagger",
+        "attribute_ruler",
+        "ner",
+    ]
+    assert load_nlp(str(tmp_path), NLP_MODE_NER).pipe_names == ["ner"]
+
+
+def test_redact_entities():
+    nlp = spacy.blank("en")
+    doc = nlp("Ask Ann about Annabel, Ann knows. Call Bob on Monday.")
+    doc.ents = [
+        Span(doc, 1, 2, label="PERSON"),
+        Span(doc, 9, 10, label="PERSON"),
+        Span(doc, 11, 12, label="DATE"),
+    ]
+
+    # Only the entities the model found are replaced
+    assert PIIScrub().redact_entities(doc) == (
+        "Ask [REDACTED] about Annabel, Ann knows. Call [REDACTED] on [REDACTED]."
+    )
+    # Every occurrence of their text is replaced
+    assert PIIScrub(propagate_entities=True).redact_entities(doc) == (
+        "Ask [REDACTED] about [REDACTED]abel, [REDACTED] knows. Call [REDACTED] on [REDACTED]."
+    )
+    assert PIIScrub(propagate_entities=True).entity_spans(doc)[:2] == [
+        (4, 7, "PERSON"),
+        (14, 17, "PERSON"),
+    ]
+
+
+def make_payload(subject: str, plain: str) -> dict:
+    return {
+        "headers": {
+            "from": "john.smith@example.com",
+            "sender": "john.smith@example.com",
+            "date": "2025-01-09T10:00:00",
+            "to": "support@example.com",
+            "cc": "",
+            "message_id": "<1234@example.com>",
+            "subject": subject,
+            "content_type": 'text/plain; charset="utf-8"',
+        },
+        "envelope": {},
+        "plain": plain,
+        "html": "",
+        "attachments": [],
+    }
+
+
+def test_redact_payloads_matches_redact_payload():
+    payloads = [
+        make_payload("Invoice 1234", "John Smith (9/01/2025), lives at 24 Walls St, London."),
+        make_payload("Bank details", "My bank account is 12-1234-1234567-12"),
+        make_payload("-", "Call me on 021 555 1234"),
+    ]
+    expected = [redact_payload(copy.deepcopy(payload)) for payload in payloads]
+
+    redacted = list(redact_payloads(copy.deepcopy(payloads), batch_size=2))
+
+    assert redacted == expected
+    assert redacted[1]["plain"] == "My bank account is [REDACTED]"
+    # Headers that don't contain PII are left alone
+    assert redacted[0]["headers"]["message_id"] == "<1234@example.com>"
+
+
+def test_redact_payloads_with_cache():
+    payloads = [
+        make_payload("Invoice 1234", "John Smith (9/01/2025), lives at 24 Walls St, London."),
+        make_payload("Invoice 1234", "Call me on 021 555 1234"),
+        make_payload("Invoice 1234", "John Smith (9/01/2025), lives at 24 Walls St, London."),
+    ]
+    expected = list(redact_payloads(copy.deepcopy(payloads)))
+    scrubber = PIIScrub()
+    cache = RedactionCache(scrubber.cache_version())
+
+    redacted = list(redact_payloads(copy.deepcopy(payloads), scrubber=scrubber, cache=cache))
+
+    assert redacted == expected
+    # from, sender, to, cc, subject, plain and html of each payload, all in one batch
+    assert cache.stats.lookups == 21
+    # Only the distinct texts are redacted: the two addresses, "", the subject and bodies
+    assert cache.stats.misses == 6
+
+
+def test_redact_texts_does_not_cache_errors():
+    class FailingScrub(PIIScrub):
+        def scrub_patterns(self, text, budget=None):
+            if text == "fail":
+                raise ValueError("failed")
+            return super().scrub_patterns(text, budget)
+
+    scrubber = FailingScrub()
+    cache = RedactionCache(scrubber.cache_version())
+
+    redacted = list(redact_texts(["fail", "fail", "ok"], scrubber=scrubber, cache=cache))
+
+    # Failed texts are redacted to empty text, like redact_text() does
+    assert redacted == ["", "", "ok"]
+    assert cache.get(cache.key("fail")) is None
+    assert cache.get(cache.key("ok")) == "ok"
+
+
+def test_redact_texts_recovers_from_nlp_errors():
+    class FailingScrub(PIIScrub):
+        def redact_entities(self, nlp_doc):
+            if nlp_doc.text == "fail":
+                raise ValueError("failed")
+            return super().redact_entities(nlp_doc)
+
+    texts = ["Call 021 555 1234", "fail", "ok", "fail", "Email jo@example.com"]
+
+    redacted = list(redact_texts(texts, scrubber=FailingScrub()))
+
+    # Only the texts that fail are lost, redacted to empty text like redact_text() does
+    assert redacted == [redact_text(texts[0]), "", "ok", "", redact_text(texts[4])]
+
+
+def test_redact_texts_raises_errors_from_its_texts():
+    def texts():
+        yield "ok"
+        raise OSError("unreadable")
+
+    with pytest.raises(OSError, match="unreadable"):
+        list(redact_texts(texts()))
+
+
+def test_redact_payloads_regex_and_gazetteer_only():
+    class NoNlpScrub(PIIScrub):
+        def redact_entities(self, nlp_doc):
+            raise AssertionError("the NLP model was used")
+
+    gazetteer = Gazetteer(["Aroha Ngata"], streets=["Cuba"], street_suffixes=STREET_SUFFIXES)
+    scrubber = NoNlpScrub(gazetteer=gazetteer, use_nlp=False)
+    payload = make_payload(
+        "Claim for Aroha Ngata", "Aroha Ngata of Cuba St, Wellington, jo@example.com"
+    )
+
+    redacted = next(redact_payloads([payload], scrubber=scrubber))
+
+    assert redacted["headers"]["subject"] == "Claim for [REDACTED]"
+    assert redacted["plain"] == "[REDACTED] of [REDACTED], [REDACTED], [REDACTED]"
+    assert scrubber.cache_version() != PIIScrub().cache_version()
+
+
+def test_redact_payloads_segment_replies():
+    quoted = "> Call John Smith on 021 555 1234\n> at 24 Walls St, London.\n"
+    payloads = [
+        make_payload("Meeting", "Sure.\n\nOn Monday, John wrote:\n" + quoted),
+        make_payload("Re: Meeting", "Done.\n\nOn Monday, John wrote:\n" + quoted),
+    ]
+    expected = list(redact_payloads(copy.deepcopy(payloads)))
+    scrubber = PIIScrub()
+    cache = RedactionCache(scrubber.cache_version())
+
+    redacted = list(
+        redact_payloads(
+            copy.deepcopy(payloads),
+            scrubber=scrubber,
+            cache=cache,
+            segment_replies=True,
+        )
+    )
+
+    assert redacted == expected
+    # The quoted reply was already redacted for the first email
+    assert cache.stats.misses == 9
+
+
+def test_redact_payloads_segment_replies_across_segments():
+    scrubber = PIIScrub()
+    scrubber.patterns = [("phone", r"(?<!\d)\d{3} \d{4}(?!\d)")]
+    # The number is only matched in the quoted reply, but like without segments, every
+    # occurrence of it is redacted
+    payload = make_payload("Re: Meeting", "Ref 9555 1234.\n> Call 555 1234\n")
+
+    redacted = next(redact_payloads([payload], scrubber=scrubber, segment_replies=True))
+
+    assert redacted["plain"] == "Ref 9[REDACTED].\n> Call [REDACTED]\n"
+
+
+def test_redact_payloads_html_aware():
+    payload = make_payload("Hello", "")
+    payload["html"] = (
+        '<html xmlns:o="urn:schemas-microsoft-com:office:office"><body>'
+        '<p style="margin:0">Call me on 021 555 1234</p>'
+        '<a href="mailto:john.smith@example.com">Email me</a></body></html>'
+    )
+
+    redacted = next(redact_payloads([payload], html_aware=True))
+    assert redacted["html"] == (
+        '<html xmlns:o="urn:schemas-microsoft-com:office:office"><body>'
+        '<p style="margin:0">Call me on[REDACTED]</p>'
+        '<a href="mailto:[REDACTED]">Email me</a></body></html>'
+    )
+
+
+def test_redact_payloads_html_aware_urls():
+    payload = make_payload("Hello", "")
+    payload["html"] = (
+        '<a href="https://x/?email=jane@corp.co.nz&amp;phone=0215551234">Link</a>'
+        "<img src=https://x/u/jane%40corp.co.nz/photo.png>"
+    )
+
+    redacted = next(redact_payloads([payload], html_aware=True))
+
+    assert "jane" not in redacted["html"]
+    assert "corp" not in redacted["html"]
+    assert "555" not in redacted["html"]
+    assert redacted["html"].startswith('<a href="[REDACTED]')
+    assert ">Link</a><img src=[REDACTED]" in redacted["html"]
+
+
+def test_redact_payloads_pattern_budget():
+    # The street pattern backtracks for a very long time over an IBAN-like run of numbers
+    slow = make_payload("Hello", "Unit AB12" + " 1" * 3_000 + " call me on 021 555 1234")
+    payloads = [slow, make_payload("Bank details", "My bank account is 12-1234-1234567-12")]
+    scrubber = PIIScrub()
+    cache = RedactionCache(scrubber.cache_version())
+
+    redacted = list(
+        redact_payloads(
+            copy.deepcopy(payloads), scrubber=scrubber, cache=cache, pattern_budget=0.05
+        )
+    )
+
+    assert redacted[0][REDACTION_FALLBACK_KEY] is True
+    assert "1234" not in redacted[0]["plain"]
+    assert redacted[0]["plain"].startswith("Unit [REDACTED] [REDACTED]")
+    assert redacted[1] == redact_payload(copy.deepcopy(payloads[1]))
+    # The conservatively redacted body isn't cached
+    assert cache.get(cache.key(slow["plain"])) is None
+
+
+class NamedEntityScrub(PIIScrub):
+    """
+    A scrubber whose NLP model finds "Bob" and "Monday", whatever model is loaded.
+    """
+
+    def entity_spans(self, nlp_doc):
+        return [
+            (match.start(), match.end(), "DATE" if match.group() == "Monday" else "PERSON")
+            for match in re.finditer(r"Bob|Monday", nlp_doc.text)
+        ]
+
+
+def test_redact_payloads_record_spans_matches_redact_payloads():
+    payloads = [
+        make_payload("Invoice 1234", "John Smith (9/01/2025), lives at 24 Walls St, London."),
+        make_payload("-", "Call me on 021 555 1234"),
+    ]
+    expected = list(redact_payloads(copy.deepcopy(payloads)))
+
+    redacted = list(redact_payloads(copy.deepcopy(payloads), record_spans=True))
+
+    assert [payload.pop(REDACTIONS_KEY) for payload in redacted] != [{}, {}]
+    assert redacted == expected
+
+
+def test_redact_payloads_typed_placeholders():
+    gazetteer = Gazetteer([("Aroha Ngata", "PERSON"), ("Kiwi Insurance", "ORG")])
+    scrubber = NamedEntityScrub(gazetteer=gazetteer)
+    payload = make_payload(
+        "Claim for Aroha Ngata", "Bob of Kiwi Insurance called on Monday from 021 555 1234"
+    )
+
+    redacted = next(
+        redact_payloads([payload], scrubber=scrubber, placeholders=PLACEHOLDERS_TYPED)
+    )
+
+    assert redacted["headers"]["subject"] == "Claim for [PERSON]"
+    assert redacted["plain"] == "[PERSON] of [ORG] called on [DATE] from[PHONE]"
+    assert REDACTIONS_KEY not in redacted
+
+
+def test_redact_payloads_record_spans():
+    scrubber = NamedEntityScrub(gazetteer=Gazetteer(["Aroha Ngata"]))
+    payload = make_payload("Hi Bob", "Bob and Aroha Ngata, jo@example.com, Bob.")
+
+    redacted = next(
+        redact_payloads([payload], scrubber=scrubber, record_spans=True, keep_originals=True)
+    )
+
+    assert redacted["plain"] == "[REDACTED] and [REDACTED], [REDACTED], [REDACTED]."
+    redactions = redacted[REDACTIONS_KEY]
+    assert redactions["plain"] == [
+        [0, 10, "PERSON", "nlp"],
+        [15, 25, "PERSON", "gazetteer"],
+        [27, 37, "url", "pattern"],
+        [39, 49, "PERSON", "nlp"],
+    ]
+    assert redactions["headers.subject"] == [[3, 13, "PERSON", "nlp"]]
+    # The spans are in the redacted text's offsets
+    for start, end, *_ in redactions["plain"]:
+        assert redacted["plain"][start:end] == "[REDACTED]"
+    assert redacted[REDACTED_TEXTS_KEY]["plain"] == [
+        "Bob",
+        "Aroha Ngata",
+        "jo@example.com",
+        "Bob",
+    ]
+    # Fields with nothing redacted are left out
+    assert "headers.cc" not in redactions
+
+
+def test_redact_payloads_spans_need_span_options():
+    payload = make_payload("Hi", "Call 021 555 1234")
+
+    with pytest.raises(ValueError, match="spans"):
+        next(
+            redact_payloads([payload], scrubber=PIIScrub(ENGINE_SEQUENTIAL), record_spans=True)
+        )
+    with pytest.raises(ValueError, match="cache"):
+        next(redact_payloads([payload], placeholders=PLACEHOLDERS_TYPED, html_aware=True))
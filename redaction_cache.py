@@ -0,0 +1,190 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Cache of redacted texts, keyed by a hash of the original text.
+"""
+
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+from constants import CACHE_COMMIT_INTERVAL, CACHE_MAX_BYTES
+
+# Rough memory used by each cached entry on top of its redacted text
+CACHE_ENTRY_OVERHEAD = 200
+
+
+class CacheStats:
+    """
+    Count the cache lookups that were hits and misses.
+    """
+
+    def __init__(self, hits: int = 0, disk_hits: int = 0, misses: int = 0):
+        self.hits = hits
+        self.disk_hits = disk_hits
+        self.misses = misses
+
+    def add(self, other: "CacheStats") -> None:
+        self.hits += other.hits
+        self.disk_hits += other.disk_hits
+        self.misses += other.misses
+
+    def copy(self) -> "CacheStats":
+        return CacheStats(self.hits, self.disk_hits, self.misses)
+
+    def since(self, earlier: "CacheStats") -> "CacheStats":
+        """
+        Return the lookups made since an earlier copy of these stats.
+        """
+        return CacheStats(
+            self.hits - earlier.hits,
+            self.disk_hits - earlier.disk_hits,
+            self.misses - earlier.misses,
+        )
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    def __str__(self) -> str:
+        hit_rate = self.hits / self.lookups if self.lookups else 0.0
+        return (
+            f"{self.hits} hits ({self.disk_hits} from disk), {self.misses} misses, "
+            f"{hit_rate:.1%} hit rate"
+        )
+
+
+class RedactionCache:
+    """
+    Remember the redacted version of each text, so repeated text is only redacted once.
+
+    Entries are kept in memory in least recently used order, up to a limit on their size,
+    and optionally in an SQLite database so that later runs can reuse them too.
+
+    The key of each entry is a hash of the text and a version, which must identify
+    everything that changes the redacted text (e.g. the patterns and the NLP model), so a
+    result is never reused by a scrubber that would redact the text differently.
+    """
+
+    def __init__(
+        self, version: str, max_bytes: int = CACHE_MAX_BYTES, path: str | None = None
+    ):
+        """
+        Parameters
+        ----------
+        version : str
+            Identifies the scrubber configuration the results belong to.
+        max_bytes : int
+            Approximate limit on the memory used by the in-memory entries.
+        path : str | None
+            SQLite database that also stores every entry, or None to only cache in memory.
+
+        """
+        self.version = version
+        self.max_bytes = max_bytes
+        self.path = path
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._db = None
+        self._uncommitted = 0
+
+    def __getstate__(self) -> dict:
+        # Worker processes get their own, empty, copy of the cache
+        return {"version": self.version, "max_bytes": self.max_bytes, "path": self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    @property
+    def db(self) -> sqlite3.Connection | None:
+        """
+        The connection to the SQLite database, opened on first use.
+        """
+        if self.path and self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=60)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS redactions (key BLOB PRIMARY KEY, redacted TEXT)"
+            )
+        return self._db
+
+    def key(self, text: str) -> bytes:
+        """
+        Return the cache key for a text.
+        """
+        digest = hashlib.blake2b(self.version.encode("utf-8"), digest_size=20)
+        digest.update(b"\x00")
+        digest.update(text.encode("utf-8", errors="surrogatepass"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> str | None:
+        """
+        Return the cached redacted text for a key, or None if it isn't cached.
+        """
+        redacted = self._entries.get(key)
+        if redacted is not None:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return redacted
+
+        if self.db:
+            row = self.db.execute(
+                "SELECT redacted FROM redactions WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._remember(key, row[0])
+                self.stats.hits += 1
+                self.stats.disk_hits += 1
+                return row[0]
+
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: bytes, redacted: str) -> None:
+        """
+        Cache the redacted text for a key.
+        """
+        self._remember(key, redacted)
+        if self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO redactions (key, redacted) VALUES (?, ?)",
+                (key, redacted),
+            )
+            # Commit regularly, so other processes sharing the database aren't locked out
+            self._uncommitted += 1
+            if self._uncommitted >= CACHE_COMMIT_INTERVAL:
+                self.commit()
+
+    def _remember(self, key: bytes, redacted: str) -> None:
+        """
+        Add an entry to memory, dropping the least recently used ones to stay in size.
+        """
+        if key in self._entries:
+            return
+        self._entries[key] = redacted
+        self._size += len(redacted) + CACHE_ENTRY_OVERHEAD
+        while self._size > self.max_bytes and self._entries:
+            _, dropped = self._entries.popitem(last=False)
+            self._size -= len(dropped) + CACHE_ENTRY_OVERHEAD
+
+    def commit(self) -> None:
+        """
+        Save the entries written to the database.
+        """
+        if self._db is not None:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def close(self) -> None:
+        """
+        Save the entries written to the database, and close it.
+        """
+        if self._db is not None:
+            self.commit()
+            self._db.close()
+            self._db = None
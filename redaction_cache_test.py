@@ -0,0 +1,50 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test the cache of redacted texts
+"""
+
+import pickle
+
+from redaction_cache import CACHE_ENTRY_OVERHEAD, RedactionCache
+
+
+def test_cache_get_put():
+    cache = RedactionCache("v1")
+    key = cache.key("Call John")
+    assert cache.get(key) is None
+    cache.put(key, "Call [REDACTED]")
+    assert cache.get(key) == "Call [REDACTED]"
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+    # A different version never shares keys
+    assert RedactionCache("v2").key("Call John") != key
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RedactionCache("v1", max_bytes=2 * (CACHE_ENTRY_OVERHEAD + 1))
+    keys = [cache.key(text) for text in "abc"]
+    cache.put(keys[0], "A")
+    cache.put(keys[1], "B")
+    cache.get(keys[0])
+    cache.put(keys[2], "C")
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "A"
+    assert cache.get(keys[2]) == "C"
+
+
+def test_cache_database(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = RedactionCache("v1", path=path)
+    cache.put(cache.key("Call John"), "Call [REDACTED]")
+    cache.close()
+
+    # A new cache, or a copy sent to a worker process, reads the entries from the database
+    for reopened in (RedactionCache("v1", path=path), pickle.loads(pickle.dumps(cache))):  # noqa: S301
+        assert reopened.get(reopened.key("Call John")) == "Call [REDACTED]"
+        assert reopened.stats.disk_hits == 1
+        reopened.close()
@@ -0,0 +1,142 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Keep the text each redaction replaced in an encrypted file, so someone holding the key
+can re-identify a redacted email when they are authorised to.
+
+Each line of the map is one email, encrypted on its own with Fernet (from the optional
+"cryptography" package): {"email_id": ..., "fields": {field: [[start, end, category,
+detector, original], ...]}}, with the spans in the coordinates of the redacted field.
+
+The key is only ever read from the PII_REDACT_MAP_KEY environment variable, never from
+the command line, where it would end up in the shell history. Create one with:
+    python -m redaction_map key
+and read a map back with:
+    python -m redaction_map read FILE
+"""
+
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator
+
+from manifest import EMAIL_ID_KEY, email_id
+from redact import REDACTED_TEXTS_KEY, REDACTIONS_KEY
+
+# Environment variable holding the key of the map
+MAP_KEY_VARIABLE = "PII_REDACT_MAP_KEY"
+
+
+def get_fernet_class():
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError as e:
+        raise RuntimeError(
+            "The redaction map needs the cryptography package: uv pip install cryptography"
+        ) from e
+    return Fernet
+
+
+def get_fernet(key: str | None = None):
+    """
+    Return the Fernet cipher for the key, or for the key in MAP_KEY_VARIABLE.
+    """
+    if key is None:
+        key = os.environ.get(MAP_KEY_VARIABLE)
+    if not key:
+        raise RuntimeError(
+            f"Set {MAP_KEY_VARIABLE} to the key of the redaction map, "
+            "e.g. from: python -m redaction_map key"
+        )
+    return get_fernet_class()(key)
+
+
+def identify(payloads: Iterable[dict]) -> Iterator[dict]:
+    """
+    Yield the payloads, each with its EMAIL_ID_KEY set, before they are redacted.
+    """
+    for payload in payloads:
+        if EMAIL_ID_KEY not in payload:
+            payload[EMAIL_ID_KEY] = email_id(payload)
+        yield payload
+
+
+class RedactionMap:
+    """
+    Append the original text of every span redacted from each email to an encrypted file.
+
+    The payloads must have been redacted with keep_originals (see redact_payloads()). A
+    run that is resumed appends to the same map, so an email redone after a crash may be
+    in it twice, with the same entry.
+    """
+
+    def __init__(self, path: str, key: str | None = None):
+        self._fernet = get_fernet(key)
+        self.path = path
+        # Emails written to the map
+        self.written = 0
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, payload: dict) -> None:
+        """
+        Write the original texts of a redacted payload to the map, taking them off it.
+        """
+        originals = payload.pop(REDACTED_TEXTS_KEY, {})
+        if not originals:
+            return
+        spans = payload[REDACTIONS_KEY]
+        fields = {
+            field: [
+                [*span, original] for span, original in zip(spans[field], texts, strict=False)
+            ]
+            for field, texts in originals.items()
+        }
+        entry = json.dumps({"email_id": payload[EMAIL_ID_KEY], "fields": fields})
+        token = self._fernet.encrypt(entry.encode("utf-8"))
+        self._file.write(token.decode("ascii") + "\n")
+        self.written += 1
+
+    def collect(self, payloads: Iterable[dict], keep_spans: bool = False) -> Iterator[dict]:
+        """
+        Write each redacted payload to the map as it passes through. Unless keep_spans
+        is set, the spans are taken off the payloads too.
+        """
+        for payload in payloads:
+            self.write(payload)
+            if not keep_spans:
+                payload.pop(REDACTIONS_KEY, None)
+            yield payload
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_map(path: str, key: str | None = None) -> Iterator[dict]:
+    """
+    Read the entries of a redaction map, in the order they were written.
+    """
+    fernet = get_fernet(key)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(fernet.decrypt(line.encode("ascii")))
+
+
+def main():
+    usage = "usage: python -m redaction_map key | read FILE"
+    if sys.argv[1:] == ["key"]:
+        print(get_fernet_class().generate_key().decode("ascii"))
+    elif len(sys.argv) == 3 and sys.argv[1] == "read":
+        for entry in read_map(sys.argv[2]):
+            print(json.dumps(entry, ensure_ascii=False))
+    else:
+        sys.exit(usage)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test the encrypted map of the original text of each redaction
+"""
+
+import pytest
+
+from manifest import EMAIL_ID_KEY
+from redact import REDACTED_TEXTS_KEY, REDACTIONS_KEY
+from redaction_map import MAP_KEY_VARIABLE, RedactionMap, identify, read_map
+
+fernet = pytest.importorskip("cryptography.fernet")
+
+
+def redacted_payload(email_id: str) -> dict:
+    return {
+        EMAIL_ID_KEY: email_id,
+        "plain": "Call [PHONE]",
+        REDACTIONS_KEY: {"plain": [[5, 12, "phone", "pattern"]]},
+        REDACTED_TEXTS_KEY: {"plain": ["021 555 1234"]},
+    }
+
+
+def test_redaction_map(tmp_path, monkeypatch):
+    monkeypatch.setenv(MAP_KEY_VARIABLE, fernet.Fernet.generate_key().decode("ascii"))
+    path = str(tmp_path / "map.enc")
+    unredacted = {EMAIL_ID_KEY: "c", "plain": "Hi", REDACTIONS_KEY: {}, REDACTED_TEXTS_KEY: {}}
+    redaction_map = RedactionMap(path)
+
+    payloads = list(
+        redaction_map.collect([redacted_payload("a"), unredacted, redacted_payload("b")])
+    )
+    redaction_map.close()
+
+    # The original texts and spans are taken off the payloads
+    assert payloads[0] == {EMAIL_ID_KEY: "a", "plain": "Call [PHONE]"}
+    assert redaction_map.written == 2
+    # The map can't be read without the key
+    assert "021 555 1234" not in (tmp_path / "map.enc").read_text()
+    assert list(read_map(path)) == [
+        {"email_id": "a", "fields": {"plain": [[5, 12, "phone", "pattern", "021 555 1234"]]}},
+        {"email_id": "b", "fields": {"plain": [[5, 12, "phone", "pattern", "021 555 1234"]]}},
+    ]
+
+    monkeypatch.setenv(MAP_KEY_VARIABLE, fernet.Fernet.generate_key().decode("ascii"))
+    with pytest.raises(fernet.InvalidToken):
+        list(read_map(path))
+
+
+def test_redaction_map_keeps_spans(tmp_path):
+    key = fernet.Fernet.generate_key().decode("ascii")
+    redaction_map = RedactionMap(str(tmp_path / "map.enc"), key)
+
+    payload = next(redaction_map.collect([redacted_payload("a")], keep_spans=True))
+    redaction_map.close()
+
+    assert payload[REDACTIONS_KEY] == {"plain": [[5, 12, "phone", "pattern"]]}
+    assert REDACTED_TEXTS_KEY not in payload
+
+
+def test_redaction_map_needs_key(tmp_path, monkeypatch):
+    monkeypatch.delenv(MAP_KEY_VARIABLE, raising=False)
+    with pytest.raises(RuntimeError, match=MAP_KEY_VARIABLE):
+        RedactionMap(str(tmp_path / "map.enc"))
+
+
+def test_identify():
+    payloads = list(identify([{"headers": {"message_id": "<1@x>"}}, {EMAIL_ID_KEY: "kept"}]))
+    assert len(payloads[0][EMAIL_ID_KEY]) == 32
+    assert payloads[1][EMAIL_ID_KEY] == "kept"
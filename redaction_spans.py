@@ -0,0 +1,147 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Records of what was redacted from a text, and the redacted text built from them.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+# What found each span
+DETECTOR_PATTERN = "pattern"
+DETECTOR_GAZETTEER = "gazetteer"
+DETECTOR_NLP = "nlp"
+# Text the patterns ran out of time on, redacted conservatively
+DETECTOR_FALLBACK = "fallback"
+
+# Category of the spans redacted conservatively
+FALLBACK_CATEGORY = "redacted"
+
+# Replace every span with the redaction text, or with its category, e.g. "[PHONE]"
+PLACEHOLDERS_REDACTED = "redacted"
+PLACEHOLDERS_TYPED = "typed"
+PLACEHOLDER_MODES = (PLACEHOLDERS_REDACTED, PLACEHOLDERS_TYPED)
+
+
+class RedactedSpan(NamedTuple):
+    start: int
+    end: int
+    category: str
+    detector: str
+
+
+def placeholder(category: str, placeholders: str, redaction_text: str) -> str:
+    """
+    Return the text that replaces a span of the category.
+    """
+    if placeholders == PLACEHOLDERS_TYPED:
+        return f"[{category.upper()}]"
+    if placeholders == PLACEHOLDERS_REDACTED:
+        return redaction_text
+    raise ValueError(
+        f"Unknown placeholders '{placeholders}', expected one of: {', '.join(PLACEHOLDER_MODES)}"
+    )
+
+
+def apply_spans(
+    text: str,
+    spans: list[RedactedSpan],
+    placeholders: str = PLACEHOLDERS_REDACTED,
+    redaction_text: str = "[REDACTED]",
+) -> tuple[str, list[RedactedSpan]]:
+    """
+    Replace the spans of the text with their placeholders, building the output in one pass.
+
+    Returns the redacted text, and the spans moved to where their placeholders are in it.
+    """
+    parts = []
+    moved = []
+    position = 0
+    length = 0
+    for span in spans:
+        kept = text[position : span.start]
+        replacement = placeholder(span.category, placeholders, redaction_text)
+        parts.append(kept)
+        parts.append(replacement)
+        length += len(kept)
+        moved.append(span._replace(start=length, end=length + len(replacement)))
+        length += len(replacement)
+        position = span.end
+    parts.append(text[position:])
+    return "".join(parts), moved
+
+
+def map_entities(
+    entities: list[tuple[int, int, str]], spans: list[RedactedSpan], redaction_text: str
+) -> list[RedactedSpan]:
+    """
+    Move the (start, end, label) of entities the NLP model found in the text with its
+    spans replaced by the redaction text back to the text itself.
+
+    An entity that overlaps a replaced span grows to cover the whole of it. An entity
+    that is nothing but replaced spans is dropped, as they are already redacted.
+    """
+    # Where each replaced span starts in the replaced text, and how far the text after it
+    # has moved from the original
+    replaced_starts = []
+    shifts = []
+    shift = 0
+    for span in spans:
+        replaced_starts.append(span.start + shift)
+        shift += len(redaction_text) - (span.end - span.start)
+        shifts.append(shift)
+    replaced_length = len(redaction_text)
+
+    def original_start(offset: int) -> int:
+        index = bisect_right(replaced_starts, offset) - 1
+        if index < 0:
+            return offset
+        if offset < replaced_starts[index] + replaced_length:
+            return spans[index].start
+        return offset - shifts[index]
+
+    def original_end(offset: int) -> int:
+        index = bisect_left(replaced_starts, offset) - 1
+        if index < 0:
+            return offset
+        if offset <= replaced_starts[index] + replaced_length:
+            return spans[index].end
+        return offset - shifts[index]
+
+    def only_replaced(start: int, end: int) -> bool:
+        first = max(bisect_right(replaced_starts, start) - 1, 0)
+        position = start
+        for replaced_start in replaced_starts[first:]:
+            if replaced_start > position:
+                return False
+            position = max(position, replaced_start + replaced_length)
+            if position >= end:
+                return True
+        return False
+
+    return [
+        RedactedSpan(original_start(start), original_end(end), label, DETECTOR_NLP)
+        for start, end, label in entities
+        if end > start and not only_replaced(start, end)
+    ]
+
+
+def merge_spans(spans: list[RedactedSpan], entities: list[RedactedSpan]) -> list[RedactedSpan]:
+    """
+    Combine the spans with the entities from map_entities(), ordered by position.
+
+    The entities cover any span they overlap, and overlapping entities are joined into
+    the first of them.
+    """
+    merged = []
+    for span in sorted([*spans, *entities], key=lambda span: (span.start, -span.end)):
+        if merged and span.start < merged[-1].end:
+            if span.end > merged[-1].end:
+                merged[-1] = merged[-1]._replace(end=span.end)
+            continue
+        merged.append(span)
+    return merged
@@ -0,0 +1,79 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test building redacted text from spans, and mapping NLP entities onto them
+"""
+
+import pytest
+
+from redaction_spans import (
+    PLACEHOLDERS_REDACTED,
+    PLACEHOLDERS_TYPED,
+    RedactedSpan,
+    apply_spans,
+    map_entities,
+    merge_spans,
+    placeholder,
+)
+
+TEXT = "Call 021 555 1234 or Bob Jones at 12 Cuba St"
+SPANS = [
+    RedactedSpan(5, 17, "phone", "pattern"),
+    RedactedSpan(34, 44, "street", "gazetteer"),
+]
+
+
+def test_apply_spans():
+    redacted, moved = apply_spans(TEXT, SPANS, PLACEHOLDERS_TYPED, "[REDACTED]")
+    assert redacted == "Call [PHONE] or Bob Jones at [STREET]"
+    assert [redacted[span.start : span.end] for span in moved] == ["[PHONE]", "[STREET]"]
+    assert moved[1] == RedactedSpan(29, 37, "street", "gazetteer")
+
+    assert apply_spans(TEXT, [])[0] == TEXT
+    assert apply_spans(TEXT, SPANS)[0] == "Call [REDACTED] or Bob Jones at [REDACTED]"
+
+
+def test_placeholder():
+    assert placeholder("GPE", PLACEHOLDERS_TYPED, "[X]") == "[GPE]"
+    assert placeholder("GPE", PLACEHOLDERS_REDACTED, "[X]") == "[X]"
+    with pytest.raises(ValueError, match="Unknown placeholders"):
+        placeholder("GPE", "blank", "[X]")
+
+
+def test_map_entities():
+    replaced, _ = apply_spans(TEXT, SPANS)
+    assert replaced == "Call [REDACTED] or Bob Jones at [REDACTED]"
+
+    def entity(text: str, label: str = "PERSON") -> tuple[int, int, str]:
+        start = replaced.index(text)
+        return start, start + len(text), label
+
+    entities = [
+        entity("Bob Jones"),
+        # Grows to cover the whole of the span it overlaps
+        entity("Jones at [RED", "ORG"),
+        # Nothing but a replaced span, so already redacted
+        entity("[REDACTED]", "CARDINAL"),
+    ]
+    mapped = map_entities(entities, SPANS, "[REDACTED]")
+    assert [TEXT[span.start : span.end] for span in mapped] == [
+        "Bob Jones",
+        "Jones at 12 Cuba St",
+    ]
+    assert {span.detector for span in mapped} == {"nlp"}
+
+
+def test_merge_spans():
+    entities = [
+        RedactedSpan(21, 30, "PERSON", "nlp"),
+        RedactedSpan(25, 44, "ORG", "nlp"),
+    ]
+    assert merge_spans(SPANS, entities) == [
+        SPANS[0],
+        RedactedSpan(21, 44, "PERSON", "nlp"),
+    ]
+    assert merge_spans(SPANS, []) == SPANS
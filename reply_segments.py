@@ -0,0 +1,63 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Split plain text email bodies into reply chain segments.
+"""
+
+import re
+
+# The quote marks at the start of a quoted line, e.g. "> " or "> > "
+QUOTE_PREFIX_PATTERN = re.compile(r"^(?:>[ \t]?)*")
+
+# Lines that start a new part of the reply chain: the "On ... wrote:" line before a
+# quoted reply, Outlook's "Original Message" line, underline and "From:" header, and the
+# "-- " line before a signature
+SEPARATOR_PATTERN = re.compile(
+    r"^(?:On\s.+\swrote:\s*"
+    r"|-{2,}\s*Original Message\s*-{2,}\s*"
+    r"|_{10,}\s*"
+    r"|From:\s.*"
+    r"|-- ?)$",
+    re.IGNORECASE,
+)
+
+
+def split_lines(text: str) -> list[str]:
+    """
+    Split the text into lines that keep their "\\n".
+    """
+    parts = text.split("\n")
+    lines = [f"{part}\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def split_segments(text: str) -> list[str]:
+    """
+    Split an email body into the new text, quoted replies, forwarded messages and
+    signatures it is made of.
+
+    A new segment starts at each change in quote depth, and at each separator line.
+    The segments are only split between lines, and keep their quote marks, so joining
+    them gives back the original text.
+    """
+    segments = []
+    prefix = None
+    lines = []
+    for line in split_lines(text):
+        line_prefix = QUOTE_PREFIX_PATTERN.match(line).group(0).rstrip(" \t")
+        content = line[len(line_prefix) :].lstrip(" \t")
+        if line_prefix != prefix or SEPARATOR_PATTERN.match(content.rstrip("\r\n")):
+            if lines:
+                segments.append("".join(lines))
+            prefix = line_prefix
+            lines = []
+        lines.append(line)
+    if lines:
+        segments.append("".join(lines))
+    return segments
@@ -0,0 +1,54 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test splitting email bodies into reply chain segments
+"""
+
+from reply_segments import split_segments
+
+REPLY = """Thanks, see you then.
+
+--\x20
+Jane Doe
+021 555 1234
+
+On Mon, 9 Jan 2025 at 10:00, John Smith <john@example.com> wrote:
+> Can we meet on Tuesday?
+>
+> > Are you free this week?
+> > John
+"""
+
+FORWARD = """FYI
+
+-----Original Message-----
+From: John Smith <john@example.com>
+Sent: Monday, 9 January 2025 10:00
+Subject: Meeting
+
+Can we meet on Tuesday?\r
+"""
+
+
+def test_split_segments():
+    assert split_segments(REPLY) == [
+        "Thanks, see you then.\n\n",
+        "-- \nJane Doe\n021 555 1234\n\n",
+        "On Mon, 9 Jan 2025 at 10:00, John Smith <john@example.com> wrote:\n",
+        "> Can we meet on Tuesday?\n>\n",
+        "> > Are you free this week?\n> > John\n",
+    ]
+    assert [segment.splitlines()[0] for segment in split_segments(FORWARD)] == [
+        "FYI",
+        "-----Original Message-----",
+        "From: John Smith <john@example.com>",
+    ]
+
+
+def test_split_segments_joins_back():
+    for text in (REPLY, FORWARD, "", "No reply chain", "> quoted\n>", "\n\n> a\n\n"):
+        assert "".join(split_segments(text)) == text
@@ -0,0 +1,224 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Destinations for the redacted payloads.
+"""
+
+import json
+import os
+from functools import cache
+from pathlib import Path
+
+from compressed_files import COMPRESSION_NONE, COMPRESSION_SUFFIXES, open_text
+from extract_emails import save_payload
+from manifest import EMAIL_ID_KEY, Manifest
+
+OUTPUT_FILES = "files"
+OUTPUT_NDJSON = "ndjson"
+OUTPUT_FORMATS = (OUTPUT_FILES, OUTPUT_NDJSON)
+
+# Added to the name of an NDJSON shard until it is complete, when writing with a manifest
+PARTIAL_SUFFIX = ".partial"
+
+
+@cache
+def get_orjson():
+    """
+    Return the optional orjson module, or None if it isn't installed.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def compact_json(payload: dict) -> str:
+    """
+    Serialize a payload as JSON on a single line, with orjson if it is installed.
+
+    The output is the same either way, apart from how floats are written.
+    """
+    orjson = get_orjson()
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload).decode("utf-8")
+        except TypeError:
+            # e.g. a lone surrogate or a non string key, which json writes as it is
+            pass
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+class FileSink:
+    """
+    Save each payload to its own JSON file, named after its position in the stream.
+
+    With a manifest, each file is named after the payload's EMAIL_ID_KEY instead, and
+    added to the manifest once it is written. With compact, the JSON is written on a
+    single line rather than indented.
+    """
+
+    def __init__(self, out_dir: str, manifest: Manifest | None = None, compact: bool = False):
+        self.out_dir = out_dir
+        self.manifest = manifest
+        self.compact = compact
+        self.count = 0
+
+    def _save(self, payload: dict, path: str) -> None:
+        if not self.compact:
+            save_payload(payload, path)
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(compact_json(payload))
+
+    def write(self, payload: dict) -> None:
+        if self.manifest is None:
+            self._save(payload, f"{self.out_dir}/{self.count:08}.json")
+        else:
+            self._save(payload, f"{self.out_dir}/{payload[EMAIL_ID_KEY]}.json")
+            self.manifest.add([payload[EMAIL_ID_KEY]])
+        self.count += 1
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NdjsonSink:
+    """
+    Write the payloads as one JSON document per line, optionally compressed.
+
+    With a shard size, a new file is started once the current one holds that many bytes of
+    (uncompressed) JSON, so no single file grows without limit.
+
+    With a manifest, each shard is written to a ".partial" file, which is renamed once the
+    shard is complete and its payloads' EMAIL_ID_KEYs added to the manifest. The shards
+    are numbered on from those already in the directory, so an earlier run's are kept,
+    apart from any it left unfinished.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        compression: str = COMPRESSION_NONE,
+        shard_size: int | None = None,
+        prefix: str = "redacted",
+        manifest: Manifest | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        out_dir : str
+            Directory the NDJSON files are written to.
+        compression : str
+            One of compressed_files.COMPRESSIONS.
+        shard_size : int | None
+            Bytes of JSON per file before a new one is started, or None for a single file.
+        prefix : str
+            Start of each file name, followed by the shard number.
+        manifest : Manifest | None
+            Where the payloads of each complete shard are recorded.
+
+        """
+        self.out_dir = out_dir
+        self.compression = compression
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.manifest = manifest
+        self.paths = []
+        self._file = None
+        self._shard_bytes = 0
+        # The EMAIL_ID_KEYs of the payloads in the current shard
+        self._shard_ids = []
+        self._first_shard = 0
+        if manifest is not None:
+            # Shards left unfinished by an earlier run, whose payloads weren't recorded
+            for path in Path(out_dir).glob(f"{prefix}-*.ndjson*{PARTIAL_SUFFIX}"):
+                path.unlink()
+            self._first_shard = self._existing_shards()
+
+    def _existing_shards(self) -> int:
+        """
+        Return the number after the highest numbered shard already in the directory.
+        """
+        numbers = [
+            int(path.name[len(self.prefix) + 1 :].split(".", 1)[0])
+            for path in Path(self.out_dir).glob(f"{self.prefix}-*.ndjson*")
+        ]
+        return max(numbers, default=-1) + 1
+
+    def _next_shard(self) -> None:
+        self._finish_shard()
+        suffix = COMPRESSION_SUFFIXES[self.compression]
+        number = self._first_shard + len(self.paths)
+        path = str(Path(self.out_dir, f"{self.prefix}-{number:05}.ndjson{suffix}"))
+        self.paths.append(path)
+        if self.manifest is not None:
+            path += PARTIAL_SUFFIX
+        self._file = open_text(path, "wt", self.compression)
+        self._shard_bytes = 0
+
+    def _finish_shard(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self.manifest is not None:
+            os.replace(self.paths[-1] + PARTIAL_SUFFIX, self.paths[-1])
+            self.manifest.add(self._shard_ids)
+            self._shard_ids = []
+
+    def write(self, payload: dict) -> None:
+        line = compact_json(payload) + "\n"
+        line_bytes = len(line.encode("utf-8"))
+        if self._file is None or (
+            self.shard_size
+            and self._shard_bytes
+            and self._shard_bytes + line_bytes > self.shard_size
+        ):
+            self._next_shard()
+        self._file.write(line)
+        self._shard_bytes += line_bytes
+        if self.manifest is not None:
+            self._shard_ids.append(payload[EMAIL_ID_KEY])
+
+    def close(self) -> None:
+        self._finish_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def make_sink(
+    output_format: str,
+    out_dir: str,
+    compression: str = COMPRESSION_NONE,
+    shard_size: int | None = None,
+    manifest: Manifest | None = None,
+    compact: bool = False,
+) -> FileSink | NdjsonSink:
+    """
+    Create the sink for an output format, recording the payloads it writes in the
+    manifest if one is given. NDJSON is always compact.
+    """
+    if output_format == OUTPUT_NDJSON:
+        return NdjsonSink(
+            out_dir, compression=compression, shard_size=shard_size, manifest=manifest
+        )
+    if output_format == OUTPUT_FILES:
+        return FileSink(out_dir, manifest=manifest, compact=compact)
+    raise ValueError(
+        f"Unknown output format '{output_format}', expected one of: {', '.join(OUTPUT_FORMATS)}"
+    )
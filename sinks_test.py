@@ -0,0 +1,95 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test writing the redacted payloads
+"""
+
+import json
+
+import pytest
+
+from compressed_files import COMPRESSION_GZIP, COMPRESSION_ZSTD, open_text
+from sinks import OUTPUT_FILES, OUTPUT_NDJSON, compact_json, make_sink
+
+PAYLOADS = [
+    {"headers": {"subject": f"Email {index}"}, "plain": "Kia ora ✓"} for index in range(10)
+]
+
+
+def read_ndjson(paths: list[str]) -> list[dict]:
+    payloads = []
+    for path in paths:
+        with open_text(path) as f:
+            payloads.extend(json.loads(line) for line in f)
+    return payloads
+
+
+def test_file_sink(tmp_path):
+    with make_sink(OUTPUT_FILES, str(tmp_path)) as sink:
+        for payload in PAYLOADS:
+            sink.write(payload)
+    files = sorted(tmp_path.iterdir())
+    assert [f.name for f in files[:2]] == ["00000000.json", "00000001.json"]
+    assert [json.loads(f.read_text(encoding="utf-8")) for f in files] == PAYLOADS
+
+
+def test_file_sink_compact(tmp_path):
+    with make_sink(OUTPUT_FILES, str(tmp_path), compact=True) as sink:
+        for payload in PAYLOADS:
+            sink.write(payload)
+    files = sorted(tmp_path.iterdir())
+    assert [f.read_text(encoding="utf-8").count("\n") for f in files] == [0] * len(PAYLOADS)
+    assert [json.loads(f.read_text(encoding="utf-8")) for f in files] == PAYLOADS
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"headers": {"subject": 'Kia ora ✓ "quoted"\n\t'}, "plain": "", "attachments": []},
+        # orjson can't write these, so they fall back to json
+        {"plain": "\ud800"},
+        {1: "not a string key"},
+    ],
+)
+def test_compact_json(payload):
+    assert compact_json(payload) == json.dumps(
+        payload, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+def test_ndjson_sink_single_file(tmp_path):
+    with make_sink(OUTPUT_NDJSON, str(tmp_path)) as sink:
+        for payload in PAYLOADS:
+            sink.write(payload)
+    assert sink.paths == [str(tmp_path / "redacted-00000.ndjson")]
+    assert read_ndjson(sink.paths) == PAYLOADS
+
+
+def test_ndjson_sink_shards_gzip(tmp_path):
+    line_size = len(
+        json.dumps(PAYLOADS[0], ensure_ascii=False, separators=(",", ":")).encode()
+    )
+    with make_sink(
+        OUTPUT_NDJSON,
+        str(tmp_path),
+        compression=COMPRESSION_GZIP,
+        shard_size=line_size * 3 + 3,
+    ) as sink:
+        for payload in PAYLOADS:
+            sink.write(payload)
+    assert len(sink.paths) == 4
+    assert all(path.endswith(".ndjson.gz") for path in sink.paths)
+    assert read_ndjson(sink.paths) == PAYLOADS
+
+
+def test_ndjson_sink_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    with make_sink(OUTPUT_NDJSON, str(tmp_path), compression=COMPRESSION_ZSTD) as sink:
+        for payload in PAYLOADS:
+            sink.write(payload)
+    assert sink.paths[0].endswith(".ndjson.zst")
+    assert read_ndjson(sink.paths) == PAYLOADS
@@ -0,0 +1,52 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+# ruff: noqa: S603
+"""
+Test that the tool starts up without loading the heavy dependencies
+"""
+
+import subprocess  # nosec
+import sys
+from pathlib import Path
+
+# Modules that should only be imported once they are needed
+LAZY_MODULES = ("spacy", "pandas", "en_core_web_lg")
+
+REPO_DIR = Path(__file__).parent
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(  # nosec
+        [sys.executable, *args],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_does_not_load_lazy_modules():
+    code = (
+        "import sys, main, extract_emails, redact; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = run_python("-c", code)
+    assert result.stdout.strip() == ""
+
+
+def test_help_does_not_load_lazy_modules():
+    code = (
+        "import runpy, sys\n"
+        "sys.argv = ['main.py', '--help']\n"
+        "try:\n"
+        "    runpy.run_path('main.py', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('Loaded:', ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = run_python("-c", code)
+    assert "PII Email Redactor" in result.stdout
+    assert result.stdout.splitlines()[-1] == "Loaded: "
@@ -0,0 +1,120 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Redact payloads over a pool of worker processes.
+"""
+
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import batched
+
+from constants import NLP_BATCH_SIZE, WORKER_CHUNK_SIZE
+from pattern_engine import PrefilterStats
+from redact import PIIScrub, redact_payloads
+from redaction_cache import CacheStats, RedactionCache
+from redaction_spans import PLACEHOLDERS_REDACTED
+from vendor.scrub import configure_nlp, get_nlp
+
+# Set in each worker process by init_worker(): the scrubber, cache and other options
+# that redact_payloads() is called with
+_worker_options = {}
+
+
+def init_worker(nlp_config: tuple[str, str], options: dict) -> None:
+    """
+    Set up a worker process, loading the NLP model once for all of its payloads.
+
+    Each worker gets its own empty copy of the cache, sharing only its database.
+    """
+    _worker_options.update(options)
+    configure_nlp(*nlp_config)
+    if options["scrubber"].use_nlp:
+        get_nlp()
+
+
+def redact_chunk(
+    payloads: tuple[dict, ...],
+) -> tuple[list[dict], CacheStats | None, PrefilterStats]:
+    """
+    Redact a chunk of payloads in a worker process.
+
+    Returns the redacted payloads, the cache lookups made while redacting them, and the
+    texts the pattern prefilters skipped.
+    """
+    cache = _worker_options.get("cache")
+    prefilter_stats = _worker_options["scrubber"].prefilter_stats
+    prefilter_start = prefilter_stats.copy()
+    if cache is None:
+        redacted = list(redact_payloads(payloads, **_worker_options))
+        return redacted, None, prefilter_stats.since(prefilter_start)
+
+    stats = cache.stats.copy()
+    redacted = list(redact_payloads(payloads, **_worker_options))
+    cache.commit()
+    return redacted, cache.stats.since(stats), prefilter_stats.since(prefilter_start)
+
+
+def redact_payloads_in_pool(
+    payloads: Iterable[dict],
+    workers: int,
+    scrubber: PIIScrub,
+    nlp_config: tuple[str, str],
+    batch_size: int = NLP_BATCH_SIZE,
+    chunk_size: int = WORKER_CHUNK_SIZE,
+    cache: RedactionCache | None = None,
+    segment_replies: bool = False,
+    html_aware: bool = False,
+    pattern_budget: float | None = None,
+    placeholders: str = PLACEHOLDERS_REDACTED,
+    record_spans: bool = False,
+    keep_originals: bool = False,
+) -> Iterator[dict]:
+    """
+    Redact a stream of payloads over a pool of worker processes.
+
+    The payloads are sent to the workers in chunks and yielded in their original order.
+    At most two chunks per worker are in flight at a time, so the payloads are only read
+    from the input as fast as the workers can redact them.
+
+    With a cache, the lookups made by the workers are added to its stats. The texts the
+    workers' pattern prefilters skipped are added to the scrubber's prefilter_stats.
+    """
+
+    def chunk_results(future) -> list[dict]:
+        redacted, stats, prefilter_stats = future.result()
+        if stats:
+            cache.stats.add(stats)
+        scrubber.prefilter_stats.add(prefilter_stats)
+        return redacted
+
+    max_pending = workers * 2
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(
+            nlp_config,
+            {
+                "scrubber": scrubber,
+                "batch_size": batch_size,
+                "cache": cache,
+                "segment_replies": segment_replies,
+                "html_aware": html_aware,
+                "pattern_budget": pattern_budget,
+                "placeholders": placeholders,
+                "record_spans": record_spans,
+                "keep_originals": keep_originals,
+            },
+        ),
+    ) as executor:
+        pending = deque()
+        for chunk in batched(payloads, chunk_size):
+            pending.append(executor.submit(redact_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from chunk_results(pending.popleft())
+        while pending:
+            yield from chunk_results(pending.popleft())
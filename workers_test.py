@@ -0,0 +1,41 @@
+# =========================================================
+# MIT license.
+#
+# (c) 2025 Aportio Developments Ltd.
+# =========================================================
+
+"""
+Test redacting payloads over a pool of worker processes
+"""
+
+import copy
+
+from redact import PIIScrub, redact_payloads
+from redact_test import make_payload
+from vendor.scrub import NLP_MODE_NER, SPACY_LANGUAGE_MODEL
+from workers import redact_payloads_in_pool
+
+
+def test_redact_payloads_in_pool_keeps_order():
+    payloads = []
+    for index in range(25):
+        payload = make_payload(f"Email {index}", f"Call John on 021 555 {index:04}")
+        # The message id isn't redacted, so it shows the order of the redacted payloads
+        payload["headers"]["message_id"] = f"<{index}@example.com>"
+        payloads.append(payload)
+    scrubber = PIIScrub()
+    expected = list(redact_payloads(copy.deepcopy(payloads), scrubber=scrubber))
+    redacted = list(
+        redact_payloads_in_pool(
+            iter(copy.deepcopy(payloads)),
+            workers=2,
+            scrubber=scrubber,
+            nlp_config=(SPACY_LANGUAGE_MODEL, NLP_MODE_NER),
+            chunk_size=4,
+        )
+    )
+    assert redacted == expected
+    assert [payload["headers"]["message_id"] for payload in redacted] == [
+        payload["headers"]["message_id"] for payload in payloads
+    ]
+    assert "555" not in redacted[0]["plain"]